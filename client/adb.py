@@ -0,0 +1,191 @@
+"""Non-blocking ADB commands, queued per device and run in parallel across devices"""
+import asyncio
+from collections import namedtuple
+
+UNITY_ACTIVITY = "com.unity3d.player.UnityPlayerActivity"
+
+# Fragments of adb output meaning the device connection went away and needs `adb connect` again
+DISCONNECTED_ERRORS = ("device offline", "not found", "no devices", "device unauthorized")
+
+AdbResult = namedtuple('AdbResult', ['returncode', 'stdout', 'stderr'])
+
+
+class AdbError(Exception):
+    """An ADB command failed, timed out, or adb itself could not be run"""
+
+
+class AdbDevice:
+    """Command queue and cached connection state for one device serial"""
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.connected = False
+        self.jobs = asyncio.Queue()
+        self.current = None
+        self.worker = None
+
+
+async def kill(process):
+    """Kill adb and reap it, without waiting on pipes that a forked adb server may hold open"""
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    try:
+        await asyncio.wait_for(process.wait(), 1.0)
+    except asyncio.TimeoutError:
+        pass
+
+
+class AdbManager:
+    """
+    Runs adb as asyncio subprocesses on the given event loop. Commands for one device run one at a
+    time in the order they were queued, different devices run in parallel, and `adb connect` is
+    only repeated once a device has dropped. The thread-safe methods return concurrent futures and
+    report progress through `on_progress(serial, message)`, which may be called from the loop thread.
+    """
+
+    def __init__(self, loop, adb="adb", timeout=10.0, on_progress=None):
+        self.loop = loop
+        self.adb = adb
+        self.timeout = timeout
+        self.on_progress = on_progress or (lambda serial, message: None)
+        self.devices = {}
+
+    async def run(self, *args):
+        """Run adb with the given arguments and return its AdbResult"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.adb, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except FileNotFoundError:
+            raise AdbError("ADB not found. Please ensure Android SDK is installed and ADB is in your PATH.")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            await kill(process)
+            raise AdbError("ADB command timed out. Please check device connection.")
+        except asyncio.CancelledError:
+            await kill(process)
+            raise
+        return AdbResult(process.returncode, stdout.decode(errors='replace').strip(),
+                         stderr.decode(errors='replace').strip())
+
+    async def connect(self, device, force=False):
+        if device.connected and not force:
+            return
+        self.on_progress(device.serial, f"Connecting to device: adb connect {device.serial}")
+        result = await self.run("connect", device.serial)
+        # adb connect exits with 0 even when it fails, so check what it printed
+        if result.returncode != 0 or "connected to" not in result.stdout:
+            raise AdbError(f"Failed to connect to device: {result.stderr or result.stdout}")
+        device.connected = True
+        self.on_progress(device.serial, f"ADB connect result: {result.stdout}")
+
+    async def shell(self, device, *command):
+        """Run a shell command on a device, reconnecting once if the cached connection went stale"""
+        await self.connect(device)
+        result = await self.run("-s", device.serial, "shell", *command)
+        if result.returncode != 0 and any(error in result.stderr for error in DISCONNECTED_ERRORS):
+            device.connected = False
+            await self.connect(device)
+            result = await self.run("-s", device.serial, "shell", *command)
+        if result.returncode != 0:
+            raise AdbError(result.stderr or result.stdout)
+        return result
+
+    async def start_activity(self, device, package, activity=UNITY_ACTIVITY):
+        await self.connect(device)
+        self.on_progress(device.serial, f"Launching application: am start -n {package}/{activity}")
+        result = await self.shell(device, "am", "start", "-n", f"{package}/{activity}")
+        self.on_progress(device.serial, "Application launched successfully")
+        return result
+
+    async def force_stop(self, device, package):
+        await self.connect(device)
+        self.on_progress(device.serial, f"Quitting application: am force-stop {package}")
+        result = await self.shell(device, "am", "force-stop", package)
+        self.on_progress(device.serial, "Application quit successfully")
+        return result
+
+    def device(self, serial):
+        device = self.devices.get(serial)
+        if device is None:
+            device = self.devices[serial] = AdbDevice(serial)
+            device.worker = self.loop.create_task(self.work(device))
+        return device
+
+    async def work(self, device):
+        while True:
+            item = await device.jobs.get()
+            if item is None:
+                return
+            job, future = item
+            if future.done():
+                # Cancelled while still queued
+                continue
+
+            device.current = self.loop.create_task(job(device))
+            # Cancelling the caller's future cancels the running command and kills adb
+            future.add_done_callback(lambda f, task=device.current: task.cancel() if f.cancelled() else None)
+            try:
+                result = await device.current
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                future.cancel()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                device.current = None
+
+    async def enqueue(self, serial, job):
+        """Run `job(device)` after the device's earlier commands and return its result"""
+        future = self.loop.create_future()
+        self.device(serial).jobs.put_nowait((job, future))
+        return await future
+
+    async def fan_out(self, serials, job):
+        results = await asyncio.gather(*(self.enqueue(serial, job) for serial in serials), return_exceptions=True)
+        return dict(zip(serials, results))
+
+    def submit(self, serials, job):
+        """
+        Run `job(device)` on every serial in parallel, safe to call from any thread. Returns a
+        concurrent future of {serial: result or exception}.
+        """
+        return asyncio.run_coroutine_threadsafe(self.fan_out(list(serials), job), self.loop)
+
+    def launch(self, serials, package, activity=UNITY_ACTIVITY):
+        return self.submit(serials, lambda device: self.start_activity(device, package, activity))
+
+    def quit(self, serials, package):
+        return self.submit(serials, lambda device: self.force_stop(device, package))
+
+    def cancel_jobs(self, serials=None):
+        for serial, device in self.devices.items():
+            if serials is not None and serial not in serials:
+                continue
+            while not device.jobs.empty():
+                item = device.jobs.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+            if device.current is not None:
+                device.current.cancel()
+
+    def cancel(self, serials=None):
+        """Cancel queued and running commands for the given serials, or every device"""
+        self.loop.call_soon_threadsafe(self.cancel_jobs, serials)
+
+    async def close(self):
+        self.cancel_jobs()
+        for device in self.devices.values():
+            device.jobs.put_nowait(None)
+        await asyncio.gather(*(device.worker for device in self.devices.values()), return_exceptions=True)
+        self.devices = {}
+
+    def shutdown(self):
+        """Cancel outstanding commands and stop the per-device workers, returns a concurrent future"""
+        return asyncio.run_coroutine_threadsafe(self.close(), self.loop)
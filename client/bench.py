@@ -0,0 +1,764 @@
+#!/usr/bin/env python3
+"""Performance benchmarks and stress tests for the Headsup client, results are printed as JSON"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from stats import percentile
+
+
+def bench_log_stress(args):
+    """Log from the network thread at a high rate and measure how late GUI ticks run"""
+    import tkinter as tk
+    from main import HeadsupGUI
+
+    root = tk.Tk()
+    app = HeadsupGUI(root)
+    app.start_event_loop()
+
+    gaps = []
+    last_tick = [time.perf_counter()]
+    tick_interval_ms = 10
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append((now - last_tick[0]) * 1000 - tick_interval_ms)
+        last_tick[0] = now
+        root.after(tick_interval_ms, tick)
+
+    async def flood():
+        # Log in small bursts every millisecond to approximate a steady rate
+        per_burst = max(1, args.rate // 1000)
+        sent = 0
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            if args.batched:
+                # Headset logs as the client hands a log_batch message to the GUI
+                now = time.time()
+                app.dispatcher.put('log_batch', [{'level': 'log', 'time': now, 'message': f"Stress test line {sent + index}"}
+                                                 for index in range(per_burst)])
+                sent += per_burst
+            else:
+                for _ in range(per_burst):
+                    app.log(f"Stress test line {sent}")
+                    sent += 1
+            await asyncio.sleep(0.001)
+        return sent
+
+    future = asyncio.run_coroutine_threadsafe(flood(), app.loop)
+    root.after(tick_interval_ms, tick)
+    root.after(int(args.duration * 1000) + 500, root.quit)
+    started = time.perf_counter()
+    root.mainloop()
+    elapsed = time.perf_counter() - started
+
+    sent = future.result(timeout=5)
+    result = {
+        'benchmark': 'log_stress',
+        'batched': args.batched,
+        'lines_logged': sent,
+        'lines_per_second': sent / args.duration,
+        'lines_buffered': len(app.console.buffer),
+        'tick_lag_p50_ms': percentile(gaps, 0.5),
+        'tick_lag_p99_ms': percentile(gaps, 0.99),
+        'tick_lag_max_ms': max(gaps) if gaps else 0.0,
+        'elapsed_s': elapsed,
+    }
+    root.destroy()
+    return result, result['tick_lag_max_ms'] <= args.max_tick_lag_ms
+
+
+def time_per_call(function, repeat=5, min_time=0.2):
+    """Best-of-`repeat` time per call in microseconds"""
+    import timeit
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def bench_codec(args):
+    """Per-message decode cost of the original double decode versus MessageCodec"""
+    import base64
+    import os
+    import protocol
+
+    messages = {
+        'status': {
+            'device_name': 'Quest Pro', 'device_model': 'Meta Quest Pro', 'device_battery': '0.87',
+            'active_block': '3', 'current_trial': '42', 'total_trials': '120', 'fixation_required': 'True',
+        },
+        'logs': "Trial 42 started: stimulus=left, fixation=true",
+        # One frame's worth of logs from a busy headset
+        'log_batch': [{'level': 'log', 'time': 1760000000.0 + index / 1000,
+                       'message': f"Trial 42 sample {index}: gaze=0.12,0.34"} for index in range(100)],
+        'screenshot': [base64.b64encode(os.urandom(args.frame_kib * 1024)).decode('ascii')
+                       for _ in range(args.sources)],
+    }
+
+    results = {}
+    for kind, data in messages.items():
+        legacy_message = protocol.encode_message(kind, data, protocol.LEGACY_VERSION)
+        flat_message = protocol.encode_message(kind, data, protocol.PROTOCOL_VERSION)
+        legacy_codec = protocol.MessageCodec()
+        flat_codec = protocol.MessageCodec()
+        flat_codec.version = protocol.PROTOCOL_VERSION
+
+        def baseline():
+            # The decode process_message used to do on the Tk thread
+            envelope = json.loads(legacy_message)
+            json.loads(envelope['data'])
+
+        before = time_per_call(baseline)
+        legacy = time_per_call(lambda: legacy_codec.decode(legacy_message))
+        flat = time_per_call(lambda: flat_codec.decode(flat_message))
+        results[kind] = {
+            'message_bytes': len(flat_message),
+            'before_us': before,
+            'legacy_codec_us': legacy,
+            'flat_codec_us': flat,
+            'speedup': before / flat if flat else 0.0,
+        }
+
+    # The same screenshot as binary chunks, reassembled as a protocol version 5 client does
+    captures = [protocol.capture_bytes(capture) for capture in messages['screenshot']]
+    chunked = protocol.encode_screenshot(captures, protocol.PROTOCOL_VERSION, transfer=1)
+    chunked_codec = protocol.MessageCodec()
+    chunked_codec.version = protocol.PROTOCOL_VERSION
+
+    def reassemble():
+        for chunk in chunked[:-1]:
+            chunked_codec.chunks.add(chunk)
+        chunked_codec.decode(chunked[-1])
+
+    results['chunked_screenshot'] = {
+        'chunks': len(chunked) - 1,
+        'largest_message_bytes': max(len(message) for message in chunked),
+        'reassemble_us': time_per_call(reassemble),
+    }
+
+    result = {'benchmark': 'codec', 'json_backend': protocol.JSON_BACKEND, 'messages': results}
+    return result, True
+
+
+FAKE_ADB = """#!/bin/sh
+# Stand-in for adb that answers like a reachable headset after a delay
+sleep {delay}
+case "$1" in
+    connect) echo "connected to $2" ;;
+    -s) echo "Starting: Intent {{ cmp=$5 }}" ;;
+esac
+"""
+
+
+def bench_adb(args):
+    """Launch and quit on many devices in parallel against a fake adb on PATH"""
+    import os
+    import stat
+    import tempfile
+    import threading
+    from adb import AdbManager
+
+    with tempfile.TemporaryDirectory() as directory:
+        adb_path = os.path.join(directory, "adb")
+        with open(adb_path, 'w') as fake_adb:
+            fake_adb.write(FAKE_ADB.format(delay=args.delay))
+        os.chmod(adb_path, os.stat(adb_path).st_mode | stat.S_IEXEC)
+        os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        manager = AdbManager(loop)
+        serials = [f"10.0.0.{i}:5555" for i in range(1, args.devices + 1)]
+
+        started = time.perf_counter()
+        launched = manager.launch(serials, "com.example.headsup").result()
+        launch_elapsed = time.perf_counter() - started
+
+        # The second command reuses the cached connection, so only one adb call per device
+        started = time.perf_counter()
+        quit = manager.quit(serials, "com.example.headsup").result()
+        quit_elapsed = time.perf_counter() - started
+
+        manager.shutdown().result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    failures = [serial for results in (launched, quit) for serial, result in results.items()
+                if isinstance(result, BaseException)]
+    result = {
+        'benchmark': 'adb',
+        'devices': args.devices,
+        'adb_delay_s': args.delay,
+        'launch_elapsed_s': launch_elapsed,
+        'quit_elapsed_s': quit_elapsed,
+        'sequential_estimate_s': args.devices * args.delay * 3,
+        'failures': len(failures),
+    }
+    return result, not failures and launch_elapsed <= args.max_elapsed_s
+
+
+def bench_discovery(args):
+    """Scan a loopback /24 with mock servers on some of its addresses"""
+    from discovery import DiscoveryScanner
+    from mock_server import MockHeadsupServer
+
+    # Every 127.0.0.0/8 address is local on Linux, other platforms may only answer on 127.0.0.1
+    hosts = [f"127.0.0.{i}" for i in range(2, 2 + args.servers)]
+
+    async def scan():
+        servers = [asyncio.ensure_future(MockHeadsupServer(device_name=f"Mock {host}").serve(host, args.port, quiet=True))
+                   for host in hosts]
+        await asyncio.sleep(0.5)
+        scanner = DiscoveryScanner(port=args.port, concurrency=args.concurrency, timeout=args.timeout)
+        started = time.perf_counter()
+        results = await scanner.scan("127.0.0.0/24")
+        elapsed = time.perf_counter() - started
+        for server in servers:
+            server.cancel()
+        await asyncio.gather(*servers, return_exceptions=True)
+        return results, elapsed
+
+    results, elapsed = asyncio.run(scan())
+    found = {result.host: result for result in results}
+    latencies = [result.latency * 1000 for result in results]
+    result = {
+        'benchmark': 'discovery',
+        'hosts_scanned': 254,
+        'servers': len(hosts),
+        'found': len(found),
+        'named': sum(found[host].device_name == f"Mock {host}" for host in hosts if host in found),
+        'elapsed_s': elapsed,
+        'latency_p50_ms': percentile(latencies, 0.5),
+        'latency_max_ms': max(latencies) if latencies else 0.0,
+    }
+    return result, set(hosts) <= set(found) and elapsed <= args.max_elapsed_s
+
+
+def bench_relay(args):
+    """Many observers asking for screenshots at once through a relay in front of a mock server"""
+    import websockets
+
+    import protocol
+    from mock_server import MockHeadsupServer
+    from relay import HeadsupRelay
+
+    headset_port, relay_port = args.port, args.port + 1
+
+    async def observe(rounds):
+        async with websockets.connect(f"ws://127.0.0.1:{relay_port}", max_size=None) as websocket:
+            codec = protocol.MessageCodec()
+            await websocket.send(codec.start_negotiation())
+            latencies = []
+            statuses = 0
+            for _ in range(rounds):
+                sent_at = time.perf_counter()
+                await websocket.send(protocol.encode_command("screenshot", None))
+                while True:
+                    kind, _ = codec.decode(await asyncio.wait_for(websocket.recv(), 10.0))
+                    if kind == 'status':
+                        statuses += 1
+                    elif kind == 'screenshot':
+                        break
+                latencies.append((time.perf_counter() - sent_at) * 1000)
+                await asyncio.sleep(args.interval)
+            return latencies, statuses
+
+    async def run():
+        server = asyncio.ensure_future(MockHeadsupServer(status_interval=0.2).serve("127.0.0.1", headset_port, quiet=True))
+        relay = HeadsupRelay("127.0.0.1", headset_port, screenshot_window=args.window)
+        relay.log = lambda message: None
+        relay_task = asyncio.ensure_future(relay.serve("127.0.0.1", relay_port))
+        await asyncio.sleep(0.5)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(observe(args.rounds) for _ in range(args.observers)))
+        elapsed = time.perf_counter() - started
+        for task in (relay_task, server):
+            task.cancel()
+        await asyncio.gather(relay_task, server, return_exceptions=True)
+        return relay, results, elapsed
+
+    relay, results, elapsed = asyncio.run(run())
+    latencies = [latency for observer, _ in results for latency in observer]
+    result = {
+        'benchmark': 'relay',
+        'observers': args.observers,
+        'screenshot_requests': relay.screenshot_requests,
+        'upstream_captures': relay.upstream_captures,
+        'coalescing_ratio': relay.screenshot_requests / max(1, relay.upstream_captures),
+        'observers_with_status': sum(statuses > 0 for _, statuses in results),
+        'elapsed_s': elapsed,
+        'screenshot_p50_ms': percentile(latencies, 0.5),
+        'screenshot_p99_ms': percentile(latencies, 0.99),
+    }
+    passed = (len(latencies) == args.observers * args.rounds and
+              relay.upstream_captures <= args.max_captures_per_round * args.rounds)
+    return result, passed
+
+
+def bench_client(args):
+    """Many HeadsupClients in one process against a mock server, plus the client's cold import time"""
+    import subprocess
+
+    from client import HeadsupClient
+    from mock_server import MockHeadsupServer
+
+    # A fresh interpreter, so nothing is imported already
+    probe = ("import sys, time; started = time.perf_counter(); import client; "
+             "print(time.perf_counter() - started, 'tkinter' in sys.modules or 'PIL' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    import_ms, gui_imported = float(output[0]) * 1000, output[1] == 'True'
+
+    async def run():
+        server = asyncio.ensure_future(MockHeadsupServer(status_interval=0.2).serve("127.0.0.1", args.port, quiet=True))
+        await asyncio.sleep(0.5)
+        clients = [HeadsupClient("127.0.0.1", args.port) for _ in range(args.clients)]
+        started = time.perf_counter()
+        await asyncio.gather(*(client.connect() for client in clients))
+        connect_elapsed = time.perf_counter() - started
+
+        async def first_status(client):
+            updates = client.status()
+            async for status in updates:
+                updates.close()
+                return status
+
+        statuses = await asyncio.wait_for(asyncio.gather(*(first_status(client) for client in clients)), 5.0)
+        latencies = []
+        for _ in range(args.rounds):
+            sent_at = time.perf_counter()
+            replies = await asyncio.gather(*(client.set_fixation(True) for client in clients))
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+        await asyncio.gather(*(client.close() for client in clients))
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        return connect_elapsed, statuses, replies, latencies
+
+    connect_elapsed, statuses, replies, latencies = asyncio.run(run())
+    result = {
+        'benchmark': 'client',
+        'import_ms': import_ms,
+        'gui_modules_imported': gui_imported,
+        'clients': args.clients,
+        'connect_elapsed_s': connect_elapsed,
+        'clients_with_status': sum(status is not None for status in statuses),
+        'command_round_p50_ms': percentile(latencies, 0.5),
+        'command_round_max_ms': max(latencies) if latencies else 0.0,
+        'confirmed': sum(replies),
+    }
+    passed = (not gui_imported and import_ms <= args.max_import_ms and all(replies)
+              and result['clients_with_status'] == args.clients)
+    return result, passed
+
+
+STARTUP_PROBE = """
+import sys, time
+started = time.perf_counter()
+import main
+result = {'import_ms': (time.perf_counter() - started) * 1000}
+if WINDOW:
+    import tkinter as tk
+    started = time.perf_counter()
+    root = tk.Tk()
+    main.HeadsupGUI(root)
+    root.update()
+    result['window_ms'] = (time.perf_counter() - started) * 1000
+    root.destroy()
+result['deferred_loaded'] = [name for name in ('asyncio', 'websockets', 'PIL') if name in sys.modules]
+import json
+print(json.dumps(result))
+"""
+
+
+def bench_startup(args):
+    """Cold start of the control panel in fresh interpreters, with the slowest imports from -X importtime"""
+    import subprocess
+
+    runs = []
+    imports = {}
+    for _ in range(args.repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                  STARTUP_PROBE.replace("WINDOW", str(args.window))],
+                                 capture_output=True, text=True, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+        runs.append(json.loads(process.stdout))
+        # Lines look like "import time:  self_us | cumulative_us | name"
+        for line in process.stderr.splitlines():
+            fields = line.split('|')
+            if line.startswith('import time:') and fields[0].split(':')[1].strip().isdigit():
+                name = fields[2].strip()
+                imports[name] = min(imports.get(name, float('inf')), int(fields[1]) / 1000)
+
+    import_ms = percentile([run['import_ms'] for run in runs], 0.5)
+    deferred = sorted({name for run in runs for name in run['deferred_loaded']})
+    result = {
+        'benchmark': 'startup',
+        'runs': args.repeat,
+        'import_p50_ms': import_ms,
+        'import_max_ms': max(run['import_ms'] for run in runs),
+        'deferred_modules_loaded': deferred,
+        'slowest_imports_ms': dict(sorted(imports.items(), key=lambda item: -item[1])[:8]),
+    }
+    passed = import_ms <= args.max_import_ms and not deferred
+    if args.window:
+        window_ms = percentile([run['window_ms'] for run in runs], 0.5)
+        result['window_p50_ms'] = window_ms
+        passed = passed and window_ms <= args.max_window_ms
+    return result, passed
+
+
+def rss_mb():
+    """Resident set size of this process in MiB, or the peak where the current size isn't available"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, AttributeError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def start_mock_server(port, *options):
+    """Run mock_server.py in its own process, so it doesn't compete with the client being measured"""
+    import socket
+    import subprocess
+
+    process = subprocess.Popen([sys.executable, "mock_server.py", "--host", "127.0.0.1", "--port", str(port), *options],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("Mock server did not start")
+            time.sleep(0.05)
+
+
+def suite_client(args):
+    """Screenshot request-to-pixels latency, then messages ingested and RSS over a long run"""
+    from client import HeadsupClient
+    from frames import decode_frame
+    from profiling import profiler, watch_event_loop
+
+    async def run():
+        if args.profile or args.trace:
+            profiler.start(trace=bool(args.trace))
+            asyncio.ensure_future(watch_event_loop(profiler))
+        client = HeadsupClient("127.0.0.1", args.port)
+        await client.connect()
+
+        latencies = []
+        for _ in range(args.screenshots):
+            started = time.perf_counter()
+            captures = await client.screenshot()
+            # Pixels means decoded and scaled for the control panel's screenshot canvas
+            with profiler.span('decode.frame'):
+                decode_frame(captures[0], (320, 180))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        counts = {}
+        messages = client.messages(maxsize=100000)
+
+        async def consume():
+            async for kind, payload in messages:
+                if kind == 'log_batch':
+                    # Counted per log line, so batched and unbatched servers compare
+                    counts['logs'] = counts.get('logs', 0) + len(payload)
+                else:
+                    counts[kind] = counts.get(kind, 0) + 1
+
+        consumer = asyncio.ensure_future(consume())
+        await client.start_live_view(args.fps)
+        rss = [rss_mb()]
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.duration:
+            await asyncio.sleep(1.0)
+            rss.append(rss_mb())
+        elapsed = time.perf_counter() - started
+        messages.close()
+        await consumer
+        await client.close()
+        return latencies, counts, elapsed, rss
+
+    latencies, counts, elapsed, rss = asyncio.run(run())
+    ingested = sum(counts.values())
+    # The first samples include warm-up allocations, growth is measured from a fifth of the way in
+    rss_growth = rss[-1] - rss[len(rss) // 5]
+    result = {
+        'screenshot_p50_ms': percentile(latencies, 0.5),
+        'screenshot_p99_ms': percentile(latencies, 0.99),
+        'messages_per_second': ingested / elapsed,
+        'logs_per_second': counts.get('logs', 0) / elapsed,
+        'frames_per_second': counts.get('frame', 0) / elapsed,
+        'rss_start_mb': rss[0],
+        'rss_end_mb': rss[-1],
+        'rss_growth_mb': rss_growth,
+    }
+    if profiler.enabled:
+        result['spans'] = profiler.stop()
+        if args.trace:
+            profiler.write_trace(args.trace)
+    passed = (result['logs_per_second'] >= args.log_rate * args.min_ingest_ratio
+              and result['screenshot_p99_ms'] <= args.max_screenshot_ms and rss_growth <= args.max_rss_growth_mb)
+    return result, passed
+
+
+def suite_gui(args):
+    """GUI tick jitter and RSS with the control panel connected, streaming live view and logs"""
+    import tkinter as tk
+    from main import HeadsupGUI
+
+    root = tk.Tk()
+    app = HeadsupGUI(root)
+    app.ip_var.set("127.0.0.1")
+    app.port_var.set(str(args.port))
+    app.live_fps_var.set(str(args.fps))
+
+    gaps = []
+    rss = []
+    last_tick = [time.perf_counter()]
+    tick_interval_ms = 10
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append((now - last_tick[0]) * 1000 - tick_interval_ms)
+        last_tick[0] = now
+        root.after(tick_interval_ms, tick)
+
+    def sample():
+        rss.append(rss_mb())
+        root.after(1000, sample)
+
+    def start():
+        if not app.connected:
+            root.after(50, start)
+            return
+        app.toggle_live_view()
+        last_tick[0] = time.perf_counter()
+        root.after(tick_interval_ms, tick)
+        sample()
+        root.after(int(args.duration * 1000), root.quit)
+
+    app.toggle_connection()
+    root.after(50, start)
+    root.mainloop()
+    app.on_closing()
+
+    rss_growth = rss[-1] - rss[len(rss) // 5] if rss else 0.0
+    result = {
+        'gui_tick_lag_p50_ms': percentile(gaps, 0.5),
+        'gui_tick_lag_p99_ms': percentile(gaps, 0.99),
+        'gui_tick_lag_max_ms': max(gaps) if gaps else 0.0,
+        'gui_rss_growth_mb': rss_growth,
+    }
+    passed = result['gui_tick_lag_p99_ms'] <= args.max_tick_lag_ms and rss_growth <= args.max_rss_growth_mb
+    return result, passed
+
+
+def bench_suite(args):
+    """End-to-end benchmarks against a mock server streaming logs and live view"""
+    server = start_mock_server(args.port, "--width", str(args.width), "--height", str(args.height),
+                               "--log-rate", str(args.log_rate), "--delay-ms", str(args.delay_ms),
+                               "--status-interval", "0.1")
+    try:
+        result, passed = suite_client(args)
+        if args.gui:
+            gui_result, gui_passed = suite_gui(args)
+            result.update(gui_result)
+            passed = passed and gui_passed
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {'benchmark': 'suite', 'frame_size': [args.width, args.height], 'log_rate': args.log_rate,
+              'delay_ms': args.delay_ms, 'duration_s': args.duration, **result}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(dict(result, passed=passed), output, indent=2)
+    return result, passed
+
+
+def bench_surface(args):
+    """Per-frame cost and steady-state RSS of pasting frames into a FrameSurface, against a new PhotoImage per frame"""
+    import io
+    import tkinter as tk
+    from PIL import Image, ImageTk
+    from frames import ImagePool, decode_frame_sizes
+    from surface import FrameSurface
+
+    root = tk.Tk()
+    canvas = tk.Canvas(root, width=args.width, height=args.height, bg='black', highlightthickness=0)
+    canvas.pack()
+    root.update()
+
+    # A few distinct frames, so every frame is decoded and drawn afresh
+    encoded = []
+    for index in range(8):
+        image = Image.new('RGB', (args.frame_width, args.frame_height), (index * 32, 64, 255 - index * 32))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG')
+        encoded.append(buffer.getvalue())
+    sizes = ((args.width, args.height), (args.width // 2, args.height // 2))
+
+    def run(draw):
+        decode_ms = []
+        draw_ms = []
+        rss = [rss_mb()]
+        for index in range(args.frames):
+            started = time.perf_counter()
+            images = draw.decode(encoded[index % len(encoded)])
+            decoded = time.perf_counter()
+            draw(images)
+            root.update_idletasks()
+            finished = time.perf_counter()
+            decode_ms.append((decoded - started) * 1000)
+            draw_ms.append((finished - decoded) * 1000)
+            if index % 100 == 0:
+                rss.append(rss_mb())
+        # The first samples include warm-up allocations, growth is measured from a fifth of the way in
+        return {
+            'decode_p50_ms': percentile(decode_ms, 0.5),
+            'draw_p50_ms': percentile(draw_ms, 0.5),
+            'draw_p99_ms': percentile(draw_ms, 0.99),
+            'frame_p99_ms': percentile([a + b for a, b in zip(decode_ms, draw_ms)], 0.99),
+            'rss_growth_mb': rss[-1] - rss[len(rss) // 5],
+        }
+
+    pool = ImagePool()
+    surface = FrameSurface(canvas)
+    cached = []
+
+    def reuse(images):
+        surface.draw(0, images[0], 0, 0)
+        for image in cached:
+            pool.release(image)
+        cached[:] = images
+    reuse.decode = lambda data: decode_frame_sizes(data, sizes, pool)
+
+    def baseline(images):
+        # What the control panel did before FrameSurface
+        photo = ImageTk.PhotoImage(images[0])
+        canvas.delete("all")
+        canvas.create_image(0, 0, image=photo, anchor=tk.NW)
+        canvas.image = photo
+    baseline.decode = lambda data: decode_frame_sizes(data, sizes)
+
+    # The surface runs first, so its RSS isn't inflated by the baseline's garbage
+    result = {
+        'benchmark': 'surface',
+        'frames': args.frames,
+        'surface': run(reuse),
+        'photo_images_allocated': surface.allocated,
+        'pool_buffers_allocated': pool.allocated,
+        'baseline': run(baseline),
+    }
+    root.destroy()
+    passed = (result['surface']['rss_growth_mb'] <= args.max_rss_growth_mb
+              and result['surface']['frame_p99_ms'] <= args.max_frame_ms)
+    return result, passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headsup client benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    log_stress = subparsers.add_parser('log-stress', help="Log from the network thread while the GUI runs")
+    log_stress.add_argument('--rate', type=int, default=5000, help="Lines logged per second")
+    log_stress.add_argument('--duration', type=float, default=5.0, help="Seconds to log for")
+    log_stress.add_argument('--batched', action='store_true', help="Deliver lines as headset log batches")
+    log_stress.add_argument('--max-tick-lag-ms', type=float, default=100.0, help="Fail if a GUI tick runs later than this")
+    log_stress.set_defaults(run=bench_log_stress)
+
+    codec = subparsers.add_parser('codec', help="Compare message decode cost before and after MessageCodec")
+    codec.add_argument('--frame-kib', type=int, default=256, help="Size of each encoded screenshot in KiB")
+    codec.add_argument('--sources', type=int, default=1, help="Number of capture sources per screenshot")
+    codec.set_defaults(run=bench_codec)
+
+    adb = subparsers.add_parser('adb', help="Launch on many devices in parallel against a fake adb")
+    adb.add_argument('--devices', type=int, default=20, help="Number of devices to launch on")
+    adb.add_argument('--delay', type=float, default=0.3, help="Seconds each fake adb call takes")
+    adb.add_argument('--max-elapsed-s', type=float, default=2.0, help="Fail if launching on every device takes longer")
+    adb.set_defaults(run=bench_adb)
+
+    discovery = subparsers.add_parser('discovery', help="Scan a loopback /24 served by mock servers")
+    discovery.add_argument('--servers', type=int, default=4, help="Number of mock servers to find")
+    discovery.add_argument('--port', type=int, default=14444, help="Port the mock servers listen on")
+    discovery.add_argument('--concurrency', type=int, default=128, help="Hosts probed at once")
+    discovery.add_argument('--timeout', type=float, default=0.5, help="Per-host connect timeout in seconds")
+    discovery.add_argument('--max-elapsed-s', type=float, default=3.0, help="Fail if the scan takes longer")
+    discovery.set_defaults(run=bench_discovery)
+
+    relay = subparsers.add_parser('relay', help="Fan screenshots out to many observers through a relay")
+    relay.add_argument('--observers', type=int, default=20, help="Number of observers connected to the relay")
+    relay.add_argument('--rounds', type=int, default=10, help="Screenshots each observer asks for")
+    relay.add_argument('--interval', type=float, default=0.5, help="Seconds between an observer's screenshots")
+    relay.add_argument('--window', type=float, default=0.25, help="Relay screenshot coalescing window in seconds")
+    relay.add_argument('--port', type=int, default=14445, help="Mock server port, the relay listens on the next one")
+    relay.add_argument('--max-captures-per-round', type=float, default=2.0,
+                       help="Fail if the headset is asked for more captures than this per round")
+    relay.set_defaults(run=bench_relay)
+
+    client = subparsers.add_parser('client', help="Run many headless clients in one process against a mock server")
+    client.add_argument('--clients', type=int, default=50, help="Number of clients to connect")
+    client.add_argument('--rounds', type=int, default=20, help="Commands each client sends")
+    client.add_argument('--port', type=int, default=14447, help="Port the mock server listens on")
+    client.add_argument('--max-import-ms', type=float, default=80.0, help="Fail if importing the client takes longer")
+    client.set_defaults(run=bench_client)
+
+    startup = subparsers.add_parser('startup', help="Measure the control panel's cold start")
+    startup.add_argument('--repeat', type=int, default=5, help="Fresh interpreters to start")
+    startup.add_argument('--window', action='store_true', help="Also build the window, needs a display")
+    startup.add_argument('--max-import-ms', type=float, default=100.0, help="Fail if importing main.py takes longer")
+    startup.add_argument('--max-window-ms', type=float, default=400.0, help="Fail if building the window takes longer")
+    startup.set_defaults(run=bench_startup)
+
+    suite = subparsers.add_parser('suite', help="End-to-end throughput, latency and memory against a mock server")
+    suite.add_argument('--duration', type=float, default=30.0, help="Seconds to stream logs and live view for")
+    suite.add_argument('--log-rate', type=float, default=2000.0, help="Log lines the mock server sends per second")
+    suite.add_argument('--fps', type=float, default=30.0, help="Live view rate")
+    suite.add_argument('--width', type=int, default=1920, help="Frame width")
+    suite.add_argument('--height', type=int, default=1080, help="Frame height")
+    suite.add_argument('--delay-ms', type=float, default=0.0, help="Network delay the mock server injects")
+    suite.add_argument('--screenshots', type=int, default=20, help="Screenshots to time")
+    suite.add_argument('--port', type=int, default=14449, help="Port the mock server listens on")
+    suite.add_argument('--gui', action='store_true', help="Also measure the control panel's tick jitter, needs a display")
+    suite.add_argument('--output', help="Also write the results to this file")
+    suite.add_argument('--profile', action='store_true', help="Include per-span timings of the headless client")
+    suite.add_argument('--trace', help="Also write a Chrome trace of the headless client to this file")
+    suite.add_argument('--min-ingest-ratio', type=float, default=0.9,
+                       help="Fail if fewer than this fraction of the log rate is ingested")
+    suite.add_argument('--max-screenshot-ms', type=float, default=500.0, help="Fail if the p99 screenshot takes longer")
+    suite.add_argument('--max-tick-lag-ms', type=float, default=50.0, help="Fail if the p99 GUI tick is later than this")
+    suite.add_argument('--max-rss-growth-mb', type=float, default=20.0, help="Fail if RSS grows more than this")
+    suite.set_defaults(run=bench_suite)
+
+    surface = subparsers.add_parser('surface', help="Draw thousands of frames through FrameSurface, needs a display")
+    surface.add_argument('--frames', type=int, default=5000, help="Frames to decode and draw in each mode")
+    surface.add_argument('--width', type=int, default=320, help="Canvas width")
+    surface.add_argument('--height', type=int, default=180, help="Canvas height")
+    surface.add_argument('--frame-width', type=int, default=1280, help="Encoded frame width")
+    surface.add_argument('--frame-height', type=int, default=720, help="Encoded frame height")
+    surface.add_argument('--max-rss-growth-mb', type=float, default=5.0, help="Fail if RSS grows more than this")
+    surface.add_argument('--max-frame-ms', type=float, default=30.0, help="Fail if the p99 decode and draw takes longer")
+    surface.set_defaults(run=bench_surface)
+
+    args = parser.parse_args()
+    result, passed = args.run(args)
+    result['passed'] = passed
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+"""Headless asyncio client for one Headsup server, with no GUI dependencies"""
+import time
+from collections import deque
+
+# asyncio and websockets are imported where they are used, so importing the client for its types or from
+# the control panel doesn't pay for them before the first connection
+
+import protocol
+from commands import CommandTracker
+from connection import ReconnectPolicy
+from heartbeat import HeartbeatMonitor
+from models import Frame, LogEntry, UNKNOWN, parse_log_batch, parse_status
+from profiling import profiler
+
+
+def negotiated_extensions(websocket):
+    """Names of the WebSocket extensions agreed with the server, for both websockets client APIs"""
+    extensions = getattr(websocket, 'extensions', None)
+    if extensions is None:
+        extensions = getattr(getattr(websocket, 'protocol', None), 'extensions', None)
+    return [extension.name for extension in extensions or ()]
+
+
+class Subscription:
+    """
+    Async iterator over the messages a client receives, from when it was created until the client
+    stops. At most `maxsize` messages are buffered, after which the oldest are dropped so a slow
+    consumer never holds the connection up. Call close() when done iterating early.
+    """
+
+    def __init__(self, client, kinds, maxsize):
+        self.client = client
+        self.kinds = kinds
+        self.items = deque(maxlen=maxsize)
+        self.waiter = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        if len(self.items) == self.items.maxlen:
+            self.dropped += 1
+        self.items.append(item)
+        self.wake()
+
+    def wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def close(self):
+        self.closed = True
+        self.client.subscriptions.discard(self)
+        self.wake()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+
+        while not self.items:
+            if self.closed:
+                raise StopAsyncIteration
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.items.popleft()
+
+
+class HeadsupClient:
+    """
+    Connection to one Headsup server. run() keeps the connection up until close(), reconnecting with
+    backoff after a drop, and gives up on a server that never answered after `initial_connect_attempts`, or
+    keeps trying if it is None. Inbound messages are delivered to subscriptions, commands are coroutines
+    returning the reply.
+
+    Must only be used from the event loop thread it runs on. The connection state attributes and
+    `link_quality` are single attribute stores, safe to read from any thread.
+    """
+
+    def __init__(self, host, port=4444, reconnect_policy=None, initial_connect_attempts=3, command_timeout=5.0,
+                 ping_interval=5.0, ping_timeout=10.0, heartbeat_interval=1.0, heartbeat_timeout=2.0,
+                 heartbeat_max_missed=3, max_size=protocol.MAX_MESSAGE_SIZE, compression=True,
+                 max_chunk_buffer=protocol.MAX_CHUNK_BUFFER, on_log=None, on_state=None, on_link_quality=None):
+        self.host = host
+        self.port = port
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy(initial_delay=0.5, max_delay=15.0)
+        self.initial_connect_attempts = initial_connect_attempts
+        self.command_timeout = command_timeout
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat_max_missed = heartbeat_max_missed
+        # Transport limits, chunked frames keep messages small and compression is offered as permessage-deflate
+        self.max_size = max_size
+        self.compression = compression
+        self.max_chunk_buffer = max_chunk_buffer
+        self.on_log = on_log
+        self.on_state = on_state
+        self.on_link_quality = on_link_quality
+
+        # Connection state
+        self.websocket = None
+        self.connected = False
+        self.connecting = False
+        self.reconnecting = False
+        self.connection_error = False
+        self.last_reconnect_time = None
+        self.running = False
+        self.run_task = None
+        self.connection_task = None
+        self.stopping = None
+
+        # Message decoding is renegotiated on every connection, replies are matched to commands
+        self.codec = protocol.MessageCodec(max_chunk_buffer)
+        self.commands = CommandTracker()
+        self.heartbeat = None
+        self.compressed = False
+
+        self.subscriptions = set()
+        self.latest_status = None
+
+    @property
+    def uri(self):
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def link_quality(self):
+        """Latest heartbeat LinkQuality"""
+        heartbeat = self.heartbeat
+        return heartbeat.quality if heartbeat is not None and self.connected else UNKNOWN
+
+    def log(self, message):
+        if self.on_log is not None:
+            self.on_log(message)
+
+    def notify_state(self):
+        if self.on_state is not None:
+            self.on_state()
+
+    # Lifecycle
+
+    def start(self):
+        """Start run() as a task, returns the task"""
+        import asyncio
+
+        if self.run_task is None or self.run_task.done():
+            self.run_task = asyncio.ensure_future(self.run())
+        return self.run_task
+
+    async def connect(self):
+        """Start the client and wait for the first connection, raises ConnectionError if it fails"""
+        import asyncio
+
+        task = self.start()
+        while not self.connected:
+            if task.done():
+                raise ConnectionError(f"Could not connect to {self.uri}")
+            await asyncio.sleep(0.05)
+        return self
+
+    async def close(self):
+        """Disconnect, stop reconnecting and wait for run() to return"""
+        import asyncio
+
+        self.stop()
+        if self.run_task is not None:
+            await asyncio.gather(self.run_task, return_exceptions=True)
+
+    def stop(self):
+        """Ask run() to disconnect and return without waiting for it"""
+        self.running = False
+        if self.stopping is not None:
+            self.stopping.set()
+        if self.connection_task is not None:
+            self.connection_task.cancel()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def run(self):
+        """Keep the connection up until stop() or close(), reconnecting with backoff after a drop"""
+        import asyncio
+
+        self.running = True
+        self.stopping = asyncio.Event()
+        attempt = 0
+        dropped_at = None
+        try:
+            while self.running:
+                self.connecting = True
+                self.connection_error = False
+                self.notify_state()
+
+                was_connected = False
+                self.connection_task = asyncio.ensure_future(self.connect_websocket(dropped_at))
+                try:
+                    was_connected = await self.connection_task
+                except asyncio.CancelledError:
+                    # stop() cancels the connection, anything else is the run task itself being cancelled
+                    if self.running:
+                        raise
+                except Exception as e:
+                    self.log(f"Connection error: {e}")
+                finally:
+                    self.connection_task = None
+
+                if not self.running:
+                    break
+                if was_connected:
+                    attempt = 0
+                    dropped_at = time.monotonic()
+
+                # Give up on a headset that never answered, a dropped connection keeps retrying
+                if (dropped_at is None and self.initial_connect_attempts is not None
+                        and attempt + 1 >= self.initial_connect_attempts):
+                    self.connection_error = True
+                    self.running = False
+                    break
+                if not self.reconnect_policy.should_retry(attempt):
+                    self.log("Reconnect attempts exhausted")
+                    self.connection_error = True
+                    self.running = False
+                    break
+
+                delay = self.reconnect_policy.delay(attempt)
+                attempt += 1
+                self.reconnecting = True
+                self.log(f"Reconnecting in {delay:.1f}s (attempt {attempt})")
+                self.notify_state()
+
+                # Wait out the backoff, waking early if the client is stopped
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.connected = False
+            self.connecting = False
+            self.reconnecting = False
+            if not self.connection_error:
+                self.log("Disconnected from headset")
+            self.log_command_latency()
+            self.notify_state()
+            for subscription in list(self.subscriptions):
+                subscription.close()
+
+    async def connect_websocket(self, dropped_at=None):
+        """Establishes and maintains the WebSocket connection, returns True once it was established"""
+        import asyncio
+
+        import websockets
+
+        self.log(f"Attempting to connect to {self.uri}")
+
+        try:
+            async with websockets.connect(self.uri, ping_interval=self.ping_interval, ping_timeout=self.ping_timeout,
+                                          max_size=self.max_size,
+                                          compression="deflate" if self.compression else None) as websocket:
+                self.websocket = websocket
+                self.compressed = 'permessage-deflate' in negotiated_extensions(websocket)
+                self.connected = True
+                self.connecting = False
+                self.reconnecting = False
+                self.connection_error = False
+                if dropped_at is not None:
+                    self.last_reconnect_time = time.monotonic() - dropped_at
+                    self.log(f"Reconnected to headset after {self.last_reconnect_time:.1f}s")
+                else:
+                    self.last_reconnect_time = None
+                    self.log("Connected to headset")
+                self.notify_state()
+
+                # Ask for the flat message envelope, servers that don't support it keep the legacy one
+                self.codec = protocol.MessageCodec(self.max_chunk_buffer)
+                await websocket.send(self.codec.start_negotiation())
+
+                self.heartbeat = HeartbeatMonitor(
+                    lambda: self.send_command("active", quiet=True), self.heartbeat_interval,
+                    self.heartbeat_timeout, self.heartbeat_max_missed,
+                    on_update=self.on_link_quality,
+                    on_stale=lambda: self.drop_stale_connection(websocket))
+                heartbeat = asyncio.ensure_future(self.heartbeat.run())
+
+                try:
+                    while self.connected:
+                        try:
+                            message = await websocket.recv()
+                            if isinstance(message, bytes):
+                                await self.handle_binary_message(websocket, message)
+                            else:
+                                with profiler.span('ws.message'):
+                                    try:
+                                        self.handle_message(message)
+                                    except Exception as e:
+                                        # A message that can't be handled is skipped, the connection is fine
+                                        self.log(f"Error processing message: {e}")
+                        except websockets.exceptions.ConnectionClosed:
+                            self.log("Connection closed by server")
+                            break
+                        except Exception as e:
+                            self.log(f"Error receiving message: {e}")
+                            break
+                finally:
+                    heartbeat.cancel()
+                return True
+
+        except Exception as e:
+            if not self.connected:
+                self.log(f"Connection failed: {e}")
+                raise  # Re-raise to be handled by run
+            return True
+
+        finally:
+            # Clean up connection state, run decides what happens next
+            self.connected = False
+            self.websocket = None
+            self.commands.reset()
+
+    def handle_message(self, message):
+        with profiler.span('ws.decode'):
+            kind, payload, request_id = self.codec.decode_tagged(message)
+        if kind == 'protocol':
+            compression = "permessage-deflate" if self.compressed else "uncompressed"
+            self.log(f"Using protocol version {payload} ({protocol.JSON_BACKEND} decoder, {compression})")
+            return
+
+        pending = self.commands.resolve(kind, payload, request_id)
+        if pending is not None and pending.quiet:
+            return
+        items = (payload,)
+        if kind == 'reply':
+            if pending is not None:
+                self.log(f"Received: {payload} ({pending.name}, {pending.latency * 1000:.0f} ms)")
+            else:
+                self.log(f"Received: {payload}")
+        elif kind == 'status':
+            self.latest_status = parse_status(payload)
+            items = (self.latest_status,)
+        elif kind == 'logs':
+            items = (LogEntry(None, time.time(), str(payload), None),)
+        elif kind == 'log_batch':
+            items = parse_log_batch(payload)
+        self.publish(kind, payload, items)
+
+    async def handle_binary_message(self, websocket, message):
+        try:
+            kind, source, payload = protocol.unpack_binary(message)
+        except ValueError as e:
+            self.log(f"Error processing message: {e}")
+            return
+        if kind in (protocol.FRAME_CHUNK, protocol.SCREENSHOT_CHUNK):
+            try:
+                _, _, _, index, count, _ = protocol.unpack_chunk(message)
+            except ValueError as e:
+                self.log(f"Error processing message: {e}")
+                # Which frame an unreadable chunk belonged to is unknown, so it is acknowledged in case it was
+                # the last. A spare ack only lets the server send one more frame early, a missing one is never
+                # made up for and enough of them stall the live view
+                if kind == protocol.FRAME_CHUNK:
+                    await websocket.send(protocol.FRAME_ACK)
+                return
+            try:
+                assembled = self.codec.chunks.add(message)
+            except ValueError as e:
+                self.log(f"Error processing message: {e}")
+                assembled = None
+        if kind == protocol.FRAME_CHUNK:
+            # A chunked frame is acknowledged once, on its last chunk, even if it was discarded
+            if index == count - 1:
+                await websocket.send(protocol.FRAME_ACK)
+            if assembled is None:
+                return
+            source, payload = assembled
+        elif kind == protocol.FRAME_MESSAGE:
+            # Acknowledge on receipt so the server only keeps a bounded number of frames in flight
+            await websocket.send(protocol.FRAME_ACK)
+        else:
+            return
+        frame = Frame(source, payload)
+        self.publish('frame', frame, (frame,))
+
+    def drop_stale_connection(self, websocket):
+        """Abort a connection whose heartbeat stopped answering, run() then reconnects"""
+        self.log(f"Warning: no heartbeat reply for {self.heartbeat_max_missed} beats, reconnecting")
+        websocket.transport.abort()
+
+    def log_command_latency(self):
+        """Log round-trip latency percentiles for each command sent"""
+        for name, summary in self.commands.stats().items():
+            self.log(f"Command latency: {name} p50 {summary['p50_ms']:.0f} ms, p99 {summary['p99_ms']:.0f} ms, "
+                     f"max {summary['max_ms']:.0f} ms ({summary['count']} replies)")
+
+    # Subscriptions
+
+    def publish(self, kind, payload, items):
+        """Deliver a message, typed subscriptions get each of `items` and the rest the (kind, payload) pair"""
+        for subscription in list(self.subscriptions):
+            if subscription.kinds is None:
+                subscription.put((kind, payload))
+            elif kind in subscription.kinds:
+                for item in items:
+                    subscription.put(item)
+
+    def subscribe(self, kinds=None, maxsize=1000):
+        """Subscribe to messages of the given kinds, or (kind, payload) pairs of every kind"""
+        subscription = Subscription(self, kinds, maxsize)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def messages(self, maxsize=1000):
+        """Every status, log, log batch, screenshot, frame and unsolicited reply as (kind, payload) pairs"""
+        return self.subscribe(None, maxsize)
+
+    def status(self, maxsize=1):
+        """HeadsetStatus updates, by default only the latest is kept"""
+        return self.subscribe(('status',), maxsize)
+
+    def logs(self, maxsize=1000):
+        """LogEntry for each log message from the headset, batched or not"""
+        return self.subscribe(('logs', 'log_batch'), maxsize)
+
+    def frames(self, maxsize=2):
+        """Live view Frames, start_live_view() must be called for frames to arrive"""
+        return self.subscribe(('frame',), maxsize)
+
+    # Commands
+
+    async def send_command(self, command, quiet=False):
+        """
+        Send a command and wait for its reply, returns None if there was no reply in time. Quiet
+        commands, such as heartbeats, are not logged.
+        """
+        import asyncio
+
+        websocket = self.websocket
+        if not (websocket and self.connected):
+            return None
+
+        message, pending = self.commands.begin(command, self.codec.tagged, quiet)
+        try:
+            await websocket.send(message)
+            if not quiet:
+                self.log(f"Sent command: {command}")
+        except Exception as e:
+            # A dropped connection is picked up and reconnected by the receive loop
+            self.log(f"Error sending command: {e}")
+            return None
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending.future), self.command_timeout)
+        except asyncio.TimeoutError:
+            self.commands.abandon(pending)
+            if not quiet:
+                self.log(f"Warning: no reply to {command} within {self.command_timeout:.0f}s")
+        except asyncio.CancelledError:
+            if not pending.future.cancelled():
+                # The caller stopped waiting, rather than the connection closing
+                self.commands.abandon(pending)
+                raise
+        return None
+
+    async def screenshot(self):
+        """Capture every source, returns a list of encoded images or None"""
+        captures = await self.send_command("screenshot")
+        if not isinstance(captures, list):
+            return None
+        return [protocol.capture_bytes(capture) for capture in captures]
+
+    async def start_live_view(self, fps, max_in_flight=2):
+        return await self.send_command(protocol.live_view_start_command(fps, max_in_flight))
+
+    async def stop_live_view(self):
+        return await self.send_command(protocol.LIVE_VIEW_STOP)
+
+    async def start_task(self):
+        return await self.send_command("start_task")
+
+    async def start_calibration(self):
+        return await self.send_command("start_calibration")
+
+    async def set_fixation(self, required):
+        """Enable or disable the fixation requirement, returns True once the headset confirms it"""
+        reply = await self.send_command("enable_fixation" if required else "disable_fixation")
+        return reply == ("Fixation Enabled" if required else "Fixation Disabled")
+
+    async def end_experiment(self):
+        return await self.send_command("kill")
@@ -0,0 +1,135 @@
+"""Matching command replies to the commands that caused them, and round-trip latency statistics"""
+import bisect
+import itertools
+import time
+from collections import deque
+
+import protocol
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of round-trip times, cheap to update for every reply"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        milliseconds = seconds * 1000
+        self.counts[bisect.bisect_left(self.bounds, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given percentile, capped at the largest sample"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max,
+        }
+
+
+class PendingCommand:
+    """A sent command waiting for its reply"""
+
+    def __init__(self, command, request_id, future, quiet=False):
+        self.command = command
+        self.request_id = request_id
+        self.future = future
+        self.quiet = quiet
+        self.sent_at = time.perf_counter()
+        self.latency = None
+
+    @property
+    def name(self):
+        # Arguments such as live view rates aren't part of the command's identity
+        return self.command.split(':', 1)[0]
+
+
+class CommandTracker:
+    """
+    Matches replies to commands sent on one connection. Servers speaking protocol.TAGGED_VERSION
+    echo a request id; older servers reply in order, so untagged replies go to the oldest command
+    still waiting for that kind of reply. Must only be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.tagged = {}
+        self.untagged = {}
+        self.histograms = {}
+
+    def begin(self, command, tagged, quiet=False):
+        """Register a command about to be sent, returns the wire message and a PendingCommand"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        expects_reply = protocol.expects_reply(command)
+        request_id = next(self.ids) if tagged and expects_reply else None
+        pending = PendingCommand(command, request_id, loop.create_future(), quiet)
+        if expects_reply:
+            if tagged:
+                self.tagged[request_id] = pending
+            else:
+                self.untagged.setdefault(protocol.reply_kind(command), deque()).append(pending)
+        else:
+            pending.future.set_result(None)
+        return protocol.encode_command(command, request_id), pending
+
+    def resolve(self, kind, payload, request_id=None):
+        """Match a decoded message to the command it answers, returns the PendingCommand or None"""
+        if request_id is not None:
+            pending = self.tagged.pop(request_id, None)
+        else:
+            waiting = self.untagged.get(kind)
+            pending = waiting.popleft() if waiting else None
+        if pending is None:
+            return None
+
+        pending.latency = time.perf_counter() - pending.sent_at
+        self.histograms.setdefault(pending.name, LatencyHistogram()).record(pending.latency)
+        if not pending.future.done():
+            pending.future.set_result(payload)
+        return pending
+
+    def abandon(self, pending):
+        """
+        Stop waiting for a tagged reply. Untagged commands keep their place so that a late reply
+        isn't matched to a later command.
+        """
+        if pending.request_id is not None:
+            self.tagged.pop(pending.request_id, None)
+
+    def reset(self):
+        """Fail every outstanding command, e.g. when the connection closes"""
+        waiting = list(self.tagged.values())
+        for queue in self.untagged.values():
+            waiting.extend(queue)
+        for pending in waiting:
+            if not pending.future.done():
+                pending.future.cancel()
+        self.tagged = {}
+        self.untagged = {}
+
+    def stats(self):
+        return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
@@ -0,0 +1,23 @@
+"""Connection lifecycle helpers shared by single-headset and fleet connections"""
+import random
+
+
+class ReconnectPolicy:
+    """Jittered exponential backoff between reconnect attempts"""
+
+    def __init__(self, initial_delay=0.5, max_delay=30.0, multiplier=2.0, jitter=0.5, max_attempts=None):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+
+    def should_retry(self, attempt):
+        """Return True if another attempt is allowed after `attempt` failures"""
+        return self.max_attempts is None or attempt < self.max_attempts
+
+    def delay(self, attempt):
+        """Seconds to wait before reconnect attempt number `attempt`, counting from zero"""
+        base = min(self.max_delay, self.initial_delay * self.multiplier ** attempt)
+        # Spread reconnects out so several clients don't retry in lockstep
+        return base * (1.0 - self.jitter * random.random())
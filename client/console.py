@@ -0,0 +1,165 @@
+"""Bounded, virtualized log console backed by a ring buffer"""
+import tkinter as tk
+from collections import deque, namedtuple
+
+LogRecord = namedtuple('LogRecord', ['seq', 'timestamp', 'level', 'message'])
+
+# Level filters offered by the console, mapped to the levels they show
+LEVEL_FILTERS = {
+    "All": None,
+    "Warnings & Errors": frozenset(('warning', 'error')),
+    "Errors": frozenset(('error',)),
+}
+
+
+class LogBuffer:
+    """Fixed-capacity ring buffer of log records, the oldest records are discarded first"""
+
+    def __init__(self, capacity=20000):
+        self.records = deque(maxlen=capacity)
+        self.next_seq = 0
+
+    def append(self, timestamp, level, message):
+        record = LogRecord(self.next_seq, timestamp, level, message)
+        self.next_seq += 1
+        self.records.append(record)
+        return record
+
+    def oldest_seq(self):
+        return self.records[0].seq if self.records else self.next_seq
+
+    def clear(self):
+        self.records.clear()
+
+    def __len__(self):
+        return len(self.records)
+
+
+def matches(record, levels, query):
+    """Return True if a record passes the level filter and contains the search text"""
+    if levels is not None and record.level not in levels:
+        return False
+    return not query or query in record.message.lower()
+
+
+class ConsoleView:
+    """
+    Renders the visible window of a LogBuffer into a Text widget. The widget only ever holds the
+    rows on screen, scrolling and filtering re-render that window from the buffer. New records
+    are collected and rendered at most once per GUI tick.
+    """
+
+    def __init__(self, text, scrollbar, buffer, visible_lines):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.buffer = buffer
+        self.visible_lines = visible_lines
+
+        # Filtered records, None when showing the whole buffer
+        self.levels = None
+        self.query = ""
+        self.filtered = None
+
+        self.offset = 0
+        self.follow = True
+        self.dirty = False
+
+        self.scrollbar.config(command=self.on_scrollbar)
+        self.text.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.text.bind('<Button-4>', lambda _: self.scroll_by(-3))
+        self.text.bind('<Button-5>', lambda _: self.scroll_by(3))
+
+    def append(self, timestamp, level, message):
+        # Keep a scrolled-back window anchored when the buffer evicts its oldest record
+        if self.filtered is None and not self.follow and len(self.buffer) == self.buffer.records.maxlen:
+            self.offset = max(0, self.offset - 1)
+        record = self.buffer.append(timestamp, level, message)
+        if self.filtered is not None and matches(record, self.levels, self.query):
+            self.filtered.append(record)
+        self.dirty = True
+
+    def clear(self):
+        self.buffer.clear()
+        if self.filtered is not None:
+            self.filtered.clear()
+        self.offset = 0
+        self.follow = True
+        self.dirty = True
+        self.render()
+
+    def set_filter(self, levels, query):
+        """Filter the console by level and search text, scanning the buffer rather than the widget"""
+        self.levels = levels
+        self.query = query.lower()
+        if levels is None and not self.query:
+            self.filtered = None
+        else:
+            self.filtered = deque((r for r in self.buffer.records if matches(r, levels, self.query)),
+                                  maxlen=self.buffer.records.maxlen)
+        self.follow = True
+        self.dirty = True
+        self.render()
+
+    def records(self):
+        if self.filtered is None:
+            return self.buffer.records
+
+        # Drop filtered records already evicted from the buffer, in bulk
+        oldest = self.buffer.oldest_seq()
+        evicted = 0
+        while self.filtered and self.filtered[0].seq < oldest:
+            self.filtered.popleft()
+            evicted += 1
+        if evicted and not self.follow:
+            self.offset = max(0, self.offset - evicted)
+        return self.filtered
+
+    def scroll_by(self, lines):
+        self.scroll_to(self.offset + lines)
+        return 'break'
+
+    def scroll_to(self, offset):
+        count = len(self.records())
+        last = max(0, count - self.visible_lines)
+        self.offset = min(max(0, offset), last)
+        self.follow = self.offset >= last
+        self.dirty = True
+        self.render()
+
+    def on_mouse_wheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_scrollbar(self, action, *args):
+        count = len(self.records())
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(args[0]) * count))
+        elif action == tk.SCROLL:
+            step = self.visible_lines if args[1] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[0]) * step)
+
+    def render(self):
+        """Redraw the visible window if anything changed since the last render"""
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        records = self.records()
+        count = len(records)
+        if self.follow:
+            self.offset = max(0, count - self.visible_lines)
+
+        chunks = []
+        for index in range(self.offset, min(count, self.offset + self.visible_lines)):
+            record = records[index]
+            chunks.extend((f"[{record.timestamp}] {record.message}\n", record.level))
+
+        self.text.delete('1.0', tk.END)
+        if chunks:
+            self.text.insert('1.0', *chunks)
+            if self.follow:
+                # Wrapped lines can push the newest record below the visible area
+                self.text.see(tk.END)
+        if count:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + self.visible_lines) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
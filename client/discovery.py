@@ -0,0 +1,116 @@
+"""Concurrent discovery of Headsup servers on a subnet"""
+import asyncio
+import ipaddress
+import socket
+import time
+from collections import namedtuple
+
+import websockets
+
+import protocol
+
+# Largest range scan() accepts, a /16
+MAX_HOSTS = 65536
+
+DiscoveryResult = namedtuple('DiscoveryResult', ['host', 'latency', 'device_name', 'adb'])
+
+
+def local_network(prefix=24):
+    """Best guess at the CIDR range of the network this machine is on"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            # Connecting a UDP socket sends nothing, it only picks the outgoing interface
+            probe.connect(("10.255.255.255", 1))
+            address = probe.getsockname()[0]
+        except OSError:
+            address = "127.0.0.1"
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def network_hosts(cidr):
+    """Host addresses in a CIDR range, a bare address is a range of one"""
+    network = ipaddress.ip_network(cidr.strip(), strict=False)
+    if network.num_addresses > MAX_HOSTS:
+        raise ValueError(f"{cidr} has more than {MAX_HOSTS} addresses")
+    if network.num_addresses == 1:
+        return [str(network.network_address)]
+    return [str(host) for host in network.hosts()]
+
+
+class DiscoveryScanner:
+    """
+    Probes every host in a CIDR range for a Headsup server, a bounded number at a time. A host is
+    reported if it completes the WebSocket handshake and answers the `active` command. The device
+    name is taken from the first status broadcast, and the ADB port is optionally checked too.
+    """
+
+    def __init__(self, port=4444, adb_port=5555, check_adb=False, concurrency=128, timeout=0.5,
+                 status_timeout=1.2):
+        self.port = port
+        self.adb_port = adb_port
+        self.check_adb = check_adb
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.status_timeout = status_timeout
+        self.scanned = 0
+
+    async def probe_port(self, host, port):
+        """Return True if a TCP connection to host:port opens within the timeout"""
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def probe(self, host):
+        """Return a DiscoveryResult if a Headsup server answers at host, otherwise None"""
+        try:
+            async with websockets.connect(f"ws://{host}:{self.port}", open_timeout=self.timeout,
+                                          close_timeout=self.timeout) as websocket:
+                codec = protocol.MessageCodec()
+                sent_at = time.perf_counter()
+                await websocket.send("active")
+                latency = None
+                device_name = ""
+                deadline = sent_at + self.timeout + self.status_timeout
+                while latency is None or not device_name:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message = await asyncio.wait_for(websocket.recv(), remaining)
+                    except asyncio.TimeoutError:
+                        # No status broadcast in time, a server that answered is still reported
+                        break
+                    kind, payload = codec.decode(message)
+                    if kind == 'reply' and payload is True and latency is None:
+                        latency = time.perf_counter() - sent_at
+                    elif kind == 'status' and isinstance(payload, dict):
+                        device_name = payload.get('device_name', 'Unknown')
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            return None
+        if latency is None:
+            return None
+
+        adb = await self.probe_port(host, self.adb_port) if self.check_adb else None
+        return DiscoveryResult(host, latency, device_name or "Unknown", adb)
+
+    async def scan(self, cidr, on_result=None):
+        """Probe every host in `cidr`, calling `on_result(result)` as servers are found"""
+        hosts = network_hosts(cidr)
+        self.scanned = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = []
+
+        async def probe(host):
+            async with semaphore:
+                result = await self.probe(host)
+            self.scanned += 1
+            if result is not None:
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+
+        await asyncio.gather(*(probe(host) for host in hosts))
+        return sorted(results, key=lambda result: ipaddress.ip_address(result.host))
@@ -0,0 +1,119 @@
+"""Picker listing Headsup servers found by scanning a subnet"""
+import asyncio
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from discovery import DiscoveryScanner, local_network, network_hosts
+
+
+class DiscoveryWindow:
+    """Scans a CIDR range on the control panel's event loop and fills ip_var with the picked headset"""
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.refresh_interval_ms = 100
+        self.scanner = None
+        self.scan_future = None
+        self.refresh_job = None
+        self.total = 0
+
+        self.window = tk.Toplevel(gui.root)
+        self.window.title("Headsup: Find Headsets")
+        self.window.configure(bg=gui.bg_color)
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ttk.Frame(self.window, padding="12")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        controls = ttk.Frame(main_frame)
+        controls.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 8))
+        ttk.Label(controls, text="Network (CIDR):").grid(row=0, column=0, padx=(0, 4))
+        self.network_var = tk.StringVar(value=local_network())
+        network_entry = ttk.Entry(controls, textvariable=self.network_var, width=20)
+        network_entry.grid(row=0, column=1, padx=(0, 4))
+        network_entry.bind('<Return>', lambda _: self.toggle_scan())
+        self.check_adb_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls, text="Check ADB", variable=self.check_adb_var).grid(row=0, column=2, padx=4)
+        self.scan_btn = ttk.Button(controls, text="Scan", command=self.toggle_scan)
+        self.scan_btn.grid(row=0, column=3, padx=2)
+
+        columns = ('host', 'device', 'latency', 'adb')
+        self.results = ttk.Treeview(main_frame, columns=columns, show='headings', height=8, selectmode='browse')
+        for column, heading, width in zip(columns, ("IP Address", "Device", "Latency", "ADB"), (120, 180, 80, 60)):
+            self.results.heading(column, text=heading)
+            self.results.column(column, width=width, anchor=tk.W)
+        self.results.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.results.bind('<Double-1>', lambda _: self.use_selected())
+
+        footer = ttk.Frame(main_frame)
+        footer.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(8, 0))
+        footer.columnconfigure(0, weight=1)
+        self.progress_label = ttk.Label(footer, text="")
+        self.progress_label.grid(row=0, column=0, sticky=tk.W)
+        ttk.Button(footer, text="Use Selected", command=self.use_selected).grid(row=0, column=1)
+
+    def toggle_scan(self):
+        if self.scan_future is not None:
+            self.scan_future.cancel()
+            return
+
+        try:
+            self.total = len(network_hosts(self.network_var.get()))
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter a network of up to 65536 addresses, such as 192.168.1.0/24",
+                                 parent=self.window)
+            return
+        if self.gui.loop is None:
+            return
+
+        self.results.delete(*self.results.get_children())
+        port = self.gui.port_var.get()
+        self.scanner = DiscoveryScanner(port=int(port) if self.gui.validate_port(port) else 4444,
+                                        adb_port=int(self.gui.adb_port), check_adb=self.check_adb_var.get())
+        self.scan_future = asyncio.run_coroutine_threadsafe(
+            self.scanner.scan(self.network_var.get(), lambda result: self.gui.run_in_gui(self.add_result, result)),
+            self.gui.loop)
+        self.scan_btn.config(text="Stop")
+        self.refresh_job = self.window.after(self.refresh_interval_ms, self.refresh)
+
+    def add_result(self, result):
+        # Results from a stopped scan can still arrive after a new one started
+        if not self.window.winfo_exists() or self.results.exists(result.host):
+            return
+        adb = "-" if result.adb is None else ("Yes" if result.adb else "No")
+        self.results.insert('', tk.END, iid=result.host,
+                            values=(result.host, result.device_name, f"{result.latency * 1000:.0f} ms", adb))
+
+    def refresh(self):
+        """Show scan progress until the scan finishes"""
+        found = len(self.results.get_children())
+        self.progress_label.config(text=f"Scanned {self.scanner.scanned} of {self.total}, found {found}")
+        if not self.scan_future.done():
+            self.refresh_job = self.window.after(self.refresh_interval_ms, self.refresh)
+            return
+        self.refresh_job = None
+
+        if not self.scan_future.cancelled() and self.scan_future.exception() is not None:
+            self.gui.log(f"Discovery error: {self.scan_future.exception()}")
+        self.gui.log(f"Discovery: found {found} headsets on {self.network_var.get()}")
+        self.scan_future = None
+        self.scan_btn.config(text="Scan")
+
+    def use_selected(self):
+        selection = self.results.selection()
+        if not selection:
+            return
+        if self.gui.connected or self.gui.connecting:
+            messagebox.showerror("Connected", "Please disconnect before switching headsets", parent=self.window)
+            return
+        self.gui.ip_var.set(selection[0])
+        self.close()
+
+    def close(self):
+        if self.scan_future is not None:
+            self.scan_future.cancel()
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+        self.gui.discovery_window = None
+        self.window.destroy()
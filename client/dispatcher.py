@@ -0,0 +1,61 @@
+"""Bounded handoff of inbound messages from the network thread to the GUI"""
+import threading
+from collections import deque
+
+
+class InboundDispatcher:
+    """
+    Buffers inbound messages until the GUI drains them on its next tick. Message types listed in
+    `coalesce` only keep their latest message, per key if one is given, all other messages are kept in
+    arrival order up to `max_pending`, after which the oldest are dropped.
+    """
+
+    def __init__(self, coalesce=('status', 'screenshot', 'frame'), max_pending=1000):
+        self.coalesce = frozenset(coalesce)
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.ordered = deque()
+        self.sequence = 0
+
+        # Counters for messages that never reached the GUI
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, kind, message, key=None):
+        """Queue a message, safe to call from any thread. `key` coalesces e.g. frames per capture source"""
+        with self.lock:
+            self.sequence += 1
+            if kind in self.coalesce:
+                slot = kind if key is None else (kind, key)
+                if slot in self.latest:
+                    self.coalesced += 1
+                self.latest[slot] = (self.sequence, kind, message)
+                return
+
+            if len(self.ordered) >= self.max_pending:
+                self.ordered.popleft()
+                self.dropped += 1
+            self.ordered.append((self.sequence, kind, message))
+
+    def drain(self):
+        """Take all pending messages as (kind, message) pairs in arrival order"""
+        with self.lock:
+            if not self.ordered and not self.latest:
+                return []
+            items = list(self.ordered)
+            self.ordered.clear()
+            if self.latest:
+                items.extend(self.latest.values())
+                self.latest.clear()
+                items.sort(key=lambda item: item[0])
+        return [(kind, message) for _, kind, message in items]
+
+    def stats(self):
+        """Snapshot of the dispatcher counters"""
+        with self.lock:
+            return {
+                'pending': len(self.ordered) + len(self.latest),
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,186 @@
+"""Concurrent monitoring of several headsets from a single asyncio event loop"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from client import HeadsupClient
+from connection import ReconnectPolicy
+from frames import FrameDecoder
+from models import parse_status
+
+
+class HeadsetState:
+    """Latest known state of one headset, kept to a fixed size however long the session runs"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = "Disconnected"
+        self.device_name = "Offline"
+        self.device_battery = 0.0
+        self.current_block = "Inactive"
+        self.current_trial = 0
+        self.total_trials = 0
+        self.last_reply = ""
+        # Latest line logged by the headset's client, such as a connection error
+        self.last_log = ""
+        self.thumbnail = None
+
+    @property
+    def key(self):
+        return f"{self.host}:{self.port}"
+
+    def apply_status(self, status):
+        status = parse_status(status)
+        self.device_name = status.device_name
+        self.device_battery = status.device_battery
+        self.current_block = status.active_block
+        self.current_trial = status.current_trial
+        self.total_trials = status.total_trials
+
+
+class HeadsetConnection:
+    """
+    Runs a HeadsupClient for one headset and mirrors its connection state, status, replies and
+    screenshot thumbnails into a HeadsetState
+    """
+
+    def __init__(self, state, on_change, executor, thumbnail_size, thumbnail_interval=10.0, reconnect_policy=None):
+        self.state = state
+        self.on_change = on_change
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_interval = thumbnail_interval
+        # A fleet headset may be switched on after it was added, so connecting is retried until it is removed
+        self.client = HeadsupClient(state.host, state.port, reconnect_policy=reconnect_policy or ReconnectPolicy(),
+                                    initial_connect_attempts=None, on_log=self.set_log,
+                                    on_state=self.update_connection)
+        self.task = None
+        self.decoder = FrameDecoder(on_frame=self.set_thumbnail, executor=executor)
+
+    def set_thumbnail(self, image):
+        # Called from a decode worker, a single attribute store is safe to hand across
+        self.state.thumbnail = image
+        self.on_change(self.state.key)
+
+    def set_log(self, message):
+        self.state.last_log = message
+
+    def update_connection(self):
+        client = self.client
+        if client.connected:
+            connection = "Connected"
+        elif client.reconnecting:
+            connection = "Reconnecting"
+        elif client.connecting:
+            connection = "Connecting..."
+        else:
+            connection = "Disconnected"
+        if connection != self.state.connection:
+            self.state.connection = connection
+            self.on_change(self.state.key)
+
+    async def run(self):
+        """Run the client until it is closed, applying every message it receives to the state"""
+        messages = self.client.messages()
+        self.client.start()
+        thumbnails = asyncio.ensure_future(self.poll_thumbnails())
+        try:
+            async for kind, payload in messages:
+                self.handle_message(kind, payload)
+        finally:
+            thumbnails.cancel()
+            messages.close()
+
+    def handle_message(self, kind, payload):
+        try:
+            if kind == 'status':
+                self.state.apply_status(payload)
+                self.on_change(self.state.key)
+            elif kind == 'screenshot':
+                screenshots = payload
+                if screenshots:
+                    self.decoder.submit(screenshots[0], self.thumbnail_size)
+            elif kind == 'reply':
+                self.state.last_reply = str(payload)
+                self.on_change(self.state.key)
+        except (ValueError, TypeError, RuntimeError) as e:
+            self.state.last_log = f"Error processing message: {e}"
+
+    async def poll_thumbnails(self):
+        """Request a screenshot every thumbnail_interval seconds while connected, the reply arrives as a message"""
+        while self.thumbnail_interval > 0:
+            if not self.client.connected:
+                await asyncio.sleep(0.5)
+                continue
+            await self.client.send_command("screenshot")
+            await asyncio.sleep(self.thumbnail_interval)
+
+    async def send(self, command):
+        """Send a command, returns True if the headset replied in time"""
+        return await self.client.send_command(command) is not None
+
+    async def close(self):
+        self.decoder.shutdown()
+        await self.client.close()
+
+
+class FleetManager:
+    """
+    Manages connections to many headsets on one asyncio event loop. Methods are safe to call
+    from the GUI thread, per-headset changes are collected until the view takes them.
+    """
+
+    def __init__(self, loop, thumbnail_size=(96, 54), thumbnail_interval=10.0, decode_workers=2):
+        self.loop = loop
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_interval = thumbnail_interval
+        self.connections = {}
+        self.executor = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="headsup-fleet")
+        self.lock = threading.Lock()
+        self.changed = set()
+
+    def mark_changed(self, key):
+        with self.lock:
+            self.changed.add(key)
+
+    def take_changed(self):
+        """Return the keys of headsets that changed since the last call"""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        return changed
+
+    def states(self):
+        return [connection.state for connection in list(self.connections.values())]
+
+    def add(self, host, port, reconnect_policy=None):
+        state = HeadsetState(host, port)
+        if state.key in self.connections:
+            return None
+        connection = HeadsetConnection(state, self.mark_changed, self.executor, self.thumbnail_size,
+                                       self.thumbnail_interval, reconnect_policy)
+        self.connections[state.key] = connection
+
+        def start():
+            connection.task = self.loop.create_task(connection.run())
+        self.loop.call_soon_threadsafe(start)
+        return state
+
+    def remove(self, key):
+        connection = self.connections.pop(key, None)
+        if connection is not None:
+            asyncio.run_coroutine_threadsafe(connection.close(), self.loop)
+
+    def send(self, command, keys=None):
+        """Send a command to the given headsets, or all of them, concurrently"""
+        targets = [connection for key, connection in list(self.connections.items()) if keys is None or key in keys]
+        return asyncio.run_coroutine_threadsafe(self._fan_out(command, targets), self.loop)
+
+    async def _fan_out(self, command, targets):
+        """Map each headset to whether it replied to the command"""
+        results = await asyncio.gather(*(connection.send(command) for connection in targets), return_exceptions=True)
+        return {connection.state.key: result is True for connection, result in zip(targets, results)}
+
+    def shutdown(self):
+        for key in list(self.connections):
+            self.remove(key)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,191 @@
+"""Compact per-headset grid for monitoring a fleet from one control panel"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from fleet import FleetManager
+from surface import FrameSurface
+
+
+class FleetRow:
+    """Widgets showing one headset in the fleet grid"""
+
+    def __init__(self, parent, row, key, thumbnail_size):
+        self.key = key
+        self.selected = tk.BooleanVar(value=True)
+        self.thumbnail_size = thumbnail_size
+        # The thumbnail last drawn, a new one is pasted into the same PhotoImage
+        self.drawn_thumbnail = None
+
+        self.check = ttk.Checkbutton(parent, variable=self.selected)
+        self.check.grid(row=row, column=0, padx=(0, 4))
+        self.thumbnail = tk.Canvas(parent, width=thumbnail_size[0], height=thumbnail_size[1],
+                                   bg='black', highlightthickness=0)
+        self.thumbnail.grid(row=row, column=1, padx=4, pady=2)
+        self.surface = FrameSurface(self.thumbnail, max_sizes=1)
+        self.name_label = ttk.Label(parent, text=key, style='Bold.TLabel', width=20)
+        self.name_label.grid(row=row, column=2, sticky=tk.W, padx=4)
+        self.status_label = ttk.Label(parent, text="Connecting...", width=14)
+        self.status_label.grid(row=row, column=3, sticky=tk.W, padx=4)
+        self.battery_label = ttk.Label(parent, text="-", width=6)
+        self.battery_label.grid(row=row, column=4, sticky=tk.W, padx=4)
+        self.progress_bar = ttk.Progressbar(parent, length=100, mode='determinate')
+        self.progress_bar.grid(row=row, column=5, padx=4)
+        self.trial_label = ttk.Label(parent, text="0 / 0", width=10)
+        self.trial_label.grid(row=row, column=6, sticky=tk.W, padx=4)
+
+    def update(self, state):
+        self.name_label.config(text=f"{state.device_name} ({state.host})")
+        self.status_label.config(text=state.connection)
+        self.battery_label.config(text=f"{state.device_battery:.0%}")
+        if state.total_trials > 0:
+            self.progress_bar['value'] = state.current_trial / state.total_trials * 100
+        else:
+            self.progress_bar['value'] = 0
+        self.trial_label.config(text=f"{state.current_trial} / {state.total_trials}")
+
+        # Status changes far more often than the thumbnail, which is only redrawn when a new one arrives
+        thumbnail = state.thumbnail
+        if thumbnail is not None and thumbnail is not self.drawn_thumbnail:
+            self.drawn_thumbnail = thumbnail
+            width, height = self.thumbnail_size
+            self.surface.draw('thumbnail', thumbnail, (width - thumbnail.width) // 2, (height - thumbnail.height) // 2)
+
+    def destroy(self):
+        for widget in (self.check, self.thumbnail, self.name_label, self.status_label,
+                       self.battery_label, self.progress_bar, self.trial_label):
+            widget.destroy()
+
+
+class FleetWindow:
+    """Fleet monitoring window, all headsets share the control panel's event loop"""
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.refresh_interval_ms = 250
+        self.thumbnail_size = (96, 54)
+        self.manager = FleetManager(gui.loop, thumbnail_size=self.thumbnail_size)
+        self.rows = {}
+        # Grid row for the next headset, never reused so removing a headset can't leave two on one row
+        self.next_row = 0
+
+        self.window = tk.Toplevel(gui.root)
+        self.window.title("Headsup: Fleet")
+        self.window.configure(bg=gui.bg_color)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ttk.Frame(self.window, padding="12")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # Headset list controls
+        controls = ttk.Frame(main_frame)
+        controls.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 8))
+        ttk.Label(controls, text="Headset IP Address:").grid(row=0, column=0, padx=(0, 4))
+        self.host_var = tk.StringVar()
+        host_entry = ttk.Entry(controls, textvariable=self.host_var, width=20)
+        host_entry.grid(row=0, column=1, padx=(0, 4))
+        host_entry.bind('<Return>', lambda _: self.add_headset())
+        ttk.Button(controls, text="Add", command=self.add_headset).grid(row=0, column=2, padx=2)
+        ttk.Button(controls, text="Remove Selected", command=self.remove_selected).grid(row=0, column=3, padx=2)
+
+        # Fan-out commands
+        commands = ttk.Frame(main_frame)
+        commands.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 8))
+        ttk.Button(commands, text="Start Task on Selected",
+                   command=lambda: self.send_selected("start_task")).grid(row=0, column=0, padx=2)
+        ttk.Button(commands, text="Start Calibration on Selected",
+                   command=lambda: self.send_selected("start_calibration")).grid(row=0, column=1, padx=2)
+        ttk.Button(commands, text="Refresh Thumbnails",
+                   command=lambda: self.send_selected("screenshot")).grid(row=0, column=2, padx=2)
+        ttk.Button(commands, text="Kill All", command=self.kill_all).grid(row=0, column=3, padx=2)
+        ttk.Button(commands, text="Launch App on Selected",
+                   command=self.launch_selected).grid(row=1, column=0, padx=2, pady=(4, 0))
+        ttk.Button(commands, text="Quit App on Selected",
+                   command=self.quit_selected).grid(row=1, column=1, padx=2, pady=(4, 0))
+
+        self.grid_frame = ttk.LabelFrame(main_frame, text="Headsets", padding="8")
+        self.grid_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.window.after(self.refresh_interval_ms, self.refresh)
+
+    def add_headset(self):
+        value = self.host_var.get().strip()
+        host, _, port = value.partition(':')
+        port = port or self.gui.port_var.get()
+        if not self.gui.validate_ip(host) or not self.gui.validate_port(port):
+            messagebox.showerror("Invalid Input", "Please enter a valid IP address", parent=self.window)
+            return
+
+        state = self.manager.add(host, int(port))
+        if state is None:
+            return
+        self.rows[state.key] = FleetRow(self.grid_frame, self.next_row, state.key, self.thumbnail_size)
+        self.next_row += 1
+        self.host_var.set("")
+        self.gui.log(f"Fleet: added {state.key}")
+
+    def selected_keys(self):
+        return {key for key, row in self.rows.items() if row.selected.get()}
+
+    def remove_selected(self):
+        for key in self.selected_keys():
+            self.manager.remove(key)
+            self.rows.pop(key).destroy()
+
+    def send_selected(self, command):
+        keys = self.selected_keys()
+        if keys:
+            self.send(command, keys)
+
+    def kill_all(self):
+        if messagebox.askyesno("Confirm", "Are you sure you want to end the experiment on all headsets?",
+                               parent=self.window):
+            self.send("kill", None)
+
+    def send(self, command, keys):
+        future = self.manager.send(command, keys)
+
+        def report(future):
+            results = future.result()
+            confirmed = sum(results.values())
+            self.gui.log(f"Fleet: {command} confirmed by {confirmed} of {len(results)} headsets")
+        future.add_done_callback(report)
+
+    def selected_serials(self):
+        """ADB serials of the selected headsets"""
+        return [f"{key.rpartition(':')[0]}:{self.gui.adb_port}" for key in sorted(self.selected_keys())]
+
+    def launch_selected(self):
+        serials = self.selected_serials()
+        if serials and self.gui.adb is not None:
+            self.report_adb("launched", self.gui.adb.launch(serials, self.gui.package_name))
+
+    def quit_selected(self):
+        serials = self.selected_serials()
+        if not serials or self.gui.adb is None:
+            return
+        if messagebox.askyesno("Confirm Quit", "Are you sure you want to quit the application on the selected "
+                               "headsets? If an experiment is running, all data will be lost.", parent=self.window):
+            self.report_adb("quit", self.gui.adb.quit(serials, self.gui.package_name))
+
+    def report_adb(self, action, future):
+        def report(future):
+            results = future.result()
+            for serial, result in results.items():
+                if isinstance(result, BaseException):
+                    self.gui.log(f"Fleet: ADB error on {serial}: {str(result) or 'cancelled'}")
+            succeeded = sum(not isinstance(result, BaseException) for result in results.values())
+            self.gui.log(f"Fleet: {action} application on {succeeded} of {len(results)} headsets")
+        future.add_done_callback(report)
+
+    def refresh(self):
+        """Redraw only the rows of headsets that changed since the last refresh"""
+        changed = self.manager.take_changed()
+        for state in self.manager.states():
+            if state.key in changed and state.key in self.rows:
+                self.rows[state.key].update(state)
+        self.window.after(self.refresh_interval_ms, self.refresh)
+
+    def close(self):
+        self.manager.shutdown()
+        self.gui.fleet_window = None
+        self.window.destroy()
@@ -0,0 +1,225 @@
+"""Screenshot decoding pipeline, keeps image work off the Tk event thread"""
+import base64
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import profiler
+
+
+def fit_size(width, height, target_width, target_height):
+    """Calculate aspect ratio preserving dimensions that fit within the target area"""
+    img_ratio = width / height
+    target_ratio = target_width / target_height
+
+    if img_ratio > target_ratio:
+        # Image is wider than target
+        return target_width, max(1, int(target_width / img_ratio))
+    # Image is taller than target
+    return max(1, int(target_height * img_ratio)), target_height
+
+
+def decode_frame(data, target_size):
+    """Decode a JPEG/PNG frame, raw or base64 encoded, and downscale it to fit the target size"""
+    # PIL is imported on first use, on a decode worker rather than during startup
+    from PIL import Image
+
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    image = Image.open(io.BytesIO(data))
+
+    # JPEG frames can be decoded at a reduced scale, skipping most of the full-size decode
+    image.draft('RGB', target_size)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    new_size = fit_size(image.width, image.height, *target_size)
+    if new_size != image.size:
+        image = image.resize(new_size, Image.Resampling.LANCZOS)
+    return image
+
+
+def decode_frame_sizes(data, target_sizes, pool=None):
+    """
+    Decode a frame once and scale it to fit each of the target sizes, returned in the same order. With
+    a pool the results are copied into its buffers, which the caller hands back with pool.release()
+    """
+    from PIL import Image
+
+    largest = max(target_sizes, key=lambda size: size[0] * size[1])
+    image = decode_frame(data, largest)
+    images = []
+    for target_size in target_sizes:
+        new_size = fit_size(image.width, image.height, *target_size)
+        scaled = image if new_size == image.size else image.resize(new_size, Image.Resampling.BILINEAR)
+        if pool is not None:
+            buffer = pool.acquire(new_size)
+            buffer.paste(scaled)
+            scaled = buffer
+        images.append(scaled)
+    return images
+
+
+class ImagePool:
+    """
+    Display-sized RGB images kept for reuse. PIL can't scale into an existing image, so scaled frames
+    are copied into pooled buffers instead, and the images held between the decode workers and the Tk
+    thread are recycled rather than allocated per frame. Up to `per_size` free buffers of each size are
+    kept, sizes not used for a while are dropped when more than `max_sizes` are in use.
+    """
+
+    def __init__(self, per_size=8, max_sizes=8):
+        self.per_size = per_size
+        self.max_sizes = max_sizes
+        self.lock = threading.Lock()
+        self.free = {}
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, size):
+        """Take a buffer of the given size, safe to call from any thread"""
+        from PIL import Image
+
+        with self.lock:
+            buffers = self.free.pop(size, None)
+            if buffers:
+                self.free[size] = buffers  # Most recently used size last
+                self.reused += 1
+                return buffers.pop()
+            if buffers is not None:
+                self.free[size] = buffers
+            self.allocated += 1
+        return Image.new('RGB', size)
+
+    def release(self, image):
+        """Return a buffer from acquire() once nothing refers to it any more"""
+        with self.lock:
+            buffers = self.free.setdefault(image.size, [])
+            if len(buffers) < self.per_size:
+                buffers.append(image)
+            while len(self.free) > self.max_sizes:
+                del self.free[next(iter(self.free))]
+
+
+class FrameRateGovernor:
+    """Admits frames no faster than a target rate, frames arriving early are skipped"""
+
+    def __init__(self, fps):
+        self.interval = 0.0
+        self.next_time = 0.0
+        self.skipped_frames = 0
+        self.set_rate(fps)
+
+    def set_rate(self, fps):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.next_time = 0.0
+
+    def admit(self, now=None):
+        """Return True if a frame arriving now should be displayed"""
+        now = time.monotonic() if now is None else now
+
+        # Allow frames slightly ahead of schedule, a source streaming at the same rate would
+        # otherwise lose every other frame to arrival jitter
+        if now < self.next_time - self.interval * 0.25:
+            self.skipped_frames += 1
+            return False
+
+        # Advance from the scheduled slot so arrival jitter doesn't lower the rate, unless idle
+        if now - self.next_time > self.interval:
+            self.next_time = now + self.interval
+        else:
+            self.next_time += self.interval
+        return True
+
+
+class FrameDecoder:
+    """
+    Decodes screenshots on a worker pool. At most one frame is decoded at a time, and a frame
+    arriving while another is in flight replaces any frame still waiting, so stale frames are
+    dropped instead of queued. Callbacks are invoked from the worker thread.
+    """
+
+    def __init__(self, on_frame, on_error=None, max_workers=2, executor=None, decode=None):
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.decode = decode or decode_frame
+        # Decoders may share a pool, only a decoder owning its pool shuts it down
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="headsup-decode")
+        self.lock = threading.Lock()
+        self.in_flight = False
+        self.pending = None
+        self.dropped_frames = 0
+
+    def submit(self, encoded, target_size):
+        """Queue a frame for decoding, replacing any frame still waiting for a worker"""
+        with self.lock:
+            if self.in_flight:
+                if self.pending is not None:
+                    self.dropped_frames += 1
+                self.pending = (encoded, target_size)
+                return
+            self.in_flight = True
+        self.executor.submit(self._run, encoded, target_size)
+
+    def _run(self, encoded, target_size):
+        while True:
+            try:
+                with profiler.span('decode.frame'):
+                    image = self.decode(encoded, target_size)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+            else:
+                self.on_frame(image)
+
+            # Pick up the newest frame that arrived while decoding, if any
+            with self.lock:
+                if self.pending is None:
+                    self.in_flight = False
+                    return
+                encoded, target_size = self.pending
+                self.pending = None
+
+    def shutdown(self):
+        """Stop accepting frames and release the worker pool"""
+        with self.lock:
+            self.pending = None
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+class MultiSourceDecoder:
+    """
+    Decodes frames from every capture source in parallel, with a FrameDecoder per source on one shared
+    pool so a large frame from one source doesn't hold up the others. Each frame is decoded once and
+    scaled to every target size, `on_frame(source, images, tag)` is called from the worker thread with
+    the tag the frame was submitted with.
+    """
+
+    def __init__(self, on_frame, on_error=None, max_workers=4, pool=None):
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="headsup-decode")
+        self.decoders = {}
+
+    def submit(self, source, encoded, target_sizes, tag=None):
+        """Queue a frame from `source`, replacing any frame from the same source still waiting"""
+        decoder = self.decoders.get(source)
+        if decoder is None:
+            # The tag travels with the target sizes through the FrameDecoder
+            decoder = self.decoders[source] = FrameDecoder(
+                lambda result: self.on_frame(source, *result), self.on_error, executor=self.executor,
+                decode=lambda data, job: (decode_frame_sizes(data, job[0], self.pool), job[1]))
+        decoder.submit(encoded, (target_sizes, tag))
+
+    @property
+    def dropped_frames(self):
+        return sum(decoder.dropped_frames for decoder in self.decoders.values())
+
+    def shutdown(self):
+        for decoder in self.decoders.values():
+            decoder.shutdown()
+        self.executor.shutdown(wait=False)
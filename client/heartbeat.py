@@ -0,0 +1,83 @@
+"""Application-level heartbeat measuring link quality with the server's `active` command"""
+import time
+from collections import deque
+
+from models import UNKNOWN, LinkQuality
+from stats import percentile
+
+
+class HeartbeatMonitor:
+    """
+    Sends `probe()` every `interval` seconds and records how long the reply takes. A beat without a
+    reply within `timeout` is missed, and `max_missed` consecutive misses mark the link stale, so a
+    dead link is detected within max_missed * max(interval, timeout) seconds. The latest LinkQuality is
+    published as a single attribute, safe to read from any thread.
+    """
+
+    def __init__(self, probe, interval=1.0, timeout=2.0, max_missed=3, window=60, on_update=None, on_stale=None):
+        self.probe = probe
+        self.interval = interval
+        self.timeout = timeout
+        self.max_missed = max_missed
+        self.on_update = on_update
+        self.on_stale = on_stale
+        self.rtts = deque(maxlen=window)
+        # Whether each recent beat was answered, for the loss rate
+        self.answered = deque(maxlen=window)
+        self.jitter = 0.0
+        self.sent = 0
+        self.missed = 0
+        self.consecutive_missed = 0
+        self.quality = UNKNOWN
+
+    def record(self, rtt):
+        if self.rtts:
+            # Smoothed inter-arrival jitter, as in RFC 3550
+            self.jitter += (abs(rtt - self.rtts[-1]) - self.jitter) / 16
+        self.rtts.append(rtt)
+        self.answered.append(True)
+        self.consecutive_missed = 0
+
+    def record_missed(self):
+        self.answered.append(False)
+        self.missed += 1
+        self.consecutive_missed += 1
+
+    def level(self, p95_ms, jitter_ms):
+        if self.consecutive_missed >= self.max_missed:
+            return 'stale'
+        loss = self.answered.count(False) / len(self.answered) if self.answered else 0.0
+        if self.consecutive_missed or loss > 0.1 or p95_ms > 250:
+            return 'poor'
+        if loss > 0.02 or p95_ms > 100 or jitter_ms > 30:
+            return 'fair'
+        return 'good'
+
+    def publish(self):
+        rtts = [rtt * 1000 for rtt in self.rtts]
+        p95 = percentile(rtts, 0.95)
+        jitter = self.jitter * 1000
+        self.quality = LinkQuality(self.level(p95, jitter), rtts[-1] if rtts and not self.consecutive_missed else None,
+                                   percentile(rtts, 0.5), p95, jitter, self.sent, self.missed, self.consecutive_missed)
+        if self.on_update is not None:
+            self.on_update(self.quality)
+
+    async def run(self):
+        import asyncio
+
+        while True:
+            started = time.perf_counter()
+            self.sent += 1
+            try:
+                reply = await asyncio.wait_for(self.probe(), self.timeout)
+            except asyncio.TimeoutError:
+                reply = None
+            if reply is None:
+                self.record_missed()
+            else:
+                self.record(time.perf_counter() - started)
+            self.publish()
+
+            if self.consecutive_missed == self.max_missed and self.on_stale is not None:
+                self.on_stale()
+            await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
@@ -1,31 +1,41 @@
 #!/usr/bin/env python3
 import tkinter as tk
-from tkinter import ttk, messagebox
-import asyncio
-import websockets
-import json
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import threading
 import queue
-import base64
-from PIL import Image, ImageTk
-import io
 import re
 import os
-import subprocess
+import math
+import time
+
+from console import ConsoleView, LogBuffer, LEVEL_FILTERS
+from connection import ReconnectPolicy
+from dispatcher import InboundDispatcher
+from surface import FrameSurface, Sparkline
+from telemetry import TelemetryStore, format_duration
+from viewmodel import ViewModel
+from models import LEVELS, UNKNOWN, parse_log_batch, parse_status
+from profiling import profiler, watch_event_loop
+
+# asyncio, websockets and PIL take longer to import than the rest of startup put together, so they
+# and the modules that use them are imported on first use
+
+# Console tag for each Unity log type sent in log batches
+LOG_TAGS = {'log': 'info', 'warning': 'warning', 'error': 'error', 'assert': 'error', 'exception': 'error'}
 
 class HeadsupGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Headsup: Control Panel")
-        self.root.geometry("700x600")
+        self.root.geometry("700x630")
         self.root.resizable(False, False)
 
         # Set window icon
         icon_path = os.path.join(os.path.dirname(__file__), "Headsup_Icon.png")
         if os.path.exists(icon_path):
-            icon_image = Image.open(icon_path)
-            icon_photo = ImageTk.PhotoImage(icon_image)
+            # Tk reads PNG itself, no need for PIL here
+            icon_photo = tk.PhotoImage(file=icon_path)
             self.root.iconphoto(True, icon_photo)
             self.root.icon_image = icon_photo  # Keep a reference to prevent garbage collection
         else:
@@ -67,21 +77,49 @@ class HeadsupGUI:
         # Configure the root window
         self.root.configure(bg=self.bg_color)
 
-        # WebSocket state
-        self.websocket = None
-        self.connected = False
-        self.connecting = False
-        self.connection_error = False
-        self.message_queue = queue.Queue()
+        # Connection to the headset, a new client is started for each connect
+        self.client = None
+        self.dispatcher = InboundDispatcher()
+        self.dispatch_interval_ms = 20
+
+        # Lock-free handoff from other threads, drained on each GUI tick since Tk must only be
+        # touched from its own thread
+        self.log_queue = queue.SimpleQueue()
+        self.gui_calls = queue.SimpleQueue()
+
+        # Widget options are set through the view model and applied once per GUI tick, only where they changed
+        self.view = ViewModel()
+        # The event loop thread is started on first use, see start_event_loop
         self.ws_thread = None
-        self.should_connect = False
         self.loop = None
 
+        # Connection lifecycle, reconnecting with backoff after a drop
+        self.reconnect_policy = ReconnectPolicy(initial_delay=0.5, max_delay=15.0)
+        self.initial_connect_attempts = 3
+        self.clear_on_connect = False
+
+        # A command without a reply within command_timeout is given up on
+        self.command_timeout = 5.0
+
+        # Keepalive, a connection without a pong within ping_timeout is treated as dropped
+        self.ping_interval = 5.0
+        self.ping_timeout = 10.0
+
+        # Heartbeat through the server's `active` command, which also checks the Unity side is
+        # responsive. A connection is dropped and reconnected after heartbeat_max_missed missed beats.
+        self.heartbeat_interval = 1.0
+        self.heartbeat_timeout = 2.0
+        self.heartbeat_max_missed = 3
+
         # ADB Configuration
         self.package_name = "com.BrainDevelopmentandDisordersLab.task_vr_rdk"
         self.adb_port = "5555" # Default ADB port
         self.application_launched = False
 
+        # ADB runs on the event loop, adb_pending is the launch or quit still in progress
+        self.adb = None
+        self.adb_pending = None
+
         # Headset state
         self.device_name = "Offline"
         self.device_model = "Offline"
@@ -92,12 +130,60 @@ class HeadsupGUI:
         self.fixation_required = True
         self.screenshot_data = []
 
+        # Session history of the numeric status fields, sampled at most once a second. Rates and the ETA
+        # are taken over the last trend_window seconds, the sparklines show the whole history
+        self.telemetry = TelemetryStore(('device_battery', 'current_trial', 'total_trials'))
+        self.trend_window = 300
+        self.sparkline_points = 120
+
+        # Images from every capture source are decoded and resized off the Tk thread into pooled buffers, the
+        # decoder and pool are created with the first one. Decoded images are cached per source, so switching
+        # views needs no new capture, and drawn onto the canvas through a FrameSurface that reuses PhotoImages
+        self.image_decoder = None
+        self.image_pool = None
+        self.source_count = 0
+        self.source_images = {}
+        # Bumped whenever cached images are dropped for a new tile layout, images decoded for an older
+        # layout are discarded when they arrive
+        self.layout_generation = 0
+
+        # Live view streaming state, a governor per capture source is created as its first frame arrives
+        self.live_view_active = False
+        self.live_view_max_in_flight = 2
+        self.live_view_fps = 0.0
+        self.frame_governors = None
+
+        # Session recording, written to a new directory under recordings_dir
+        self.recorder = None
+        self.recordings_dir = os.path.join(os.path.expanduser("~"), "Headsup Recordings")
+        self.replay_window = None
+
+        # Multi-headset monitoring and subnet discovery windows
+        self.fleet_window = None
+        self.discovery_window = None
+
         # Task and calibration state
         self.task_started = False
         self.calibration_started = False
 
+        # Profiling is toggled with F12, Shift-F12 also records a trace. A GUI tick later than
+        # stall_threshold_ms is reported while profiling.
+        self.stall_threshold_ms = 200
+        self.profile_summary_spans = 12
+        self.last_tick = None
+
+        # Lines of an error's stack trace shown in the console, the full trace is kept in recordings
+        self.stack_trace_lines = 4
+
         self.setup_gui()
-        self.setup_websocket_thread()
+        self.root.bind('<F12>', lambda _: self.toggle_profiling())
+        self.root.bind('<Shift-F12>', lambda _: self.toggle_profiling(trace=True))
+        self.root.after(self.dispatch_interval_ms, self.drain_messages)
+
+        # HEADSUP_PROFILE=1 profiles from startup, HEADSUP_PROFILE=trace also records a trace
+        profile = os.environ.get("HEADSUP_PROFILE")
+        if profile:
+            self.toggle_profiling(trace=profile == "trace")
 
     def setup_gui(self):
         # Create main container with reduced padding
@@ -115,16 +201,27 @@ class HeadsupGUI:
         # IP Address with reduced padding
         ttk.Label(adb_controls_frame, text="Headset IP Address:").grid(row=0, column=0, padx=(0, 4))
         self.ip_var = tk.StringVar(value="localhost")
-        self.ip_entry = ttk.Entry(adb_controls_frame, textvariable=self.ip_var, width=20)
-        self.ip_entry.grid(row=0, column=1, padx=(0, 12))
+        self.ip_entry = ttk.Entry(adb_controls_frame, textvariable=self.ip_var, width=16)
+        self.ip_entry.grid(row=0, column=1, padx=(0, 4))
+
+        # Subnet scan for headsets
+        self.find_btn = ttk.Button(adb_controls_frame, text="Find...", width=6, command=self.open_discovery)
+        self.find_btn.grid(row=0, column=2, padx=(0, 12))
 
         # Launch button
         self.launch_btn = ttk.Button(adb_controls_frame, text="Launch Application", command=self.launch_application)
-        self.launch_btn.grid(row=0, column=2, padx=2)
+        self.launch_btn.grid(row=0, column=3, padx=2)
 
         # Quit button
         self.quit_btn = ttk.Button(adb_controls_frame, text="Quit Application", command=self.quit_application, state=tk.DISABLED)
-        self.quit_btn.grid(row=0, column=3, padx=2)
+        self.quit_btn.grid(row=0, column=4, padx=2)
+
+        # Session recording and replay
+        self.record_btn = ttk.Button(adb_controls_frame, text="Record Session", command=self.toggle_recording)
+        self.record_btn.grid(row=0, column=5, padx=(12, 2))
+
+        self.replay_btn = ttk.Button(adb_controls_frame, text="Replay Session", command=self.open_replay)
+        self.replay_btn.grid(row=0, column=6, padx=2)
 
         ws_controls_frame = ttk.Frame(conn_frame)
         ws_controls_frame.grid(row=1, column=0, columnspan=7, sticky=(tk.W, tk.E))
@@ -148,6 +245,20 @@ class HeadsupGUI:
         self.status_label = ttk.Label(ws_controls_frame, text="Disconnected", style='Status.TLabel')
         self.status_label.grid(row=0, column=4, sticky=tk.W)
 
+        # Link quality from the heartbeat, one bar per level above stale
+        self.link_canvas = tk.Canvas(ws_controls_frame, width=18, height=14,
+                                     bg=self.bg_color, highlightthickness=0)
+        self.link_canvas.grid(row=0, column=5, padx=(12, 4))
+        for bar in range(len(LEVELS) - 1):
+            self.link_canvas.create_rectangle(2 + bar * 5, 11 - bar * 4, 5 + bar * 5, 13,
+                                              fill=self.disabled_color, outline='', tags=f'bar{bar}')
+        self.link_label = ttk.Label(ws_controls_frame, text="", width=9)
+        self.link_label.grid(row=0, column=6, sticky=tk.W)
+
+        # Fleet monitoring
+        self.fleet_btn = ttk.Button(ws_controls_frame, text="Fleet View", command=self.open_fleet_view)
+        self.fleet_btn.grid(row=0, column=7, padx=(8, 0))
+
         # Status and Screenshot container
         content_frame = ttk.Frame(main_frame)
         content_frame.grid(row=1, column=0, columnspan=7, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -220,6 +331,28 @@ class HeadsupGUI:
                                 command=self.end_experiment, state=tk.DISABLED)
         self.end_btn.grid(row=0, column=1, padx=4, sticky=tk.W)
 
+        # Session trends, battery drain and trial throughput with the history as sparklines
+        ttk.Label(status_frame, text="Session Trends", style='Bold.TLabel').grid(row=7, column=0, sticky=tk.W, pady=(8, 8))
+        trends_frame = ttk.Frame(status_frame)
+        trends_frame.grid(row=8, column=0, sticky=(tk.W, tk.E))
+
+        ttk.Label(trends_frame, text="Battery:").grid(row=0, column=0, sticky=tk.W, padx=(0, 8))
+        self.battery_sparkline = Sparkline(trends_frame, color=self.accent_color, background=self.bg_color)
+        self.battery_sparkline.canvas.grid(row=0, column=1, pady=2)
+        self.battery_rate_label = ttk.Label(trends_frame, text="")
+        self.battery_rate_label.grid(row=0, column=2, sticky=tk.W, padx=(8, 0))
+
+        ttk.Label(trends_frame, text="Trials:").grid(row=1, column=0, sticky=tk.W, padx=(0, 8))
+        self.trial_sparkline = Sparkline(trends_frame, color=self.success_color, background=self.bg_color)
+        self.trial_sparkline.canvas.grid(row=1, column=1, pady=2)
+        self.trial_rate_label = ttk.Label(trends_frame, text="")
+        self.trial_rate_label.grid(row=1, column=2, sticky=tk.W, padx=(8, 0))
+
+        self.eta_label = ttk.Label(trends_frame, text="ETA: -")
+        self.eta_label.grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(4, 0))
+        self.block_time_label = ttk.Label(trends_frame, text="")
+        self.block_time_label.grid(row=3, column=0, columnspan=3, sticky=tk.W)
+
         # Screenshot frame with modern styling
         screenshot_frame = ttk.LabelFrame(content_frame, text="Headset Display", padding="8")
         screenshot_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -232,15 +365,50 @@ class HeadsupGUI:
                                        command=self.capture_screenshot, state=tk.DISABLED)
         self.screenshot_btn.grid(row=0, column=0, padx=2)
 
+        self.live_view_btn = ttk.Button(screenshot_controls, text="Start Live View",
+                                      command=self.toggle_live_view, state=tk.DISABLED)
+        self.live_view_btn.grid(row=0, column=1, padx=2)
+
+        ttk.Label(screenshot_controls, text="FPS:").grid(row=0, column=2, padx=(6, 2))
+        self.live_fps_var = tk.StringVar(value="10")
+        self.live_fps_spinbox = ttk.Spinbox(screenshot_controls, from_=1, to=30, width=3,
+                                           textvariable=self.live_fps_var)
+        self.live_fps_spinbox.grid(row=0, column=3, padx=2)
+
+        # Every capture source tiled, or one on its own
+        self.view_var = tk.StringVar(value="All")
+        self.view_combo = ttk.Combobox(screenshot_controls, textvariable=self.view_var, values=["All"],
+                                       width=8, state="readonly")
+        self.view_combo.grid(row=0, column=4, padx=(6, 2))
+        self.view_combo.bind("<<ComboboxSelected>>", lambda _: self.render_view())
+
         # Screenshot display with fixed 16:9 aspect ratio (320x180)
         self.screenshot_canvas = tk.Canvas(screenshot_frame, width=320, height=180,
                                          bg='black', highlightthickness=0)
         self.screenshot_canvas.grid(row=1, column=0, sticky=(tk.W, tk.N), padx=2, pady=2)
+        self.surface = FrameSurface(self.screenshot_canvas)
 
         # Log frame with reduced padding
         log_frame = ttk.LabelFrame(main_frame, text="System Logs", padding="8")
         log_frame.grid(row=2, column=0, columnspan=7, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(8, 0))
 
+        # Log filtering and search
+        log_controls = ttk.Frame(log_frame)
+        log_controls.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 4))
+
+        ttk.Label(log_controls, text="Show:").grid(row=0, column=0, padx=(0, 4))
+        self.log_level_var = tk.StringVar(value="All")
+        log_level_combo = ttk.Combobox(log_controls, textvariable=self.log_level_var, values=list(LEVEL_FILTERS),
+                                       state='readonly', width=16)
+        log_level_combo.grid(row=0, column=1, padx=(0, 12))
+        log_level_combo.bind('<<ComboboxSelected>>', lambda _: self.apply_log_filter())
+
+        ttk.Label(log_controls, text="Search:").grid(row=0, column=2, padx=(0, 4))
+        self.log_search_var = tk.StringVar()
+        self.log_search_var.trace_add('write', lambda *_: self.schedule_log_filter())
+        ttk.Entry(log_controls, textvariable=self.log_search_var, width=24).grid(row=0, column=3)
+        self.log_filter_job = None
+
         # Log display with dark theme
         self.log_text = tk.Text(log_frame, height=8, wrap=tk.WORD,
                               bg='#1e1e1e',
@@ -248,7 +416,7 @@ class HeadsupGUI:
                               font=('Consolas', 9),
                               padx=6, pady=6,
                               insertbackground='#d4d4d4')
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
         # Configure tag colors for different log types
         self.log_text.tag_configure('error', foreground='#f48771')  # Red for errors
@@ -257,9 +425,11 @@ class HeadsupGUI:
         self.log_text.tag_configure('info', foreground='#569cd6')  # Blue for info
 
         # Scrollbar for logs with dark theme
-        log_scrollbar = ttk.Scrollbar(log_frame, orient=tk.VERTICAL, command=self.log_text.yview)
-        log_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.log_text['yscrollcommand'] = log_scrollbar.set
+        log_scrollbar = ttk.Scrollbar(log_frame, orient=tk.VERTICAL)
+        log_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        # The console keeps its history in a ring buffer and only renders the visible lines
+        self.console = ConsoleView(self.log_text, log_scrollbar, LogBuffer(capacity=20000), visible_lines=8)
 
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -269,170 +439,353 @@ class HeadsupGUI:
         content_frame.columnconfigure(1, weight=1)
         content_frame.rowconfigure(0, weight=1)
         log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
+        log_frame.rowconfigure(1, weight=1)
 
-    def setup_websocket_thread(self):
-        def run_event_loop():
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
+    def start_event_loop(self):
+        """Start the asyncio thread if it isn't running yet, returns its loop once it is running"""
+        if self.loop is not None:
+            return self.loop
 
-            # Start the connection manager
-            self.loop.create_task(self.connection_manager())
+        import asyncio
+        from adb import AdbManager
 
-            # Run the event loop
-            self.loop.run_forever()
+        loop = asyncio.new_event_loop()
+        running = threading.Event()
 
+        def run_event_loop():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(running.set)
+            loop.run_forever()
+
+        self.adb = AdbManager(loop, on_progress=lambda serial, message: self.log(f"ADB {serial}: {message}"))
         self.ws_thread = threading.Thread(target=run_event_loop, daemon=True)
         self.ws_thread.start()
-
-    async def connection_manager(self):
-        """Manages the WebSocket connection lifecycle"""
-        while True:
-            if self.should_connect and not self.connected and not self.connecting:
-                self.connecting = True
-                self.root.after(0, self.update_connection_state)
-
-                try:
-                    await self.connect_websocket()
-                except Exception as e:
-                    self.log(f"Connection error: {e}")
-                    self.connected = False
-                    self.connecting = False
-                    self.connection_error = True
-                    self.should_connect = False
-                    self.root.after(0, self.update_connection_state)
-
-            await asyncio.sleep(0.1)
-
-    async def connect_websocket(self):
-        """Establishes and maintains the WebSocket connection"""
-        uri = f"ws://{self.ip_var.get()}:{self.port_var.get()}"
-        self.log(f"Attempting to connect to {uri}")
+        running.wait()
+        self.loop = loop
+        if profiler.enabled:
+            self.watch_event_loop()
+        return loop
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.connected
+
+    @property
+    def connecting(self):
+        return self.client is not None and self.client.connecting
+
+    @property
+    def reconnecting(self):
+        return self.client is not None and self.client.reconnecting
+
+    @property
+    def connection_error(self):
+        return self.client is not None and self.client.connection_error
+
+    @property
+    def last_reconnect_time(self):
+        return self.client.last_reconnect_time if self.client is not None else None
+
+    async def receive_messages(self, messages):
+        """Hand a client's inbound messages to the GUI, runs on the event loop thread"""
+        async for kind, payload in messages:
+            recorder = self.recorder
+            if kind == 'frame':
+                if recorder is not None:
+                    recorder.record('frame', payload.data, payload.source)
+                # Frames arriving faster than the display rate are skipped here rather than queued
+                governors = self.frame_governors
+                if governors is not None:
+                    governor = governors.get(payload.source)
+                    if governor is None:
+                        from frames import FrameRateGovernor
+                        governor = governors[payload.source] = FrameRateGovernor(self.live_view_fps)
+                    if governor.admit():
+                        self.dispatcher.put('frame', payload, payload.source)
+                continue
+            if recorder is not None:
+                recorder.record(kind, payload)
+            # Replies are logged by the client
+            if kind != 'reply':
+                self.dispatcher.put(kind, payload)
+
+    def run_in_gui(self, callback, *args):
+        """Schedule a callback on the Tk thread, safe to call from any thread"""
+        self.gui_calls.put((callback, args))
+
+    def drain_messages(self):
+        """Process every message and callback received since the last GUI tick"""
+        if profiler.enabled:
+            self.measure_tick()
 
         try:
-            async with websockets.connect(uri) as websocket:
-                self.websocket = websocket
-                self.connected = True
-                self.connecting = False
-                self.connection_error = False
-                self.root.after(0, self.update_connection_state)
-                self.log("Connected to headset")
-
-                # Start message handling
-                while self.connected:
+            with profiler.span('tk.drain'):
+                while True:
                     try:
-                        message = await websocket.recv()
-                        self.message_queue.put(message)
-                        self.root.after(0, self.process_message, message)
-                    except websockets.exceptions.ConnectionClosed:
-                        self.log("Connection closed by server")
-                        break
-                    except Exception as e:
-                        self.log(f"Error receiving message: {e}")
+                        callback, args = self.gui_calls.get_nowait()
+                    except queue.Empty:
                         break
+                    name = getattr(callback, '__name__', 'callback')
+                    with profiler.span('tk.call', name):
+                        try:
+                            callback(*args)
+                        except Exception as e:
+                            # One failing callback mustn't stop the ones after it, or the GUI tick
+                            self.log(f"Error in {name}: {e}")
+
+                for kind, payload in self.dispatcher.drain():
+                    with profiler.span('tk.process', kind):
+                        self.process_message(kind, payload)
+
+                with profiler.span('tk.logs'):
+                    self.drain_log_queue()
+                with profiler.span('tk.render'):
+                    self.console.render()
+                    self.view.flush()
+        finally:
+            self.root.after(self.dispatch_interval_ms, self.drain_messages)
 
-        except Exception as e:
-            self.log(f"Connection failed: {e}")
-            raise  # Re-raise to be handled by connection_manager
+    def measure_tick(self):
+        """Record how late this GUI tick ran, reporting stalls of the Tk main loop"""
+        now = time.perf_counter()
+        last, self.last_tick = self.last_tick, now
+        if last is None:
+            return
+        expected = last + self.dispatch_interval_ms / 1000
+        lag = max(0.0, now - expected)
+        profiler.record('tk.tick_lag', expected, lag)
+        if lag * 1000 >= self.stall_threshold_ms:
+            self.log(f"Warning: Tk main loop stalled for {lag * 1000:.0f} ms")
+
+    def toggle_profiling(self, trace=False):
+        """Start profiling, or stop and log the spans taking the most time"""
+        if not profiler.enabled:
+            profiler.start(trace)
+            self.last_tick = None
+            if self.loop is not None:
+                self.watch_event_loop()
+            self.log(f"Profiling started{' with tracing' if trace else ''}, press F12 to stop")
+            return
 
-        finally:
-            # Clean up connection state
-            self.connected = False
-            self.connection_error = True
-            self.should_connect = False
-            self.websocket = None
-            self.root.after(0, self.update_connection_state)
-
-    def process_message(self, message):
-        try:
-            data = json.loads(message)
-            if isinstance(data, dict):
-                if data.get('type') == 'status':
-                    status = json.loads(data['data'])
-                    self.update_status(status)
-                    # Update fixation button based on status
-                    if 'fixation_required' in status:
-                        self.fixation_required = status['fixation_required']
-                        self.update_fixation_button()
-                elif data.get('type') == 'logs':
-                    self.log(json.loads(data['data']))
-                elif data.get('type') == 'screenshot':
-                    self.update_screenshot(json.loads(data['data']))
+        summary = profiler.stop()
+        for name, stats in list(summary.items())[:self.profile_summary_spans]:
+            self.log(f"Profile: {name} p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+                     f"max {stats['max_ms']:.1f} ms, total {stats['total_ms']:.0f} ms ({stats['count']} calls)")
+        if profiler.tracing:
+            path = os.path.join(self.recordings_dir, datetime.now().strftime("profile-%Y%m%d-%H%M%S.json"))
+            try:
+                os.makedirs(self.recordings_dir, exist_ok=True)
+                count = profiler.write_trace(path)
+            except OSError as e:
+                self.log(f"Error writing profile trace: {e}")
             else:
-                self.log(f"Received: {data}")
-        except json.JSONDecodeError:
-            self.log(f"Received: {message}")
+                self.log(f"Profile trace of {count} spans written to {path}")
+
+    def watch_event_loop(self):
+        """Measure event loop lag on the network thread while profiling"""
+        import asyncio
+        asyncio.run_coroutine_threadsafe(watch_event_loop(profiler), self.loop)
+
+    def process_message(self, kind, payload):
+        try:
+            if kind == 'status':
+                status = payload
+                self.update_status(status)
+                self.record_telemetry()
+                # Update fixation button based on status
+                if 'fixation_required' in status:
+                    self.fixation_required = status['fixation_required']
+                    self.update_fixation_button()
+            elif kind == 'logs':
+                self.log(str(payload))
+            elif kind == 'log_batch':
+                self.append_log_batch(parse_log_batch(payload))
+            elif kind == 'screenshot':
+                self.update_screenshot(payload)
+            elif kind == 'frame':
+                self.update_live_frame(payload)
+            elif kind == 'reply':
+                self.log(f"Received: {payload}")
         except Exception as e:
             self.log(f"Error processing message: {e}")
 
     def update_status(self, status):
-        self.device_name = status.get('device_name', 'Unknown')
-        self.device_model = status.get('device_model', 'Unknown')
-        self.device_battery = float(status.get('device_battery', 0))
-        self.current_block = status.get('active_block', 'Inactive')
-        self.current_trial = int(status.get('current_trial', 0))
-        self.total_trials = int(status.get('total_trials', 0))
+        status = parse_status(status)
+        self.device_name = status.device_name
+        self.device_model = status.device_model
+        self.device_battery = status.device_battery
+        self.current_block = status.active_block
+        self.current_trial = status.current_trial
+        self.total_trials = status.total_trials
 
         self.update_status_display()
 
     def update_status_display(self):
-        self.device_name_label.config(text=self.device_name)
-        self.device_model_label.config(text=self.device_model)
-        self.device_battery_label.config(text=f"{self.device_battery:.0%}")
-        self.block_label.config(text=f"Block: {self.current_block}")
+        self.view.set(self.device_name_label, text=self.device_name)
+        self.view.set(self.device_model_label, text=self.device_model)
+        self.view.set(self.device_battery_label, text=f"{self.device_battery:.0%}")
+        self.view.set(self.block_label, text=f"Block: {self.current_block}")
 
         if self.total_trials > 0:
             progress = (self.current_trial / self.total_trials) * 100
-            self.progress_bar['value'] = progress
-            self.trial_label.config(text=f"Trial: {self.current_trial} / {self.total_trials} ({progress:.0f}%)")
+            self.view.set(self.progress_bar, value=progress)
+            self.view.set(self.trial_label, text=f"Trial: {self.current_trial} / {self.total_trials} ({progress:.0f}%)")
         else:
-            self.progress_bar['value'] = 0
-            self.trial_label.config(text="Trial: 0 / 0 (0%)")
+            self.view.set(self.progress_bar, value=0)
+            self.view.set(self.trial_label, text="Trial: 0 / 0 (0%)")
+
+    def session_time(self):
+        """Now, or during a replay the time in the recorded session that has been replayed up to"""
+        if self.replay_window is not None:
+            source = self.replay_window.source
+            return source.index.start + source.current_time
+        return time.time()
+
+    def record_telemetry(self):
+        """Add the latest status to the session history, redrawing the trends when a sample is taken"""
+        now = self.session_time()
+        latest = self.telemetry.latest_time()
+        if latest is not None and now < latest:
+            # A replay seeked back, the history after that point hasn't happened yet
+            self.telemetry.clear()
+        self.telemetry.record_block(now, self.current_block if self.current_block != "Inactive" else None)
+        if self.telemetry.append(now, device_battery=self.device_battery, current_trial=self.current_trial,
+                                 total_trials=self.total_trials):
+            self.update_trends()
+
+    def update_trends(self):
+        telemetry = self.telemetry
+        self.battery_sparkline.draw(telemetry.downsample('device_battery', self.sparkline_points))
+        self.trial_sparkline.draw(telemetry.downsample('current_trial', self.sparkline_points))
+
+        drain = telemetry.slope('device_battery', self.trend_window)
+        self.view.set(self.battery_rate_label, text="" if drain is None else f"{drain * 3600:+.1%} / h")
+        trial_rate = telemetry.rate_per_minute('current_trial', self.trend_window)
+        self.view.set(self.trial_rate_label, text="" if trial_rate is None else f"{trial_rate:.1f} / min")
+
+        eta = telemetry.eta('current_trial', 'total_trials', self.trend_window)
+        self.view.set(self.eta_label, text="ETA: -" if eta is None else f"ETA: {format_duration(eta)}")
+
+        # The active block and the one before it, with how long each took
+        blocks = telemetry.block_durations(self.session_time())[-2:]
+        self.view.set(self.block_time_label,
+                      text="   ".join(f"{block}: {format_duration(seconds)}" for block, seconds in blocks))
 
     def update_screenshot(self, screenshots):
         if not screenshots:
             self.log("No screenshot data received")
             return
 
-        # Convert base64 to image
-        try:
-            image_data = base64.b64decode(screenshots[0])
-            image = Image.open(io.BytesIO(image_data))
+        self.set_source_count(len(screenshots))
+        for source, encoded in enumerate(screenshots):
+            self.decode_source(source, encoded)
+
+    def update_live_frame(self, frame):
+        """Queue a live view frame for decoding"""
+        if self.live_view_active or self.replay_window is not None:
+            if frame.source >= self.source_count:
+                self.set_source_count(frame.source + 1)
+            self.decode_source(frame.source, frame.data)
+
+    def decode_source(self, source, encoded):
+        """Queue an image from a capture source for decoding at full canvas and tile size"""
+        canvas_width = self.screenshot_canvas.winfo_width()
+        canvas_height = self.screenshot_canvas.winfo_height()
+        if canvas_width <= 1 or canvas_height <= 1:  # Ensure canvas is ready
+            return
 
-            # Get canvas dimensions
+        if self.image_decoder is None:
+            from frames import ImagePool, MultiSourceDecoder
+            self.image_pool = ImagePool()
+            self.image_decoder = MultiSourceDecoder(
+                on_frame=lambda source, images, generation: self.run_in_gui(self.display_source, source, images,
+                                                                            generation),
+                on_error=lambda e: self.log(f"Error displaying screenshot: {e}"), pool=self.image_pool)
+        columns, rows = self.tile_grid(self.source_count)
+        self.image_decoder.submit(source, encoded, ((canvas_width, canvas_height),
+                                                    (canvas_width // columns, canvas_height // rows)),
+                                  self.layout_generation)
+
+    def tile_grid(self, count):
+        """Columns and rows of the tiled view for `count` capture sources"""
+        columns = max(1, math.ceil(math.sqrt(count)))
+        return columns, max(1, math.ceil(count / columns))
+
+    def set_source_count(self, count):
+        """Offer a view for each capture source, tiles are resized when the number of sources changes"""
+        if count == self.source_count:
+            return
+        self.source_count = count
+        self.view_combo.configure(values=["All"] + [f"Source {source + 1}" for source in range(count)])
+        selected = self.view_source()
+        if selected is not None and selected >= count:
+            self.view_var.set("All")
+        # Cached tiles were sized for the previous grid, new images arrive with the next capture
+        self.forget_sources()
+        self.render_view()
+
+    def view_source(self):
+        """Capture source shown on its own, or None when every source is tiled"""
+        view = self.view_var.get()
+        return None if view == "All" else int(view.split()[-1]) - 1
+
+    def display_source(self, source, images, generation):
+        """Cache a decoded capture source and draw it if the current view shows it"""
+        if generation != self.layout_generation:
+            # Sized for a tile layout that has since changed, or from before the display was cleared
+            self.release_images(images)
+            return
+        previous = self.source_images.get(source)
+        self.source_images[source] = images
+        self.draw_source(source)
+        if previous is not None:
+            self.release_images(previous)
+        if source == 0 and not self.live_view_active:
+            self.log("Screenshot displayed successfully")
+
+    def release_images(self, images):
+        """Hand decoded images back to the pool once they are no longer cached"""
+        if self.image_pool is not None:
+            for image in images:
+                self.image_pool.release(image)
+
+    def forget_sources(self):
+        self.layout_generation += 1
+        for images in self.source_images.values():
+            self.release_images(images)
+        self.source_images.clear()
+
+    def render_view(self):
+        """Redraw the current view from the cached images"""
+        for source in list(self.surface.items):
+            self.surface.hide(source)
+        for source in sorted(self.source_images):
+            self.draw_source(source)
+
+    def draw_source(self, source):
+        """Draw a cached capture source in its tile, or across the canvas when shown on its own"""
+        images = self.source_images.get(source)
+        if images is None:
+            return
+        try:
             canvas_width = self.screenshot_canvas.winfo_width()
             canvas_height = self.screenshot_canvas.winfo_height()
+            selected = self.view_source()
+            if selected is None and self.source_count > 1:
+                columns, rows = self.tile_grid(self.source_count)
+                width, height = canvas_width // columns, canvas_height // rows
+                left, top = (source % columns) * width, (source // columns) * height
+                image = images[1]
+            elif selected is None or selected == source:
+                left, top, width, height = 0, 0, canvas_width, canvas_height
+                image = images[0]
+            else:
+                return
 
-            if canvas_width > 1 and canvas_height > 1:  # Ensure canvas is ready
-                # Calculate aspect ratio preserving dimensions
-                img_ratio = image.width / image.height
-                canvas_ratio = canvas_width / canvas_height
-
-                if img_ratio > canvas_ratio:
-                    # Image is wider than canvas
-                    new_width = canvas_width
-                    new_height = int(canvas_width / img_ratio)
-                else:
-                    # Image is taller than canvas
-                    new_height = canvas_height
-                    new_width = int(canvas_height * img_ratio)
-
-                # Resize image while maintaining aspect ratio
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                # Convert to PhotoImage and display
-                photo = ImageTk.PhotoImage(image)
-
-                # Clear canvas and draw black background
-                self.screenshot_canvas.delete("all")
-                self.screenshot_canvas.configure(bg='black')
-
-                # Center the image on the canvas
-                x = (canvas_width - new_width) // 2
-                y = (canvas_height - new_height) // 2
-                self.screenshot_canvas.create_image(x, y, image=photo, anchor=tk.NW)
-                self.screenshot_canvas.image = photo  # Keep reference
-                self.log("Screenshot displayed successfully")
+            # Center the image in its area
+            x = left + (width - image.width) // 2
+            y = top + (height - image.height) // 2
+            self.surface.draw(source, image, x, y)
 
         except Exception as e:
             self.log(f"Error displaying screenshot: {e}")
@@ -441,100 +794,138 @@ class HeadsupGUI:
         # Check if we're connecting to localhost (development mode)
         is_localhost = self.ip_var.get().lower() == "localhost"
 
+        # Live view subscriptions and link quality don't survive the connection
+        if not self.connected:
+            self.live_view_active = False
+            self.view.set(self.live_view_btn, text="Start Live View")
+            self.update_link_quality(UNKNOWN)
+
         if self.connected:
-            self.set_connection_status("Connected", self.success_color)
-            self.connect_btn.config(text="Disconnect", state=tk.NORMAL)
-            self.ip_entry.config(state=tk.DISABLED)
-            self.port_entry.config(state=tk.DISABLED)
-            self.launch_btn.config(state=tk.DISABLED)
-            self.quit_btn.config(state=tk.NORMAL if self.application_launched else tk.DISABLED)
-            self.screenshot_btn.config(state=tk.NORMAL)
-            self.fixation_btn.config(state=tk.NORMAL)
-            self.end_btn.config(state=tk.NORMAL)
-            self.start_task_btn.config(state=tk.NORMAL)
-            self.start_calibration_btn.config(state=tk.NORMAL if self.task_started else tk.DISABLED)
+            if self.last_reconnect_time is not None:
+                self.set_connection_status(f"Connected (reconnected in {self.last_reconnect_time:.1f}s)", self.success_color)
+            else:
+                self.set_connection_status("Connected", self.success_color)
+            self.view.set(self.connect_btn, text="Disconnect", state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.DISABLED)
+            self.view.set(self.port_entry, state=tk.DISABLED)
+            self.view.set(self.launch_btn, state=tk.DISABLED)
+            self.view.set(self.quit_btn, state=tk.NORMAL if self.application_launched else tk.DISABLED)
+            self.view.set(self.screenshot_btn, state=tk.NORMAL)
+            self.view.set(self.live_view_btn, state=tk.NORMAL)
+            self.view.set(self.fixation_btn, state=tk.NORMAL)
+            self.view.set(self.end_btn, state=tk.NORMAL)
+            self.view.set(self.start_task_btn, state=tk.NORMAL)
+            self.view.set(self.start_calibration_btn, state=tk.NORMAL if self.task_started else tk.DISABLED)
             self.update_fixation_button()
 
-            # Clear console, screenshot, and reset device status on new connection
-            self.clear_console()
-            self.clear_screenshot()
-            self.reset_device_status()
+            # Clear console, screenshot, and reset device status on new connection, but not on reconnect
+            if self.clear_on_connect:
+                self.clear_on_connect = False
+                self.clear_console()
+                self.clear_screenshot()
+                self.reset_device_status()
 
         elif self.connecting:
-            self.set_connection_status("Connecting...", self.warning_color)
-            self.connect_btn.config(text="Cancel", state=tk.NORMAL)
-            self.ip_entry.config(state=tk.DISABLED)
-            self.port_entry.config(state=tk.DISABLED)
-            self.launch_btn.config(state=tk.DISABLED)
-            self.quit_btn.config(state=tk.DISABLED)
-            self.screenshot_btn.config(state=tk.DISABLED)
-            self.fixation_btn.config(state=tk.DISABLED)
-            self.end_btn.config(state=tk.DISABLED)
-            self.start_task_btn.config(state=tk.DISABLED)
-            self.start_calibration_btn.config(state=tk.DISABLED)
+            self.set_connection_status("Reconnecting..." if self.reconnecting else "Connecting...", self.warning_color)
+            self.view.set(self.connect_btn, text="Cancel", state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.DISABLED)
+            self.view.set(self.port_entry, state=tk.DISABLED)
+            self.view.set(self.launch_btn, state=tk.DISABLED)
+            self.view.set(self.quit_btn, state=tk.DISABLED)
+            self.view.set(self.screenshot_btn, state=tk.DISABLED)
+            self.view.set(self.live_view_btn, state=tk.DISABLED)
+            self.view.set(self.fixation_btn, state=tk.DISABLED)
+            self.view.set(self.end_btn, state=tk.DISABLED)
+            self.view.set(self.start_task_btn, state=tk.DISABLED)
+            self.view.set(self.start_calibration_btn, state=tk.DISABLED)
         elif self.connection_error:
             self.set_connection_status("Connection Error", self.error_color)
-            self.connect_btn.config(text="Retry", state=tk.NORMAL)
-            self.ip_entry.config(state=tk.NORMAL)
-            self.port_entry.config(state=tk.NORMAL)
-            self.launch_btn.config(state=tk.NORMAL)
-            self.quit_btn.config(state=tk.NORMAL if self.application_launched else tk.DISABLED)
-            self.screenshot_btn.config(state=tk.DISABLED)
-            self.fixation_btn.config(state=tk.DISABLED)
-            self.end_btn.config(state=tk.DISABLED)
-            self.start_task_btn.config(state=tk.DISABLED)
-            self.start_calibration_btn.config(state=tk.DISABLED)
+            self.view.set(self.connect_btn, text="Retry", state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.NORMAL)
+            self.view.set(self.port_entry, state=tk.NORMAL)
+            self.view.set(self.launch_btn, state=tk.NORMAL)
+            self.view.set(self.quit_btn, state=tk.NORMAL if self.application_launched else tk.DISABLED)
+            self.view.set(self.screenshot_btn, state=tk.DISABLED)
+            self.view.set(self.live_view_btn, state=tk.DISABLED)
+            self.view.set(self.fixation_btn, state=tk.DISABLED)
+            self.view.set(self.end_btn, state=tk.DISABLED)
+            self.view.set(self.start_task_btn, state=tk.DISABLED)
+            self.view.set(self.start_calibration_btn, state=tk.DISABLED)
         else:
             self.set_connection_status("Disconnected", self.disabled_color)
-            self.launch_btn.config(state=tk.NORMAL)
-            self.ip_entry.config(state=tk.NORMAL)
-            self.quit_btn.config(state=tk.NORMAL if self.application_launched else tk.DISABLED)
+            self.view.set(self.launch_btn, state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.NORMAL)
+            self.view.set(self.quit_btn, state=tk.NORMAL if self.application_launched else tk.DISABLED)
 
             # Allow connection if app is launched OR if connecting to localhost (development mode)
             connect_state = tk.NORMAL if (self.application_launched or is_localhost) else tk.DISABLED
-            self.connect_btn.config(text="Connect", state=connect_state)
-            self.port_entry.config(state=connect_state)
-
-            self.screenshot_btn.config(state=tk.DISABLED)
-            self.fixation_btn.config(state=tk.DISABLED)
-            self.end_btn.config(state=tk.DISABLED)
-            self.start_task_btn.config(state=tk.DISABLED)
-            self.start_calibration_btn.config(state=tk.DISABLED)
-            self.update_status({})
+            self.view.set(self.connect_btn, text="Connect", state=connect_state)
+            self.view.set(self.port_entry, state=connect_state)
+
+            self.view.set(self.screenshot_btn, state=tk.DISABLED)
+            self.view.set(self.live_view_btn, state=tk.DISABLED)
+            self.view.set(self.fixation_btn, state=tk.DISABLED)
+            self.view.set(self.end_btn, state=tk.DISABLED)
+            self.view.set(self.start_task_btn, state=tk.DISABLED)
+            self.view.set(self.start_calibration_btn, state=tk.DISABLED)
+
+            # Replayed sessions feed the same views, so no connection while one is open
+            if self.replay_window is not None:
+                self.view.set(self.connect_btn, state=tk.DISABLED)
+            else:
+                self.update_status({})
+
+    def update_link_quality(self, quality):
+        """Redraw the link quality bars and round-trip time"""
+        colors = {'good': self.success_color, 'fair': self.warning_color, 'poor': self.error_color,
+                  'stale': self.error_color}
+        bars = LEVELS.index(quality.level) if quality.level in LEVELS else 0
+        for bar in range(len(LEVELS) - 1):
+            fill = colors[quality.level] if bar < bars else self.disabled_color
+            self.view.set_item(self.link_canvas, f'bar{bar}', fill=fill)
+
+        if quality.level == 'unknown':
+            self.view.set(self.link_label, text="")
+        elif quality.rtt_ms is None:
+            self.view.set(self.link_label, text="No reply")
+        else:
+            self.view.set(self.link_label, text=f"{quality.rtt_ms:.0f} ms")
 
     def set_connection_status(self, status_text, color):
-        self.status_label.config(text=status_text)
-        self.status_canvas.itemconfig('status_dot', fill=color)
+        self.view.set(self.status_label, text=status_text)
+        self.view.set_item(self.status_canvas, 'status_dot', fill=color)
+
+    def request_connection(self, connect):
+        """Connect to the entered address or disconnect, safe to call from the Tk thread"""
+        client = self.client
+        if not connect:
+            if client is not None:
+                self.loop.call_soon_threadsafe(client.stop)
+            return
 
-    def toggle_connection(self):
-        if self.connected:
-            # Disconnect
-            async def close_connection():
-                if self.websocket:
-                    await self.websocket.close()
-                self.connected = False
-                self.connecting = False
-                self.connection_error = False
-                self.should_connect = False
-                self.websocket = None
-                self.root.after(0, self.update_connection_state)
-                self.log("Disconnected from headset")
-
-            asyncio.run_coroutine_threadsafe(close_connection(), self.loop)
-        elif self.connection_error:
-            # Retry connection
-            if not self.validate_ip(self.ip_var.get()):
-                messagebox.showerror("Invalid Input", "Please enter a valid IP address")
-                return
-            if not self.validate_port(self.port_var.get()):
-                messagebox.showerror("Invalid Input", "Please enter a valid port number (0-65535)")
-                return
+        from client import HeadsupClient
+        loop = self.start_event_loop()
+        client = HeadsupClient(
+            self.ip_var.get(), int(self.port_var.get()), self.reconnect_policy, self.initial_connect_attempts,
+            self.command_timeout, self.ping_interval, self.ping_timeout, self.heartbeat_interval,
+            self.heartbeat_timeout, self.heartbeat_max_missed, on_log=self.log,
+            on_state=lambda: self.run_in_gui(self.update_connection_state),
+            on_link_quality=lambda quality: self.run_in_gui(self.update_link_quality, quality))
+        self.client = client
+
+        def start():
+            # Subscribe before starting so no message is missed
+            messages = client.messages()
+            client.start()
+            loop.create_task(self.receive_messages(messages))
+        loop.call_soon_threadsafe(start)
 
-            self.connection_error = False
-            self.should_connect = True
-            self.update_connection_state()
+    def toggle_connection(self):
+        if self.connected or self.connecting:
+            # Disconnect, or cancel a connection or reconnect in progress
+            self.request_connection(False)
         else:
-            # Start new connection
+            # Start new connection, or retry after an error
             if not self.validate_ip(self.ip_var.get()):
                 messagebox.showerror("Invalid Input", "Please enter a valid IP address")
                 return
@@ -542,180 +933,322 @@ class HeadsupGUI:
                 messagebox.showerror("Invalid Input", "Please enter a valid port number (0-65535)")
                 return
 
-            self.should_connect = True
+            self.clear_on_connect = True
+            self.request_connection(True)
             self.update_connection_state()
 
-    def launch_application(self):
-        """Launch the application on the device using ADB"""
+    def toggle_recording(self):
+        """Start or stop recording all inbound traffic to disk"""
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.stop()
+            self.record_btn.config(text="Record Session")
+            self.log(f"Recording saved to {recorder.directory} ({recorder.recorded} messages, {recorder.dropped} dropped)")
+            return
+
+        from recorder import SessionRecorder
+        directory = os.path.join(self.recordings_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        recorder = SessionRecorder(directory, on_error=lambda error: self.run_in_gui(self.recording_failed, recorder, error))
         try:
-            # Get the IP address from the entry field
-            device_ip = self.ip_var.get()
+            recorder.start()
+        except OSError as e:
+            messagebox.showerror("Recording Error", f"Failed to start recording: {e}")
+            return
+        self.recorder = recorder
+        self.record_btn.config(text="Stop Recording")
+        self.log(f"Recording session to {directory}")
 
-            # Check if IP is valid
-            if not self.validate_ip(device_ip):
-                messagebox.showerror("Invalid Input", "Please enter a valid IP address")
-                return
+    def recording_failed(self, recorder, error):
+        """Stop a recording whose writer hit an error, such as a full disk"""
+        if self.recorder is not recorder:
+            return
+        self.recorder = None
+        recorder.stop()
+        self.record_btn.config(text="Record Session")
+        self.log(f"Error writing recording to {recorder.directory}: {error}, recording stopped "
+                 f"({recorder.recorded} messages saved)")
+
+    def open_replay(self):
+        """Replay a recorded session through the control panel views"""
+        if self.replay_window is not None:
+            self.replay_window.window.lift()
+            return
+        if self.connected or self.connecting:
+            messagebox.showerror("Replay", "Please disconnect from the headset before replaying a session")
+            return
 
-            # Special handling for localhost (development mode)
-            if device_ip.lower() == "localhost":
-                self.log("Development mode: Skipping ADB launch for localhost")
-                self.application_launched = True
-                self.quit_btn.config(state=tk.NORMAL)
-                self.ip_entry.config(state=tk.NORMAL)
-                self.port_entry.config(state=tk.NORMAL)
-                self.connect_btn.config(state=tk.NORMAL)
-                self.update_connection_state()
-                return
+        directory = filedialog.askdirectory(title="Select Recording", initialdir=self.recordings_dir
+                                            if os.path.isdir(self.recordings_dir) else None)
+        if not directory:
+            return
+        from replay_view import ReplayWindow
+        try:
+            replay_window = ReplayWindow(self, directory)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Replay Error", f"Failed to open recording: {e}")
+            return
 
-            # Connect to device via ADB
-            connect_cmd = ["adb", "connect", f"{device_ip}:{self.adb_port}"]
-            self.log(f"Connecting to device: {' '.join(connect_cmd)}")
+        self.clear_console()
+        self.clear_screenshot()
+        self.reset_device_status()
+        self.replay_window = replay_window
+        self.update_connection_state()
 
-            result = subprocess.run(connect_cmd, capture_output=True, text=True, timeout=10)
+    def open_fleet_view(self):
+        """Open the multi-headset monitoring window, or raise it if already open"""
+        if self.fleet_window is not None:
+            self.fleet_window.window.lift()
+            return
+        from fleet_view import FleetWindow
+        self.start_event_loop()
+        self.fleet_window = FleetWindow(self)
+
+    def open_discovery(self):
+        """Open the headset discovery picker, or raise it if already open"""
+        if self.discovery_window is not None:
+            self.discovery_window.window.lift()
+            return
+        from discovery_view import DiscoveryWindow
+        self.start_event_loop()
+        self.discovery_window = DiscoveryWindow(self)
 
-            if result.returncode != 0:
-                self.log(f"ADB connect failed: {result.stderr}")
-                messagebox.showerror("ADB Error", f"Failed to connect to device: {result.stderr}")
-                return
+    def launch_application(self):
+        """Launch the application on the device using ADB, without blocking the GUI"""
+        if self.adb_pending is not None:
+            self.adb.cancel()
+            return
 
-            self.log(f"ADB connect result: {result.stdout.strip()}")
+        # Get the IP address from the entry field
+        device_ip = self.ip_var.get()
 
-            # Launch the application
-            launch_cmd = ["adb", "-s", f"{device_ip}:{self.adb_port}", "shell", "am", "start", "-n", f"{self.package_name}/com.unity3d.player.UnityPlayerActivity"]
-            self.log(f"Launching application: {' '.join(launch_cmd)}")
+        # Check if IP is valid
+        if not self.validate_ip(device_ip):
+            messagebox.showerror("Invalid Input", "Please enter a valid IP address")
+            return
 
-            result = subprocess.run(launch_cmd, capture_output=True, text=True, timeout=10)
+        # Special handling for localhost (development mode)
+        if device_ip.lower() == "localhost":
+            self.log("Development mode: Skipping ADB launch for localhost")
+            self.application_launched = True
+            self.view.set(self.quit_btn, state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.NORMAL)
+            self.view.set(self.port_entry, state=tk.NORMAL)
+            self.view.set(self.connect_btn, state=tk.NORMAL)
+            self.update_connection_state()
+            return
 
-            if result.returncode == 0:
-                self.log("Application launched successfully")
-                messagebox.showinfo("Success", "Application launched successfully on the device")
-                self.application_launched = True
-                self.quit_btn.config(state=tk.NORMAL)
-                self.ip_entry.config(state=tk.NORMAL)
-                self.port_entry.config(state=tk.NORMAL)
-                self.connect_btn.config(state=tk.NORMAL)
-            else:
-                self.log(f"Launch failed: {result.stderr}")
-                messagebox.showerror("Launch Error", f"Failed to launch application: {result.stderr}")
-
-        except subprocess.TimeoutExpired:
-            self.log("ADB command timed out")
-            messagebox.showerror("Timeout", "ADB command timed out. Please check device connection.")
-        except FileNotFoundError:
-            self.log("ADB not found in PATH")
-            messagebox.showerror("ADB Error", "ADB not found. Please ensure Android SDK is installed and ADB is in your PATH.")
-        except Exception as e:
-            self.log(f"Launch error: {e}")
-            messagebox.showerror("Error", f"Unexpected error: {e}")
+        self.start_event_loop()
+
+        # The launch button cancels the command while it runs
+        self.adb_pending = self.adb.launch([f"{device_ip}:{self.adb_port}"], self.package_name)
+        self.view.set(self.launch_btn, text="Cancel Launch")
+        self.view.set(self.quit_btn, state=tk.DISABLED)
+        self.adb_pending.add_done_callback(lambda future: self.run_in_gui(self.finish_launch, future))
+
+    def finish_launch(self, future):
+        self.view.set(self.launch_btn, text="Launch Application")
+        if self.finish_adb_command(future, "Launch"):
+            self.show_dialog(messagebox.showinfo, "Success", "Application launched successfully on the device")
+            self.application_launched = True
+            self.view.set(self.quit_btn, state=tk.NORMAL)
+            self.view.set(self.ip_entry, state=tk.NORMAL)
+            self.view.set(self.port_entry, state=tk.NORMAL)
+            self.view.set(self.connect_btn, state=tk.NORMAL)
+        else:
+            self.view.set(self.quit_btn, state=tk.NORMAL if self.application_launched else tk.DISABLED)
 
     def quit_application(self):
-        """Quit the application on the device using ADB"""
-        if messagebox.askyesno("Confirm Quit", "Are you sure you want to quit the application? If an experiment is running, all data will be lost."):
-            try:
-                device_ip = self.ip_var.get()
-
-                if not self.validate_ip(device_ip):
-                    messagebox.showerror("Invalid Input", "Please enter a valid IP address")
-                    return
-
-                # Special handling for localhost (development mode)
-                if device_ip.lower() == "localhost":
-                    self.log("Development mode: Skipping ADB quit for localhost")
-                    self.application_launched = False
-                    self.quit_btn.config(state=tk.DISABLED)
-                    self.ip_entry.config(state=tk.DISABLED)
-                    self.port_entry.config(state=tk.DISABLED)
-                    self.connect_btn.config(state=tk.DISABLED)
-                    self.update_connection_state()
-                    return
-
-                # ADB command to force stop
-                quit_cmd = ["adb", "-s", f"{device_ip}:{self.adb_port}", "shell", "am", "force-stop", self.package_name]
-                self.log(f"Quitting application: {' '.join(quit_cmd)}")
-
-                result = subprocess.run(quit_cmd, capture_output=True, text=True, timeout=10)
-
-                if result.returncode == 0:
-                    self.log("Application quit successfully")
-                    self.application_launched = False
-                    self.quit_btn.config(state=tk.DISABLED)
-                    self.ip_entry.config(state=tk.DISABLED)
-                    self.port_entry.config(state=tk.DISABLED)
-                    self.connect_btn.config(state=tk.DISABLED)
-                else:
-                    self.log(f"Quit failed: {result.stderr}")
-                    messagebox.showerror("Quit Error", f"Failed to quit application: {result.stderr}")
-
-            except subprocess.TimeoutExpired:
-                self.log("ADB command timed out")
-                messagebox.showerror("Timeout", "ADB command timed out. Please check device connection.")
-            except FileNotFoundError:
-                self.log("ADB not found in PATH")
-                messagebox.showerror("ADB Error", "ADB not found. Please ensure Android SDK is installed and ADB is in your PATH.")
-            except Exception as e:
-                self.log(f"Quit error: {e}")
-                messagebox.showerror("Error", f"Unexpected error: {e}")
-
-    async def send_command(self, command):
-        if self.websocket and self.connected:
-            try:
-                await self.websocket.send(command)
-                self.log(f"Sent command: {command}")
-            except Exception as e:
-                self.log(f"Error sending command: {e}")
-                self.connected = False
-                self.connection_error = True
-                self.should_connect = False
-                self.root.after(0, self.update_connection_state)
+        """Quit the application on the device using ADB, without blocking the GUI"""
+        if self.adb_pending is not None:
+            self.adb.cancel()
+            return
 
-    def send_command_safe(self, command):
-        """Thread-safe wrapper for sending commands"""
-        if self.loop and self.loop.is_running():
-            asyncio.run_coroutine_threadsafe(self.send_command(command), self.loop)
+        if not messagebox.askyesno("Confirm Quit", "Are you sure you want to quit the application? If an experiment is running, all data will be lost."):
+            return
+
+        device_ip = self.ip_var.get()
+
+        if not self.validate_ip(device_ip):
+            messagebox.showerror("Invalid Input", "Please enter a valid IP address")
+            return
+
+        # Special handling for localhost (development mode)
+        if device_ip.lower() == "localhost":
+            self.log("Development mode: Skipping ADB quit for localhost")
+            self.application_launched = False
+            self.view.set(self.quit_btn, state=tk.DISABLED)
+            self.view.set(self.ip_entry, state=tk.DISABLED)
+            self.view.set(self.port_entry, state=tk.DISABLED)
+            self.view.set(self.connect_btn, state=tk.DISABLED)
+            self.update_connection_state()
+            return
+
+        self.start_event_loop()
+
+        # The quit button cancels the command while it runs
+        self.adb_pending = self.adb.quit([f"{device_ip}:{self.adb_port}"], self.package_name)
+        self.view.set(self.quit_btn, text="Cancel Quit")
+        self.view.set(self.launch_btn, state=tk.DISABLED)
+        self.adb_pending.add_done_callback(lambda future: self.run_in_gui(self.finish_quit, future))
+
+    def finish_quit(self, future):
+        self.view.set(self.quit_btn, text="Quit Application")
+        if self.finish_adb_command(future, "Quit"):
+            self.application_launched = False
+            self.view.set(self.quit_btn, state=tk.DISABLED)
+            self.view.set(self.ip_entry, state=tk.DISABLED)
+            self.view.set(self.port_entry, state=tk.DISABLED)
+            self.view.set(self.connect_btn, state=tk.DISABLED)
+        self.view.set(self.launch_btn, state=tk.DISABLED if self.connected or self.connecting else tk.NORMAL)
+
+    def finish_adb_command(self, future, action):
+        """Return True if the single-device ADB command behind `future` succeeded, reporting failures"""
+        self.adb_pending = None
+        import asyncio
+        if future.cancelled():
+            result = asyncio.CancelledError()
+        elif future.exception() is not None:
+            result = future.exception()
         else:
-            self.log("Cannot send command: WebSocket not ready")
+            result, = future.result().values()
+        if isinstance(result, asyncio.CancelledError):
+            self.log(f"{action} cancelled")
+            return False
+        if isinstance(result, Exception):
+            self.log(f"{action} failed: {result}")
+            self.show_dialog(messagebox.showerror, f"{action} Error", f"{action} failed: {result}")
+            return False
+        return True
+
+    def show_dialog(self, show, *args):
+        """
+        Open a message box once the current GUI tick is done. Callbacks run inside the tick, and a modal
+        dialog opened there would hold up dispatch of every queued message until it is dismissed.
+        """
+        self.root.after_idle(lambda: show(*args))
+
+    def link_quality(self):
+        """Latest heartbeat LinkQuality, safe to call from any thread"""
+        client = self.client
+        return client.link_quality if client is not None else UNKNOWN
+
+    def send_command_safe(self, command):
+        """Thread-safe wrapper for sending commands, returns a concurrent future of the reply"""
+        client = self.client
+        if client is not None and self.loop and self.loop.is_running():
+            import asyncio
+            return asyncio.run_coroutine_threadsafe(client.send_command(command), self.loop)
+        self.log("Cannot send command: WebSocket not ready")
+        return None
 
     def capture_screenshot(self):
         self.send_command_safe("screenshot")
 
+    def toggle_live_view(self):
+        """Subscribe to or stop the continuous live view stream"""
+        import protocol
+
+        if self.live_view_active:
+            self.live_view_active = False
+            self.view.set(self.live_view_btn, text="Start Live View")
+            self.send_command_safe(protocol.LIVE_VIEW_STOP)
+            return
+
+        try:
+            fps = float(self.live_fps_var.get())
+        except ValueError:
+            fps = 0
+        if not 0 < fps <= 60:
+            messagebox.showerror("Invalid Input", "Please enter a live view rate between 1 and 60 FPS")
+            return
+
+        self.live_view_active = True
+        self.view.set(self.live_view_btn, text="Stop Live View")
+        self.live_view_fps = fps
+        self.frame_governors = {}
+        self.send_command_safe(protocol.live_view_start_command(fps, self.live_view_max_in_flight))
+
     def start_task(self):
         """Start the task on the headset"""
         self.task_started = True
-        self.start_task_btn.config(state=tk.DISABLED)
-        self.start_calibration_btn.config(state=tk.NORMAL)
+        self.view.set(self.start_task_btn, state=tk.DISABLED)
+        self.view.set(self.start_calibration_btn, state=tk.NORMAL)
         self.send_command_safe("start_task")
         self.log("Task started")
 
     def start_calibration(self):
         """Start the calibration on the headset"""
         self.calibration_started = True
-        self.start_calibration_btn.config(state=tk.DISABLED)
+        self.view.set(self.start_calibration_btn, state=tk.DISABLED)
         self.send_command_safe("start_calibration")
         self.log("Calibration started")
 
     def update_fixation_button(self):
         """Update the fixation button text based on current state"""
         if self.fixation_required:
-            self.fixation_btn.config(text="Disable Fixation")
+            self.view.set(self.fixation_btn, text="Disable Fixation")
         else:
-            self.fixation_btn.config(text="Enable Fixation")
+            self.view.set(self.fixation_btn, text="Enable Fixation")
 
     def toggle_fixation(self):
         command = "disable_fixation" if self.fixation_required else "enable_fixation"
-        # Update state immediately for better UI feedback
-        self.fixation_required = not self.fixation_required
+        future = self.send_command_safe(command)
+        if future is None:
+            return
+        # The button waits for the headset to confirm the change rather than assuming it
+        self.view.set(self.fixation_btn, text="Disabling Fixation..." if self.fixation_required else "Enabling Fixation...",
+                      state=tk.DISABLED)
+        future.add_done_callback(lambda future: self.run_in_gui(self.confirm_fixation, future))
+
+    def confirm_fixation(self, future):
+        reply = None if future.cancelled() or future.exception() is not None else future.result()
+        if reply in ("Fixation Enabled", "Fixation Disabled"):
+            self.fixation_required = reply == "Fixation Enabled"
+            self.log(f"{'Enabled' if self.fixation_required else 'Disabled'} fixation")
+        elif reply is not None:
+            self.log(f"Error changing fixation: {reply}")
         self.update_fixation_button()
-        self.send_command_safe(command)
-        self.log(f"{'Disabled' if not self.fixation_required else 'Enabled'} fixation")
+        self.view.set(self.fixation_btn, state=tk.NORMAL if self.connected else tk.DISABLED)
 
     def end_experiment(self):
         if messagebox.askyesno("Confirm", "Are you sure you want to end the experiment?"):
             self.send_command_safe("kill")
 
     def log(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        """Queue a log line, safe and cheap to call from any thread"""
+        self.log_queue.put((datetime.now(), message))
+
+    def drain_log_queue(self):
+        """Move queued log lines into the console, rendered in one batch afterwards"""
+        while True:
+            try:
+                logged_at, message = self.log_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.append_log(logged_at.strftime("%H:%M:%S"), message)
+
+    def append_log_batch(self, entries):
+        """Append a batch of headset log entries to the console with their own level and time"""
+        timestamps = {}
+        for entry in entries:
+            # Format each second once, a busy batch has many entries within the same second
+            second = int(entry.time)
+            timestamp = timestamps.get(second)
+            if timestamp is None:
+                timestamp = timestamps[second] = datetime.fromtimestamp(second).strftime("%H:%M:%S")
+            level = LOG_TAGS.get(entry.level)
+            self.append_log(timestamp, entry.message, level)
+            if entry.stack:
+                for line in entry.stack.strip().splitlines()[:self.stack_trace_lines]:
+                    self.console.append(timestamp, level or 'error', f"    {line}")
+
+    def append_log(self, timestamp, message, tag=None):
+        """Append a log line to the console, must run on the Tk thread"""
+        if tag is not None:
+            self.console.append(timestamp, tag, message)
+            return
 
-        # Determine log type and apply appropriate tag
+        # No level from the sender, guess one from the message
         tag = 'info'  # Default tag
         if 'error' in message.lower():
             tag = 'error'
@@ -724,8 +1257,17 @@ class HeadsupGUI:
         elif 'connected' in message.lower() or 'success' in message.lower():
             tag = 'success'
 
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n", tag)
-        self.log_text.see(tk.END)
+        self.console.append(timestamp, tag, message)
+
+    def schedule_log_filter(self):
+        """Apply the log search once typing pauses"""
+        if self.log_filter_job is not None:
+            self.root.after_cancel(self.log_filter_job)
+        self.log_filter_job = self.root.after(200, self.apply_log_filter)
+
+    def apply_log_filter(self):
+        self.log_filter_job = None
+        self.console.set_filter(LEVEL_FILTERS[self.log_level_var.get()], self.log_search_var.get())
 
     def validate_ip(self, ip):
         pattern = r'^(\d{1,3}\.){3}\d{1,3}$|^localhost$'
@@ -742,16 +1284,30 @@ class HeadsupGUI:
         """Clean up resources when closing the application"""
         if self.connected:
             self.toggle_connection()  # Disconnect if connected
+        if self.image_decoder is not None:
+            self.image_decoder.shutdown()
+        if self.adb is not None:
+            self.adb.shutdown()
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.fleet_window is not None:
+            self.fleet_window.close()
+        if self.replay_window is not None:
+            self.replay_window.close()
+        if self.discovery_window is not None:
+            self.discovery_window.close()
         self.root.destroy()
 
     def clear_console(self):
         """Clear the console log"""
-        self.log_text.delete(1.0, tk.END)
+        self.console.clear()
 
     def clear_screenshot(self):
-        """Clear the screenshot display"""
-        self.screenshot_canvas.delete("all")
-        self.screenshot_canvas.configure(bg='black')
+        """Clear the screenshot display and the cached capture sources"""
+        self.forget_sources()
+        self.set_source_count(0)
+        self.view_var.set("All")
+        self.surface.clear()
 
     def reset_device_status(self):
         """Reset device status information to default values"""
@@ -765,6 +1321,8 @@ class HeadsupGUI:
         self.task_started = False
         self.calibration_started = False
         self.update_status_display()
+        self.telemetry.clear()
+        self.update_trends()
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Unity HeadsupServer, for exercising the client without a headset"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+
+import websockets
+from PIL import Image, ImageDraw
+
+import protocol
+
+
+# Unity-style log lines broadcast at the configured log rate
+LOG_LINES = (
+    ("log", "Trial {trial} stimulus presented"),
+    ("log", "Trial {trial} response recorded"),
+    ("log", "Eye tracker sample rate 120 Hz"),
+    ("warning", "Warning: frame time exceeded 14 ms"),
+    ("log", "Trial {trial} fixation acquired"),
+    ("error", "Error: calibration point {line} rejected"),
+)
+MOCK_STACK_TRACE = "Calibration.Validate () (at Assets/Scripts/Calibration.cs:88)\nCalibration.Update () (at Assets/Scripts/Calibration.cs:41)"
+
+
+class MockSession:
+    """Per-connection state, mirrors a Handler instance on the Unity side"""
+
+    def __init__(self, websocket, delay=0.0, jitter=0.0):
+        self.websocket = websocket
+        self.delay = delay
+        self.jitter = jitter
+        # With an injected delay messages wait here until due, in order like on a network link
+        self.outbox = asyncio.Queue() if delay > 0 or jitter > 0 else None
+        self.protocol_version = protocol.LEGACY_VERSION
+        self.live_view_interval = 0.0
+        self.max_frames_in_flight = 0
+        self.frames_in_flight = 0
+        self.next_frame_time = 0.0
+
+    def start_live_view(self, command):
+        args = command.split(':')
+        fps = float(args[1]) if len(args) > 1 else 10.0
+        max_in_flight = int(args[2]) if len(args) > 2 else 2
+        self.live_view_interval = 1.0 / min(max(fps, 0.1), 60.0)
+        self.max_frames_in_flight = max(1, max_in_flight)
+        self.frames_in_flight = 0
+        self.next_frame_time = 0.0
+
+    def post(self, message):
+        """Send a message without waiting for it to be written"""
+        if self.outbox is None:
+            websockets.broadcast([self.websocket], message)
+        else:
+            self.outbox.put_nowait((time.monotonic() + self.delay + random.uniform(0, self.jitter), message))
+
+    async def send(self, message):
+        if self.outbox is None:
+            await self.websocket.send(message)
+        else:
+            self.post(message)
+
+    async def deliver(self):
+        """Send queued messages once their delay has passed"""
+        while True:
+            due, message = await self.outbox.get()
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            await self.websocket.send(message)
+
+
+class MockHeadsupServer:
+    """
+    Implements the HeadsupServer command set, status and log broadcasts and live view streaming.
+    `delay` and `jitter` seconds are added to every message sent, as network latency would.
+    """
+
+    def __init__(self, frame_size=(1280, 720), image_format="JPEG", sources=1, status_interval=1.0,
+                 device_name="Mock Headset", log_rate=0.0, delay=0.0, jitter=0.0, chunk_size=protocol.CHUNK_SIZE,
+                 compression=True):
+        self.device_name = device_name
+        self.frame_size = frame_size
+        self.image_format = image_format
+        self.sources = sources
+        self.status_interval = status_interval
+        self.log_rate = log_rate
+        self.delay = delay
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.sessions = set()
+        self.live_view = set()
+        self.frame_counter = 0
+        self.logged = 0
+        self.next_transfer = 0
+        # Log entries waiting for the next tick, sent at most max_log_batch at a time like HeadsupServer
+        self.pending_logs = []
+        self.max_log_batch = 500
+
+        # Experiment state reported in status broadcasts
+        self.fixation_required = True
+        self.active_block = "Inactive"
+        self.current_trial = 0
+        self.total_trials = 120
+        self.device_battery = 1.0
+
+    def status(self):
+        return {
+            "device_name": self.device_name,
+            "device_model": "Headsup Mock",
+            "device_battery": f"{self.device_battery:.2f}",
+            "active_block": self.active_block,
+            "current_trial": str(self.current_trial),
+            "total_trials": str(self.total_trials),
+            "fixation_required": self.fixation_required,
+        }
+
+    def capture(self, source):
+        """Render a synthetic frame for a capture source"""
+        self.frame_counter += 1
+        shade = (self.frame_counter * 7) % 256
+        image = Image.new("RGB", self.frame_size, (shade, 64, 255 - shade))
+        ImageDraw.Draw(image).text((16, 16), f"Source {source} frame {self.frame_counter}", fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.image_format)
+        return buffer.getvalue()
+
+    def log(self, message, level="log", stack=None):
+        """Queue a Unity-style log message for broadcast on the next tick"""
+        entry = {"level": level, "time": time.time(), "message": message}
+        if stack is not None:
+            entry["stack"] = stack
+        self.pending_logs.append(entry)
+
+    def broadcast_logs(self, entries):
+        """Send log entries to every session, batched for sessions that negotiated it"""
+        encoded = {}
+        for session in list(self.sessions):
+            version = session.protocol_version
+            if version not in encoded:
+                encoded[version] = protocol.encode_logs(entries, version)
+            for message in encoded[version]:
+                session.post(message)
+
+    def broadcast(self, kind, data):
+        """Send a typed message to every session, encoded for the protocol version it negotiated"""
+        encoded = {}
+        for session in list(self.sessions):
+            version = session.protocol_version
+            if version not in encoded:
+                encoded[version] = protocol.encode_message(kind, data, version)
+            session.post(encoded[version])
+
+    async def handle_command(self, session, message):
+        command, request_id = protocol.decode_command(message)
+
+        async def reply(data):
+            await session.send(protocol.encode_reply(data, session.protocol_version, request_id))
+
+        if command.startswith("protocol:"):
+            session.protocol_version = min(int(command.split(':')[1]), protocol.PROTOCOL_VERSION)
+            await session.send(json.dumps({"type": "protocol", "version": session.protocol_version}))
+        elif command == "active":
+            await reply(True)
+        elif command == "kill":
+            self.active_block = "Ended"
+            await reply("Done")
+        elif command == "disable_fixation":
+            self.fixation_required = False
+            await reply("Fixation Disabled")
+        elif command == "enable_fixation":
+            self.fixation_required = True
+            await reply("Fixation Enabled")
+        elif command == "start_task":
+            self.active_block = "1"
+            self.current_trial = 1
+            await reply("Started Task")
+        elif command == "start_calibration":
+            self.active_block = "Calibration"
+            await reply("Started Calibration")
+        elif command.startswith("live_view_start"):
+            session.start_live_view(command)
+            self.live_view.add(session)
+            await reply("Live View Started")
+        elif command == protocol.LIVE_VIEW_STOP:
+            self.live_view.discard(session)
+            await reply("Live View Stopped")
+        elif command == protocol.FRAME_ACK:
+            session.frames_in_flight = max(0, session.frames_in_flight - 1)
+        elif command == "screenshot":
+            captures = [self.capture(i) for i in range(self.sources)]
+            for message in protocol.encode_screenshot(captures, session.protocol_version, request_id,
+                                                      self.transfer_id(), self.chunk_size):
+                await session.send(message)
+        else:
+            self.log(f"Invalid Command: {command}")
+            await reply("Invalid Command")
+
+    async def handler(self, websocket):
+        session = MockSession(websocket, self.delay, self.jitter)
+        deliver = asyncio.ensure_future(session.deliver()) if session.outbox is not None else None
+        self.sessions.add(session)
+        try:
+            async for message in websocket:
+                if isinstance(message, str):
+                    await self.handle_command(session, message)
+        finally:
+            self.sessions.discard(session)
+            self.live_view.discard(session)
+            if deliver is not None:
+                deliver.cancel()
+
+    async def status_loop(self):
+        while True:
+            self.broadcast("status", self.status())
+            if self.current_trial:
+                self.current_trial = min(self.current_trial + 1, self.total_trials)
+            self.device_battery = max(0.0, self.device_battery - 0.001)
+            await asyncio.sleep(self.status_interval)
+
+    async def live_view_loop(self, tick=1 / 60):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            due = [session for session in self.live_view if now >= session.next_frame_time]
+            if due:
+                frames = [self.capture(i) for i in range(self.sources)]
+                packets = [protocol.pack_frame(i, frame) for i, frame in enumerate(frames)]
+                # Frames over the chunk size go to clients that support it in chunks, built on first use
+                chunked = [None] * len(frames)
+                for session in due:
+                    for i, packet in enumerate(packets):
+                        # Skip frames for clients that haven't acknowledged earlier ones
+                        if session.frames_in_flight >= session.max_frames_in_flight:
+                            continue
+                        session.frames_in_flight += 1
+                        if session.protocol_version >= protocol.CHUNKED_FRAMES_VERSION and len(frames[i]) > self.chunk_size:
+                            if chunked[i] is None:
+                                chunked[i] = protocol.pack_chunks(protocol.FRAME_CHUNK, i, self.transfer_id(),
+                                                                  frames[i], self.chunk_size)
+                            for chunk in chunked[i]:
+                                await session.send(chunk)
+                        else:
+                            await session.send(packet)
+                    session.next_frame_time = now + session.live_view_interval
+            await asyncio.sleep(tick)
+
+    async def log_loop(self, tick=0.01):
+        """Generate log lines at log_rate per second and broadcast each tick's logs together, like Unity's Update"""
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        owed = 0.0
+        while True:
+            await asyncio.sleep(tick)
+            now = loop.time()
+            owed += (now - last) * self.log_rate
+            last = now
+            while owed >= 1:
+                owed -= 1
+                self.logged += 1
+                level, line = LOG_LINES[self.logged % len(LOG_LINES)]
+                self.log(line.format(trial=self.current_trial, line=self.logged), level,
+                         MOCK_STACK_TRACE if level == "error" else None)
+
+            if self.pending_logs:
+                batch = self.pending_logs[:self.max_log_batch]
+                del self.pending_logs[:self.max_log_batch]
+                self.broadcast_logs(batch)
+
+    def transfer_id(self):
+        self.next_transfer += 1
+        return self.next_transfer
+
+    async def serve(self, host, port, quiet=False):
+        async with websockets.serve(self.handler, host, port, compression="deflate" if self.compression else None):
+            if not quiet:
+                print(f"Mock Headsup server listening on ws://{host}:{port}")
+            await asyncio.gather(self.status_loop(), self.live_view_loop(), self.log_loop())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Headsup Unity server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=4444)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--format", choices=["JPEG", "PNG"], default="JPEG")
+    parser.add_argument("--sources", type=int, default=1, help="Number of capture sources")
+    parser.add_argument("--name", default="Mock Headset", help="Device name reported in status broadcasts")
+    parser.add_argument("--status-interval", type=float, default=1.0, help="Seconds between status broadcasts")
+    parser.add_argument("--log-rate", type=float, default=0.0, help="Log lines broadcast per second")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Delay added to every message sent")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay of up to this much")
+    parser.add_argument("--chunk-kib", type=int, default=protocol.CHUNK_SIZE // 1024,
+                        help="Payload size of screenshot and frame chunks for protocol version 5 clients")
+    parser.add_argument("--no-compression", action="store_true", help="Refuse permessage-deflate")
+    args = parser.parse_args()
+
+    server = MockHeadsupServer(frame_size=(args.width, args.height), image_format=args.format, sources=args.sources,
+                               device_name=args.name, status_interval=args.status_interval, log_rate=args.log_rate,
+                               delay=args.delay_ms / 1000, jitter=args.jitter_ms / 1000,
+                               chunk_size=args.chunk_kib * 1024, compression=not args.no_compression)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
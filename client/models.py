@@ -0,0 +1,40 @@
+"""Plain data types shared by the client and the GUI, importable without asyncio or websockets"""
+from collections import namedtuple
+
+HeadsetStatus = namedtuple('HeadsetStatus', ['device_name', 'device_model', 'device_battery', 'active_block',
+                                             'current_trial', 'total_trials', 'fixation_required'])
+
+# A live view frame, `data` is the encoded image from capture source `source`
+Frame = namedtuple('Frame', ['source', 'data'])
+
+# A log message from the headset. `level` is the Unity log type in lower case, or None from servers that
+# only send the message, `time` is a Unix timestamp and `stack` the stack trace of an error, if any
+LogEntry = namedtuple('LogEntry', ['level', 'time', 'message', 'stack'])
+
+LinkQuality = namedtuple('LinkQuality', ['level', 'rtt_ms', 'rtt_p50_ms', 'rtt_p95_ms', 'jitter_ms',
+                                         'sent', 'missed', 'consecutive_missed'])
+
+# Link quality levels from worst to best, the index is the number of bars the indicator shows
+LEVELS = ('stale', 'poor', 'fair', 'good')
+
+UNKNOWN = LinkQuality('unknown', None, 0.0, 0.0, 0.0, 0, 0, 0)
+
+
+def parse_status(status):
+    """Convert a status broadcast into a HeadsetStatus, missing fields get placeholder values"""
+    return HeadsetStatus(
+        status.get('device_name', 'Unknown'),
+        status.get('device_model', 'Unknown'),
+        float(status.get('device_battery', 0)),
+        status.get('active_block', 'Inactive'),
+        int(status.get('current_trial', 0)),
+        int(status.get('total_trials', 0)),
+        status.get('fixation_required', True),
+    )
+
+
+def parse_log_batch(batch):
+    """Convert a log_batch message into LogEntry tuples"""
+    return [LogEntry(entry.get('level'), float(entry.get('time', 0.0)), str(entry.get('message', '')),
+                     entry.get('stack'))
+            for entry in batch]
@@ -0,0 +1,153 @@
+"""Opt-in timing spans for finding where the client spends its time, near free while switched off"""
+import json
+import threading
+import time
+from collections import deque
+
+from stats import percentile
+
+
+class SpanStats:
+    """Count, total and maximum of one span, with a window of recent durations for percentiles"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.recent.append(elapsed)
+
+    def summary(self):
+        recent = [elapsed * 1000 for elapsed in self.recent]
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total * 1000 / self.count if self.count else 0.0,
+            'p50_ms': percentile(recent, 0.5),
+            'p99_ms': percentile(recent, 0.99),
+            'max_ms': self.max * 1000,
+        }
+
+
+class Span:
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.started, time.perf_counter() - self.started)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    """
+    Collects durations of named spans from any thread while enabled. While disabled span() returns a
+    shared no-op context manager, so instrumented code only pays for one attribute check. With tracing
+    on, every span is also kept as an event, up to `max_events`, for write_trace().
+    """
+
+    def __init__(self, window=10000, max_events=500000):
+        self.window = window
+        self.max_events = max_events
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.events = None
+        self.dropped_events = 0
+        self.started_at = time.perf_counter()
+
+    def start(self, trace=False):
+        """Start a new profile, discarding the previous one"""
+        with self.lock:
+            self.stats = {}
+            self.events = [] if trace else None
+            self.dropped_events = 0
+            self.started_at = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        """Stop collecting, the profile stays available to summary() and write_trace()"""
+        self.enabled = False
+        return self.summary()
+
+    @property
+    def tracing(self):
+        return self.events is not None
+
+    def span(self, name, detail=None):
+        """Context manager timing a block as `name`, or `name.detail`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, f"{name}.{detail}" if detail is not None else name)
+
+    def record(self, name, started, elapsed):
+        """Record a duration directly, `started` is a time.perf_counter() value"""
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats(self.window)
+            stats.add(elapsed)
+            if self.events is not None:
+                if len(self.events) < self.max_events:
+                    self.events.append((name, started, elapsed, threading.get_ident()))
+                else:
+                    self.dropped_events += 1
+
+    def summary(self):
+        """Per-span statistics, the spans taking the most time in total first"""
+        with self.lock:
+            summaries = {name: stats.summary() for name, stats in self.stats.items()}
+        return dict(sorted(summaries.items(), key=lambda item: -item[1]['total_ms']))
+
+    def write_trace(self, path):
+        """Write the traced spans as a Chrome trace, viewable in chrome://tracing or Perfetto"""
+        with self.lock:
+            events = list(self.events or ())
+            started_at = self.started_at
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': ident, 'args': {'name': names.get(ident, str(ident))}}
+                 for ident in {event[3] for event in events}]
+        trace.extend({'name': name, 'ph': 'X', 'pid': 1, 'tid': ident,
+                      'ts': (started - started_at) * 1e6, 'dur': elapsed * 1e6}
+                     for name, started, elapsed, ident in events)
+        with open(path, 'w') as output:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, output)
+        return len(events)
+
+
+async def watch_event_loop(profiler, interval=0.05):
+    """Record how late the running event loop wakes from a sleep as `loop.lag`, until profiling stops"""
+    import asyncio
+
+    while profiler.enabled:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        profiler.record('loop.lag', expected, max(0.0, time.perf_counter() - expected))
+
+
+# Shared by every module, so one switch turns instrumentation on everywhere
+profiler = Profiler()
@@ -0,0 +1,298 @@
+"""Wire format shared by the client and the stand-in server"""
+import base64
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fastest available JSON decoder, orjson accepts both str and bytes
+if orjson is not None:
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+else:
+    loads = json.loads
+    JSON_BACKEND = "json"
+
+# Protocol versions: 1 nests each payload as a JSON string inside the envelope, 2 uses a flat envelope,
+# 3 also accepts commands tagged with a request id and echoes the id in the reply, 4 sends log messages
+# in batches with their level, time and stack trace, 5 sends screenshots and large frames in binary chunks
+LEGACY_VERSION = 1
+FLAT_VERSION = 2
+TAGGED_VERSION = 3
+BATCHED_LOGS_VERSION = 4
+CHUNKED_FRAMES_VERSION = 5
+PROTOCOL_VERSION = 5
+
+# Largest message accepted, servers before version 5 send each screenshot as one base64 JSON message
+MAX_MESSAGE_SIZE = 32 * 1024 * 1024
+# Payload bytes per chunk, and the most bytes of incomplete transfers a client buffers
+CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_BUFFER = 64 * 1024 * 1024
+
+# Commands understood by HeadsupServer
+LIVE_VIEW_STOP = "live_view_stop"
+FRAME_ACK = "frame_ack"
+INVALID_COMMAND = "Invalid Command"
+
+# Binary message kinds, the first byte of every binary WebSocket message
+FRAME_MESSAGE = 0x01
+FRAME_CHUNK = 0x02
+SCREENSHOT_CHUNK = 0x03
+
+# Header of a chunk: kind, capture source index, transfer id, chunk index, chunk count
+CHUNK_HEADER = struct.Struct('<BBIHH')
+
+
+def negotiate_command(version=PROTOCOL_VERSION):
+    """Build the command asking the server to switch to the given protocol version"""
+    return f"protocol:{version}"
+
+
+def encode_message(kind, data, version=LEGACY_VERSION, request_id=None):
+    """Encode a typed message the way a server speaking `version` would"""
+    if version >= FLAT_VERSION:
+        message = {"type": kind, "data": data}
+        if request_id is not None and version >= TAGGED_VERSION:
+            message["id"] = request_id
+        return json.dumps(message)
+    return json.dumps({"type": kind, "data": json.dumps(data)})
+
+
+def encode_logs(entries, version=LEGACY_VERSION):
+    """
+    Encode log entries as a server speaking `version` would, one log_batch message from version 4 and
+    one logs message per entry before that
+    """
+    if version >= BATCHED_LOGS_VERSION:
+        return [encode_message("log_batch", entries, version)]
+    return [encode_message("logs", entry["message"], version) for entry in entries]
+
+
+def encode_screenshot(captures, version=LEGACY_VERSION, request_id=None, transfer=0, chunk_size=CHUNK_SIZE):
+    """
+    Encode a screenshot reply from raw or base64 captures, one per source. Before version 5 that is one
+    JSON message of base64 strings, from version 5 binary chunks followed by a JSON message naming
+    the transfer.
+    """
+    if version < CHUNKED_FRAMES_VERSION:
+        captures = [capture if isinstance(capture, str) else base64.b64encode(capture).decode('ascii')
+                    for capture in captures]
+        return [encode_message("screenshot", captures, version, request_id)]
+    messages = []
+    for source, capture in enumerate(captures):
+        messages.extend(pack_chunks(SCREENSHOT_CHUNK, source, transfer, capture_bytes(capture), chunk_size))
+    messages.append(encode_message("screenshot", {"transfer": transfer, "sources": len(captures)}, version, request_id))
+    return messages
+
+
+def capture_bytes(capture):
+    """Image bytes of a screenshot capture, which older servers send base64 encoded"""
+    return base64.b64decode(capture) if isinstance(capture, str) else capture
+
+
+def encode_reply(data, version=LEGACY_VERSION, request_id=None):
+    """Encode a command reply, untagged replies are a bare JSON value"""
+    if request_id is None or version < TAGGED_VERSION:
+        return json.dumps(data)
+    return encode_message("reply", data, version, request_id)
+
+
+def encode_command(command, request_id=None):
+    """Encode a command, tagged with a request id if given"""
+    if request_id is None:
+        return command
+    return json.dumps({"id": request_id, "command": command})
+
+
+def decode_command(message):
+    """Split a possibly tagged command into (command, request_id)"""
+    if message.startswith("{"):
+        request = json.loads(message)
+        return str(request.get("command", "")), request.get("id")
+    return message, None
+
+
+def expects_reply(command):
+    return command != FRAME_ACK
+
+
+def reply_kind(command):
+    """Message type the server answers a command with"""
+    return 'screenshot' if command == "screenshot" else 'reply'
+
+
+class MessageCodec:
+    """
+    Decodes text messages into (type, data) pairs in a single pass. Starts out speaking the legacy
+    double-encoded protocol, and switches to the flat envelope once the server accepts the
+    negotiate_command() sent after connecting. Anything without a type is a plain command reply.
+    """
+
+    def __init__(self, max_chunk_buffer=MAX_CHUNK_BUFFER):
+        self.version = LEGACY_VERSION
+        self.negotiating = False
+        self.chunks = ChunkAssembler(max_chunk_buffer)
+
+    def start_negotiation(self):
+        """Return the command to send right after connecting"""
+        self.version = LEGACY_VERSION
+        self.negotiating = True
+        return negotiate_command()
+
+    def decode(self, message):
+        kind, payload, _ = self.decode_tagged(message)
+        return kind, payload
+
+    def decode_tagged(self, message):
+        """Decode into (type, data, request_id), the request id is None for untagged messages"""
+        try:
+            data = loads(message)
+        except ValueError:
+            return 'reply', message, None
+
+        if not isinstance(data, dict):
+            # Servers that predate negotiation reject the command, stay on the legacy protocol
+            if self.negotiating and data == INVALID_COMMAND:
+                self.negotiating = False
+                return 'protocol', self.version, None
+            return 'reply', data, None
+
+        kind = data.get('type')
+        if kind == 'protocol':
+            self.negotiating = False
+            self.version = min(int(data.get('version', LEGACY_VERSION)), PROTOCOL_VERSION)
+            return 'protocol', self.version, None
+
+        payload = data.get('data')
+        if self.version < FLAT_VERSION and isinstance(payload, str):
+            try:
+                payload = loads(payload)
+            except ValueError:
+                pass
+        elif kind == 'screenshot' and isinstance(payload, dict):
+            # Chunked screenshot, the captures arrived as binary chunks beforehand
+            payload = self.chunks.screenshot(payload)
+        return kind, payload, data.get('id')
+
+    @property
+    def tagged(self):
+        """True if commands can carry request ids on this connection"""
+        return self.version >= TAGGED_VERSION
+
+
+def live_view_start_command(fps, max_in_flight):
+    """Build the command subscribing to a live view stream"""
+    return f"live_view_start:{fps:g}:{max_in_flight}"
+
+
+def pack_frame(source, image_bytes):
+    """Pack an encoded image from a capture source into a binary frame message"""
+    return bytes((FRAME_MESSAGE, source)) + image_bytes
+
+
+def unpack_binary(message):
+    """Split a binary message into its kind, capture source index and payload"""
+    if len(message) < 2:
+        raise ValueError("Binary message too short")
+    return message[0], message[1], message[2:]
+
+
+def pack_chunks(kind, source, transfer, data, chunk_size=CHUNK_SIZE):
+    """Split image bytes into chunk messages of at most `chunk_size` payload bytes"""
+    count = max(1, -(-len(data) // chunk_size))
+    view = memoryview(data)
+    return [CHUNK_HEADER.pack(kind, source, transfer & 0xFFFFFFFF, index, count)
+            + view[index * chunk_size:(index + 1) * chunk_size]
+            for index in range(count)]
+
+
+def unpack_chunk(message):
+    """Split a chunk message into (kind, source, transfer, index, count, payload)"""
+    if len(message) < CHUNK_HEADER.size:
+        raise ValueError("Chunk message too short")
+    kind, source, transfer, index, count = CHUNK_HEADER.unpack_from(message)
+    if kind not in (FRAME_CHUNK, SCREENSHOT_CHUNK):
+        raise ValueError(f"Not a chunk message: {kind}")
+    if index >= count:
+        raise ValueError(f"Chunk {index} of {count}")
+    return kind, source, transfer, index, count, message[CHUNK_HEADER.size:]
+
+
+class ChunkAssembler:
+    """
+    Reassembles chunked frames and screenshots. Chunks may arrive in any order. Incomplete transfers and
+    completed screenshots waiting for their reply are buffered up to `max_bytes`, beyond which the
+    oldest are discarded, so a server that never finishes a transfer can't exhaust memory.
+    """
+
+    def __init__(self, max_bytes=MAX_CHUNK_BUFFER):
+        self.max_bytes = max_bytes
+        # (kind, transfer, source) -> list of chunks, None where still missing, oldest first
+        self.partial = {}
+        self.missing = {}
+        # (transfer, source) -> image bytes of completed screenshot captures
+        self.completed = {}
+        self.buffered = 0
+        self.discarded = 0
+
+    def add(self, message):
+        """
+        Add a chunk message. Returns (source, data) when it completes a live view frame, screenshot
+        captures are kept for screenshot() instead.
+        """
+        kind, source, transfer, index, count, payload = unpack_chunk(message)
+        if count == 1:
+            chunks = [payload]
+        else:
+            key = (kind, transfer, source)
+            chunks = self.partial.get(key)
+            if chunks is None:
+                chunks = self.partial[key] = [None] * count
+                self.missing[key] = count
+            if len(chunks) != count or chunks[index] is not None:
+                return None
+            chunks[index] = payload
+            self.missing[key] -= 1
+            self.buffered += len(payload)
+            if self.missing[key]:
+                self.evict()
+                return None
+            del self.partial[key], self.missing[key]
+            self.buffered -= sum(len(chunk) for chunk in chunks)
+
+        data = b''.join(chunks)
+        if kind == FRAME_CHUNK:
+            return source, data
+        if kind == SCREENSHOT_CHUNK:
+            self.completed[(transfer, source)] = data
+            self.buffered += len(data)
+            self.evict()
+        return None
+
+    def screenshot(self, reply):
+        """Captures of a chunked screenshot reply in source order, None if any were discarded"""
+        transfer = int(reply.get('transfer', 0))
+        captures = [self.completed.pop((transfer, source), None) for source in range(int(reply.get('sources', 0)))]
+        self.buffered -= sum(len(capture) for capture in captures if capture is not None)
+        if any(capture is None for capture in captures):
+            return None
+        return captures
+
+    def evict(self):
+        while self.buffered > self.max_bytes and (self.partial or self.completed):
+            if self.partial:
+                key = next(iter(self.partial))
+                self.buffered -= sum(len(chunk) for chunk in self.partial.pop(key) if chunk is not None)
+                del self.missing[key]
+            else:
+                self.buffered -= len(self.completed.pop(next(iter(self.completed))))
+            self.discarded += 1
+
+    def reset(self):
+        self.partial.clear()
+        self.missing.clear()
+        self.completed.clear()
+        self.buffered = 0
@@ -0,0 +1,186 @@
+"""
+Append-only session recording. A session is a directory of chunk files, each starting with
+MAGIC followed by length-prefixed records: a RECORD_HEADER (timestamp, kind, payload length)
+and the payload bytes. Screenshots and live view frames are stored as a source index byte
+followed by the raw image bytes.
+"""
+import base64
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+MAGIC = b"HSREC\x01"
+RECORD_HEADER = struct.Struct('<dBI')
+
+# Record kinds, matching the message types produced by protocol.MessageCodec
+KINDS = {'status': 1, 'logs': 2, 'reply': 3, 'screenshot': 4, 'frame': 5, 'log_batch': 6}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+FSYNC_POLICIES = ('never', 'interval', 'always')
+
+
+def chunk_path(directory, index):
+    return os.path.join(directory, f"chunk-{index:05d}.hsrec")
+
+
+def encode_records(timestamp, kind, payload, source=0):
+    """
+    Encode one decoded inbound message as record bytes. Status and log payloads are stored as JSON
+    text, screenshot messages become one record per capture source.
+    """
+    code = KINDS.get(kind)
+    if code is None:
+        return []
+
+    if kind == 'screenshot':
+        # Base64 from servers before protocol version 5, raw bytes from chunked transfers
+        bodies = [bytes((index,)) + (base64.b64decode(capture) if isinstance(capture, str) else capture)
+                  for index, capture in enumerate(payload or ())]
+    elif kind == 'frame':
+        bodies = [bytes((source,)) + bytes(payload)]
+    else:
+        bodies = [json.dumps(payload).encode('utf-8')]
+    return [RECORD_HEADER.pack(timestamp, code, len(body)) + body for body in bodies]
+
+
+class SessionRecorder:
+    """
+    Records inbound traffic to disk on a background writer thread. record() only enqueues, so
+    recording never blocks the network or GUI thread; if the writer falls behind by more than
+    `max_pending` messages, further messages are dropped and counted. If writing fails, for example
+    on a full disk, `on_error` is called with the error from the writer thread and every message
+    from then on is dropped.
+    """
+
+    def __init__(self, directory, chunk_size=64 * 1024 * 1024, fsync='interval', fsync_interval=1.0,
+                 max_pending=10000, batch_size=256, on_error=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.on_error = on_error
+        # The OSError that stopped the writer, if any
+        self.error = None
+
+        self.chunk_index = 0
+        self.chunk_file = None
+        self.chunk_bytes = 0
+        self.last_fsync = 0.0
+
+        # Counters
+        self.recorded = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.open_chunk()
+        self.thread = threading.Thread(target=self.run, name="headsup-recorder", daemon=True)
+        self.thread.start()
+
+    def record(self, kind, payload, source=0):
+        """Queue a message for recording, safe to call from any thread"""
+        if self.error is not None:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait((time.time(), kind, payload, source))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        """Flush outstanding messages and close the recording, waiting at most `timeout` seconds for the writer"""
+        thread, self.thread = self.thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            # The writer is stuck, it is a daemon thread so it won't keep the process alive
+            return
+        thread.join(timeout)
+
+    def open_chunk(self):
+        if self.chunk_file is not None:
+            self.sync(force=True)
+            self.chunk_file.close()
+        self.chunk_file = open(chunk_path(self.directory, self.chunk_index), 'xb')
+        self.chunk_file.write(MAGIC)
+        self.chunk_bytes = len(MAGIC)
+        self.chunk_index += 1
+
+    def sync(self, force=False):
+        self.chunk_file.flush()
+        now = time.monotonic()
+        due = self.fsync == 'always' or (self.fsync == 'interval' and now - self.last_fsync >= self.fsync_interval)
+        if due or (force and self.fsync != 'never'):
+            os.fsync(self.chunk_file.fileno())
+            self.last_fsync = now
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            # Block for the first message, then take whatever else is waiting as one batch
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            encoded = 0
+            for item in batch:
+                if item is None:
+                    stopping = True
+                elif self.error is not None:
+                    # Keep draining after a failure so record() and stop() never wait on a full queue
+                    self.dropped += 1
+                else:
+                    try:
+                        records.extend(encode_records(*item))
+                        encoded += 1
+                    except (ValueError, TypeError):
+                        self.errors += 1
+
+            if self.error is None:
+                try:
+                    self.write(records)
+                    self.recorded += encoded
+                except OSError as e:
+                    self.dropped += encoded
+                    self.fail(e)
+
+        if self.error is None:
+            try:
+                self.sync(force=True)
+                self.chunk_file.close()
+            except OSError as e:
+                self.fail(e)
+        self.chunk_file = None
+
+    def write(self, records):
+        for record in records:
+            if self.chunk_bytes + len(record) > self.chunk_size and self.chunk_bytes > len(MAGIC):
+                self.open_chunk()
+            self.chunk_file.write(record)
+            self.chunk_bytes += len(record)
+        self.sync()
+
+    def fail(self, error):
+        """Stop writing after an error, the chunk written so far is left as it is"""
+        self.error = error
+        try:
+            self.chunk_file.close()
+        except OSError:
+            pass
+        if self.on_error is not None:
+            self.on_error(error)
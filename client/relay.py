@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Headless relay that lets many observers watch one headset over a single upstream connection"""
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+
+import protocol
+from client import HeadsupClient
+from connection import ReconnectPolicy
+
+NOT_CONNECTED = "Error: Headset not connected"
+NO_REPLY = "Error: No reply from headset"
+
+
+class RelaySession:
+    """Per-observer state, the relay speaks the same protocol to observers as HeadsupServer"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.protocol_version = protocol.LEGACY_VERSION
+        self.live_view_fps = 0.0
+        self.max_frames_in_flight = 0
+        self.frames_in_flight = 0
+        # When each capture source is next due, upstream may stream faster than this observer asked for
+        self.next_frame_time = {}
+
+    def start_live_view(self, command):
+        args = command.split(':')
+        try:
+            fps = float(args[1]) if len(args) > 1 else 10.0
+            max_in_flight = int(args[2]) if len(args) > 2 else 2
+        except ValueError:
+            fps, max_in_flight = 10.0, 2
+        self.live_view_fps = min(max(fps, 0.1), 60.0)
+        self.max_frames_in_flight = max(1, max_in_flight)
+        self.frames_in_flight = 0
+        self.next_frame_time = {}
+
+    def wants_frame(self, source, now):
+        if now < self.next_frame_time.get(source, 0.0) or self.frames_in_flight >= self.max_frames_in_flight:
+            return False
+        self.frames_in_flight += 1
+        self.next_frame_time[source] = now + 1.0 / self.live_view_fps
+        return True
+
+
+class HeadsupRelay:
+    """
+    Keeps one connection to a headset, through a HeadsupClient, and serves any number of observers.
+    Status and log broadcasts are fanned out, screenshots requested within `screenshot_window`
+    seconds of each other share one upstream capture, and live view frames are forwarded to each
+    subscriber as its credit allows. Other commands are forwarded and their replies routed back to
+    the observer that sent them.
+    """
+
+    def __init__(self, host, port=4444, screenshot_window=0.25, command_timeout=5.0, reconnect_policy=None,
+                 max_size=protocol.MAX_MESSAGE_SIZE, chunk_size=protocol.CHUNK_SIZE):
+        self.host = host
+        self.port = port
+        self.screenshot_window = screenshot_window
+        self.chunk_size = chunk_size
+
+        # Upstream connection to the headset, kept up for as long as the relay runs. Forwarded commands
+        # are quiet, so only broadcasts and frames reach the subscription in run_upstream
+        reconnect_policy = reconnect_policy or ReconnectPolicy(initial_delay=0.5, max_delay=15.0)
+        self.upstream = HeadsupClient(host, port, reconnect_policy, initial_connect_attempts=None,
+                                      command_timeout=command_timeout,
+                                      max_size=max_size, on_log=lambda message: self.log(message),
+                                      on_state=self.upstream_state_changed)
+        self.upstream_connected = False
+        self.last_status = None
+
+        # Latest screenshot and the upstream capture in progress, if any
+        self.screenshot = None
+        self.screenshot_time = 0.0
+        self.capture_future = None
+        # Id of the next chunked transfer to an observer
+        self.next_transfer = 0
+
+        # Observers, and the live view rate currently requested upstream
+        self.sessions = set()
+        self.live_view = set()
+        self.upstream_live_view = None
+
+        # Counters
+        self.screenshot_requests = 0
+        self.upstream_captures = 0
+
+    def log(self, message):
+        print(f"Relay: {message}", flush=True)
+
+    def broadcast(self, kind, data):
+        """Send a typed message to every observer, encoded once per protocol version in use"""
+        encoded = {}
+        for session in list(self.sessions):
+            version = session.protocol_version
+            if version not in encoded:
+                encoded[version] = protocol.encode_message(kind, data, version)
+            websockets.broadcast([session.websocket], encoded[version])
+
+    def broadcast_logs(self, entries):
+        """Send a log batch to every observer, as single log messages to those that didn't negotiate batches"""
+        encoded = {}
+        for session in list(self.sessions):
+            version = session.protocol_version
+            if version not in encoded:
+                encoded[version] = protocol.encode_logs(entries, version)
+            for message in encoded[version]:
+                websockets.broadcast([session.websocket], message)
+
+    def upstream_state_changed(self):
+        """Resubscribe to the live view after the headset connection comes back"""
+        connected = self.upstream.connected
+        if connected and not self.upstream_connected:
+            self.upstream_live_view = None
+            if self.live_view:
+                asyncio.ensure_future(self.update_live_view())
+        self.upstream_connected = connected
+
+    async def run_upstream(self):
+        """Run the headset client, fanning its broadcasts and frames out to the observers"""
+        messages = self.upstream.messages()
+        self.upstream.start()
+        try:
+            async for kind, payload in messages:
+                if kind == 'status':
+                    self.last_status = payload
+                    self.broadcast(kind, payload)
+                elif kind == 'logs':
+                    self.broadcast(kind, payload)
+                elif kind == 'log_batch':
+                    self.broadcast_logs(payload)
+                elif kind == 'frame':
+                    self.forward_frame(payload.source, payload.data)
+        finally:
+            messages.close()
+            self.upstream.stop()
+
+    def forward_frame(self, source, data):
+        """Send a live view frame to every observer with credit, chunked or whole by protocol version"""
+        now = time.monotonic()
+        ready = [session for session in list(self.live_view) if session.wants_frame(source, now)]
+        chunked = [session.websocket for session in ready
+                   if session.protocol_version >= protocol.CHUNKED_FRAMES_VERSION and len(data) > self.chunk_size]
+        if chunked:
+            for chunk in protocol.pack_chunks(protocol.FRAME_CHUNK, source, self.transfer_id(), data, self.chunk_size):
+                websockets.broadcast(chunked, chunk)
+        if len(chunked) < len(ready):
+            packet = protocol.pack_frame(source, data)
+            websockets.broadcast([session.websocket for session in ready if session.websocket not in chunked], packet)
+
+    def transfer_id(self):
+        self.next_transfer += 1
+        return self.next_transfer
+
+    async def forward(self, command):
+        """Send a command upstream and return the reply, or None if there was none in time"""
+        return await self.upstream.send_command(command, quiet=True)
+
+    async def capture_upstream(self):
+        self.upstream_captures += 1
+        captures = await self.forward("screenshot")
+        if captures is not None:
+            self.screenshot = captures
+            self.screenshot_time = time.monotonic()
+        return captures
+
+    async def capture(self):
+        """Latest screenshot, sharing a recent or in-progress upstream capture where possible"""
+        self.screenshot_requests += 1
+        if self.screenshot is not None and time.monotonic() - self.screenshot_time <= self.screenshot_window:
+            return self.screenshot
+        if self.capture_future is None:
+            self.capture_future = asyncio.ensure_future(self.capture_upstream())
+
+            def finished(_):
+                self.capture_future = None
+            self.capture_future.add_done_callback(finished)
+        return await asyncio.shield(self.capture_future)
+
+    async def update_live_view(self):
+        """Subscribe upstream at the fastest rate any observer asked for, or unsubscribe"""
+        fps = max((session.live_view_fps for session in self.live_view), default=None)
+        if fps == self.upstream_live_view:
+            return
+        self.upstream_live_view = fps
+        if fps is None:
+            await self.forward(protocol.LIVE_VIEW_STOP)
+        else:
+            await self.forward(protocol.live_view_start_command(fps, 2))
+
+    async def handle_command(self, session, message):
+        try:
+            command, request_id = protocol.decode_command(message)
+        except ValueError:
+            command, request_id = message, None
+
+        async def reply(data):
+            await session.websocket.send(protocol.encode_reply(data, session.protocol_version, request_id))
+
+        if command.startswith("protocol:"):
+            try:
+                requested = int(command.split(':')[1])
+            except ValueError:
+                requested = protocol.LEGACY_VERSION
+            session.protocol_version = max(protocol.LEGACY_VERSION, min(requested, protocol.PROTOCOL_VERSION))
+            await session.websocket.send(json.dumps({"type": "protocol", "version": session.protocol_version}))
+        elif command == "active":
+            # Observer heartbeats measure the link to the relay, the relay's own client watches the headset
+            await reply(True if self.upstream.connected else NOT_CONNECTED)
+        elif command == protocol.FRAME_ACK:
+            session.frames_in_flight = max(0, session.frames_in_flight - 1)
+        elif command == "screenshot":
+            captures = await self.capture()
+            if captures is None:
+                await reply(NO_REPLY if self.upstream.connected else NOT_CONNECTED)
+            else:
+                for message in protocol.encode_screenshot(captures, session.protocol_version, request_id,
+                                                          self.transfer_id(), self.chunk_size):
+                    await session.websocket.send(message)
+        elif command.startswith("live_view_start"):
+            session.start_live_view(command)
+            self.live_view.add(session)
+            await self.update_live_view()
+            await reply("Live View Started" if self.upstream.connected else NOT_CONNECTED)
+        elif command == protocol.LIVE_VIEW_STOP:
+            self.live_view.discard(session)
+            await self.update_live_view()
+            await reply("Live View Stopped")
+        else:
+            result = await self.forward(command)
+            if result is None:
+                result = NO_REPLY if self.upstream.connected else NOT_CONNECTED
+            await reply(result)
+
+    async def handler(self, websocket):
+        session = RelaySession(websocket)
+        self.sessions.add(session)
+        self.log(f"observer connected ({len(self.sessions)} total)")
+        try:
+            if self.last_status is not None:
+                await websocket.send(protocol.encode_message("status", self.last_status, session.protocol_version))
+            async for message in websocket:
+                if isinstance(message, str):
+                    # Commands from one observer are handled concurrently so a slow reply doesn't hold up the rest
+                    asyncio.ensure_future(self.handle_command(session, message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.sessions.discard(session)
+            if session in self.live_view:
+                self.live_view.discard(session)
+                await self.update_live_view()
+            self.log(f"observer disconnected ({len(self.sessions)} total)")
+
+    async def serve(self, host, port):
+        async with websockets.serve(self.handler, host, port):
+            self.log(f"relaying ws://{self.host}:{self.port} on ws://{host}:{port}")
+            await self.run_upstream()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay one headset to many Headsup observers")
+    parser.add_argument("headset", help="Headset IP address")
+    parser.add_argument("--headset-port", type=int, default=4444)
+    parser.add_argument("--host", default="0.0.0.0", help="Address observers connect to")
+    parser.add_argument("--port", type=int, default=4445, help="Port observers connect to")
+    parser.add_argument("--screenshot-window", type=float, default=0.25,
+                        help="Seconds within which screenshot requests share one capture")
+    parser.add_argument("--max-size-mib", type=float, default=protocol.MAX_MESSAGE_SIZE / 2 ** 20,
+                        help="Largest message accepted from the headset, in MiB")
+    args = parser.parse_args()
+
+    relay = HeadsupRelay(args.headset, args.headset_port, screenshot_window=args.screenshot_window,
+                         max_size=int(args.max_size_mib * 2 ** 20))
+    try:
+        asyncio.run(relay.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
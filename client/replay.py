@@ -0,0 +1,232 @@
+"""Replay of recorded sessions with random-access seeking"""
+import mmap
+import os
+import threading
+import time
+from array import array
+
+from models import Frame
+from protocol import loads
+from recorder import KIND_NAMES, KINDS, MAGIC, RECORD_HEADER
+
+STATUS = KINDS['status']
+IMAGE_KINDS = (KINDS['screenshot'], KINDS['frame'])
+
+
+class SessionIndex:
+    """
+    Memory-maps the chunk files of a recorded session and indexes each record's location and
+    timestamp by reading record headers only. A per-second table makes seeking constant time,
+    and payloads are only read when a record is replayed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = []
+        self.maps = []
+
+        # One entry per record
+        self.timestamps = array('d')
+        self.kinds = array('B')
+        self.chunks = array('H')
+        self.offsets = array('Q')
+        self.lengths = array('I')
+
+        # Most recent status record, and image record of each capture source, at or before each record, -1 if none
+        self.last_status = array('i')
+        self.last_images = {}
+
+        # First record index for each whole second since the start of the session
+        self.seconds = array('I')
+
+        chunk_names = sorted(name for name in os.listdir(directory) if name.endswith('.hsrec'))
+        for name in chunk_names:
+            self.index_chunk(os.path.join(directory, name))
+        if not self.timestamps:
+            self.close()
+            raise ValueError(f"No records found in {directory}")
+
+        self.start = self.timestamps[0]
+        self.end = self.timestamps[-1]
+        for i, timestamp in enumerate(self.timestamps):
+            second = int(timestamp - self.start)
+            while len(self.seconds) <= second:
+                self.seconds.append(i)
+
+    def index_chunk(self, path):
+        size = os.path.getsize(path)
+        if size <= len(MAGIC):
+            return
+        chunk_file = open(path, 'rb')
+        chunk_map = mmap.mmap(chunk_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if chunk_map[:len(MAGIC)] != MAGIC:
+            chunk_map.close()
+            chunk_file.close()
+            raise ValueError(f"{path} is not a Headsup recording")
+
+        chunk = len(self.maps)
+        self.files.append(chunk_file)
+        self.maps.append(chunk_map)
+
+        position = len(MAGIC)
+        while position + RECORD_HEADER.size <= size:
+            timestamp, kind, length = RECORD_HEADER.unpack_from(chunk_map, position)
+            position += RECORD_HEADER.size
+            if position + length > size:
+                # Truncated final record, e.g. the recording was interrupted
+                break
+
+            index = len(self.timestamps)
+            self.timestamps.append(timestamp)
+            self.kinds.append(kind)
+            self.chunks.append(chunk)
+            self.offsets.append(position)
+            self.lengths.append(length)
+            self.last_status.append(index if kind == STATUS else (self.last_status[-1] if index else -1))
+            source = chunk_map[position] if kind in IMAGE_KINDS and length else None
+            if source is not None and source not in self.last_images:
+                self.last_images[source] = array('i', [-1]) * index
+            for image_source, last_image in self.last_images.items():
+                last_image.append(index if image_source == source else (last_image[-1] if index else -1))
+            position += length
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def find(self, offset):
+        """Index of the first record at or after `offset` seconds into the session"""
+        timestamp = self.start + offset
+        second = int(min(max(offset, 0), self.duration))
+        index = self.seconds[min(second, len(self.seconds) - 1)]
+        # Only records within the same second are scanned
+        while index < len(self.timestamps) and self.timestamps[index] < timestamp:
+            index += 1
+        return index
+
+    def payload(self, index):
+        start = self.offsets[index]
+        return self.maps[self.chunks[index]][start:start + self.lengths[index]]
+
+    def message(self, index):
+        """Decode a record into the (kind, source, payload) the network loop would have produced"""
+        kind = self.kinds[index]
+        payload = self.payload(index)
+        if kind in IMAGE_KINDS:
+            return 'frame', payload[0], payload[1:]
+        return KIND_NAMES[kind], 0, loads(payload)
+
+    def close(self):
+        for chunk_map in self.maps:
+            chunk_map.close()
+        for chunk_file in self.files:
+            chunk_file.close()
+        self.maps = []
+        self.files = []
+
+
+class ReplaySource:
+    """
+    Feeds recorded messages to `emit(kind, payload)` at the recorded pace, scaled by `speed`,
+    from a background thread. Images from every capture source are emitted as Frames, with the
+    source as a third argument to coalesce them by. Seeking re-emits the latest status and the latest image of
+    each source before the new position so views show the session state at that time. Records are
+    emitted while holding the condition, so `emit` must not block or call back into the source.
+    """
+
+    def __init__(self, index, emit):
+        self.index = index
+        self.emit = emit
+        self.condition = threading.Condition()
+        self.position = 0
+        self.current_time = 0.0
+        self.speed = 1.0
+        self.playing = False
+        self.closed = False
+
+        # Wall-clock time at which the session time `session_anchor` is replayed
+        self.wall_anchor = 0.0
+        self.session_anchor = index.start
+
+        self.thread = threading.Thread(target=self.run, name="headsup-replay", daemon=True)
+        self.thread.start()
+
+    def reanchor(self):
+        self.wall_anchor = time.monotonic()
+        self.session_anchor = self.index.start + self.current_time
+
+    def play(self):
+        with self.condition:
+            if self.position >= len(self.index):
+                self.position = 0
+                self.current_time = 0.0
+            self.playing = True
+            self.reanchor()
+            self.condition.notify()
+
+    def pause(self):
+        with self.condition:
+            self.playing = False
+            self.condition.notify()
+
+    def set_speed(self, speed):
+        with self.condition:
+            self.speed = speed
+            self.reanchor()
+            self.condition.notify()
+
+    def seek(self, offset):
+        """Jump to `offset` seconds into the session"""
+        offset = min(max(offset, 0.0), self.index.duration)
+        with self.condition:
+            self.position = self.index.find(offset)
+            self.current_time = offset
+            self.reanchor()
+            self.condition.notify()
+
+            # Emitted under the condition, like playback, so no newer record can be queued before them
+            previous = self.position - 1
+            if previous >= 0:
+                latest = [self.index.last_status[previous]]
+                latest.extend(last_image[previous] for last_image in self.index.last_images.values())
+                for record in sorted(latest):
+                    if record >= 0:
+                        self.emit_record(record)
+
+    def emit_record(self, index):
+        kind, source, payload = self.index.message(index)
+        if kind == 'frame':
+            self.emit(kind, Frame(source, payload), source)
+        else:
+            self.emit(kind, payload)
+
+    def run(self):
+        with self.condition:
+            while not self.closed:
+                if not self.playing or self.position >= len(self.index):
+                    self.playing = False
+                    self.condition.wait()
+                    continue
+
+                index = self.position
+                timestamp = self.index.timestamps[index]
+                delay = self.wall_anchor + (timestamp - self.session_anchor) / self.speed - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+
+                self.position += 1
+                self.current_time = timestamp - self.index.start
+                # Emitting only queues the message, it is held under the condition so a seek can't
+                # slip its records in between picking a record and emitting it
+                self.emit_record(index)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.index.close()
@@ -0,0 +1,90 @@
+"""Playback controls for replaying a recorded session through the control panel views"""
+import tkinter as tk
+from tkinter import ttk
+
+from replay import ReplaySource, SessionIndex
+
+SPEEDS = {"1x": 1.0, "4x": 4.0, "16x": 16.0}
+
+
+def format_offset(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ReplayWindow:
+    """Replays a session into the control panel's dispatcher, in place of a live connection"""
+
+    def __init__(self, gui, directory):
+        self.gui = gui
+        self.refresh_interval_ms = 200
+        self.scrubbing = False
+        self.index = SessionIndex(directory)
+        self.source = ReplaySource(self.index, gui.dispatcher.put)
+
+        self.window = tk.Toplevel(gui.root)
+        self.window.title("Headsup: Replay")
+        self.window.configure(bg=gui.bg_color)
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ttk.Frame(self.window, padding="12")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+
+        self.play_btn = ttk.Button(main_frame, text="Play", command=self.toggle_play)
+        self.play_btn.grid(row=0, column=0, padx=(0, 8))
+
+        ttk.Label(main_frame, text="Speed:").grid(row=0, column=1, padx=(0, 4))
+        self.speed_var = tk.StringVar(value="1x")
+        speed_combo = ttk.Combobox(main_frame, textvariable=self.speed_var, values=list(SPEEDS),
+                                   state='readonly', width=4)
+        speed_combo.grid(row=0, column=2, padx=(0, 8))
+        speed_combo.bind('<<ComboboxSelected>>', lambda _: self.source.set_speed(SPEEDS[self.speed_var.get()]))
+
+        self.position_label = ttk.Label(main_frame, text=self.position_text(0.0))
+        self.position_label.grid(row=0, column=3, sticky=tk.W)
+
+        # Scrubber, seeks when released so dragging doesn't replay every intermediate position
+        self.position_var = tk.DoubleVar(value=0.0)
+        self.scrubber = ttk.Scale(main_frame, from_=0.0, to=max(self.index.duration, 0.001),
+                                  variable=self.position_var, length=420)
+        self.scrubber.grid(row=1, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(8, 0))
+        self.scrubber.bind('<ButtonPress-1>', self.start_scrub)
+        self.scrubber.bind('<ButtonRelease-1>', self.end_scrub)
+
+        gui.log(f"Replaying {directory} ({len(self.index)} messages, {format_offset(self.index.duration)})")
+        self.window.after(self.refresh_interval_ms, self.refresh)
+
+    def position_text(self, offset):
+        return f"{format_offset(offset)} / {format_offset(self.index.duration)}"
+
+    def toggle_play(self):
+        if self.source.playing:
+            self.source.pause()
+        else:
+            self.source.play()
+        self.refresh_controls()
+
+    def start_scrub(self, _):
+        self.scrubbing = True
+
+    def end_scrub(self, _):
+        self.scrubbing = False
+        self.source.seek(self.position_var.get())
+
+    def refresh_controls(self):
+        self.play_btn.config(text="Pause" if self.source.playing else "Play")
+
+    def refresh(self):
+        if not self.scrubbing:
+            self.position_var.set(self.source.current_time)
+        self.position_label.config(text=self.position_text(self.position_var.get()))
+        self.refresh_controls()
+        self.window.after(self.refresh_interval_ms, self.refresh)
+
+    def close(self):
+        self.source.close()
+        self.gui.replay_window = None
+        self.gui.update_connection_state()
+        self.window.destroy()
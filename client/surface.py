@@ -0,0 +1,86 @@
+"""Canvas drawing surfaces that update what they show in place instead of reallocating it"""
+import tkinter as tk
+
+
+class FrameSurface:
+    """
+    Draws images onto a canvas in named areas, such as one per capture source. Each area has one
+    canvas item and keeps a PhotoImage for each of the last `max_sizes` image sizes drawn in it, so
+    an image of a size seen before is pasted into the existing PhotoImage rather than allocating a
+    new Tk image and canvas item for every frame.
+    """
+
+    def __init__(self, canvas, max_sizes=2):
+        self.canvas = canvas
+        self.max_sizes = max_sizes
+        self.items = {}
+        # Area -> {size: PhotoImage}, least recently used size first
+        self.photos = {}
+
+        # Counters, for the benchmark
+        self.pasted = 0
+        self.allocated = 0
+
+    def draw(self, area, image, x, y):
+        """Show a PIL image in an area with its top left corner at (x, y), must run on the Tk thread"""
+        from PIL import ImageTk
+
+        photos = self.photos.setdefault(area, {})
+        photo = photos.pop(image.size, None)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image)
+            self.allocated += 1
+            while len(photos) >= self.max_sizes:
+                del photos[next(iter(photos))]
+        else:
+            photo.paste(image)
+            self.pasted += 1
+        photos[image.size] = photo
+
+        item = self.items.get(area)
+        if item is None:
+            self.items[area] = self.canvas.create_image(x, y, image=photo, anchor=tk.NW)
+            return
+        self.canvas.coords(item, x, y)
+        # Tk redraws the item itself after a paste, only a different PhotoImage needs configuring
+        if self.canvas.itemcget(item, 'image') != str(photo):
+            self.canvas.itemconfigure(item, image=photo)
+
+    def hide(self, area):
+        """Remove an area's canvas item, its PhotoImages are kept for when it is drawn again"""
+        item = self.items.pop(area, None)
+        if item is not None:
+            self.canvas.delete(item)
+
+    def clear(self):
+        """Remove every canvas item and release the PhotoImages"""
+        for item in self.items.values():
+            self.canvas.delete(item)
+        self.items.clear()
+        self.photos.clear()
+
+
+class Sparkline:
+    """A small line chart of a series on its own canvas, redrawn by moving one line item's points"""
+
+    def __init__(self, parent, width=120, height=24, color='#4a9eff', background=None):
+        self.width = width
+        self.height = height
+        self.canvas = tk.Canvas(parent, width=width, height=height, highlightthickness=0, bg=background)
+        self.line = self.canvas.create_line(0, 0, 0, 0, fill=color, width=1.5, state=tk.HIDDEN)
+
+    def draw(self, values):
+        """Scale values to fill the canvas, hiding the line until there are at least two"""
+        if len(values) < 2:
+            self.canvas.itemconfigure(self.line, state=tk.HIDDEN)
+            return
+        low, high = min(values), max(values)
+        spread = (high - low) or 1.0
+        step = (self.width - 2) / (len(values) - 1)
+        usable = self.height - 4
+        coords = []
+        for i, value in enumerate(values):
+            coords.append(1 + i * step)
+            coords.append(2 + usable - (value - low) / spread * usable)
+        self.canvas.coords(self.line, *coords)
+        self.canvas.itemconfigure(self.line, state=tk.NORMAL)
@@ -0,0 +1,140 @@
+"""Fixed-size time series of numeric status fields, with the rates derived from them"""
+import math
+import operator
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import repeat
+
+
+class TelemetryStore:
+    """
+    Keeps the last `capacity` samples of numeric status fields, one array column per field and one
+    of timestamps, overwritten as a ring so memory stays the same however long a session runs. At
+    most one sample is kept per `interval` seconds, so faster status broadcasts don't shorten the
+    history. Windows are copied out of the ring as arrays in time order, and the rates are computed
+    over them with slicing and builtins rather than Python loops over samples.
+    """
+
+    def __init__(self, fields, capacity=7200, interval=1.0, max_blocks=64):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.interval = interval
+        self.times = array('d', bytes(8 * capacity))
+        self.columns = {field: array('d', bytes(8 * capacity)) for field in self.fields}
+        # Samples appended since the last clear, the next one is written at count % capacity
+        self.count = 0
+
+        # (block, start time, end time or None while active) of the latest blocks
+        self.blocks = deque(maxlen=max_blocks)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, **values):
+        """Record a sample of every field, returns False if it came within `interval` of the previous one"""
+        if self.count and timestamp - self.times[(self.count - 1) % self.capacity] < self.interval:
+            return False
+        slot = self.count % self.capacity
+        self.times[slot] = timestamp
+        for field in self.fields:
+            self.columns[field][slot] = float(values.get(field, math.nan))
+        self.count += 1
+        return True
+
+    def record_block(self, timestamp, block):
+        """Note the active block, None if there is none, starting a new one if it changed"""
+        active = self.blocks[-1] if self.blocks and self.blocks[-1][2] is None else None
+        if active is not None:
+            if active[0] == block:
+                return
+            self.blocks[-1] = (active[0], active[1], timestamp)
+        if block is not None:
+            self.blocks.append((block, timestamp, None))
+
+    def clear(self):
+        self.count = 0
+        self.blocks.clear()
+
+    def latest(self, field):
+        if not self.count:
+            return None
+        return self.columns[field][(self.count - 1) % self.capacity]
+
+    def latest_time(self):
+        if not self.count:
+            return None
+        return self.times[(self.count - 1) % self.capacity]
+
+    def ordered(self, column):
+        """A column's samples oldest first"""
+        if self.count <= self.capacity:
+            return column[:self.count]
+        slot = self.count % self.capacity
+        return column[slot:] + column[:slot]
+
+    def window(self, field, seconds=None):
+        """(times, values) arrays of a field's samples in the last `seconds`, or all of them"""
+        times = self.ordered(self.times)
+        values = self.ordered(self.columns[field])
+        if seconds is not None and times:
+            start = bisect_left(times, times[-1] - seconds)
+            times, values = times[start:], values[start:]
+        return times, values
+
+    def slope(self, field, seconds=None):
+        """Least squares change of a field per second over a window, None with fewer than two samples"""
+        times, values = self.window(field, seconds)
+        n = len(times)
+        if n < 2:
+            return None
+        # Relative to the first sample, Unix timestamps squared would lose precision
+        origin = times[0]
+        times = array('d', map(operator.sub, times, repeat(origin, n)))
+        mean_t = math.fsum(times) / n
+        mean_v = math.fsum(values) / n
+        variance = math.fsum(map(operator.mul, times, times)) / n - mean_t * mean_t
+        if variance <= 0:
+            return None
+        covariance = math.fsum(map(operator.mul, times, values)) / n - mean_t * mean_v
+        return covariance / variance
+
+    def increase(self, field, seconds=None):
+        """(total rise of a field, seconds covered) over a window, falls such as a reset to 0 are skipped"""
+        times, values = self.window(field, seconds)
+        if len(times) < 2:
+            return 0.0, 0.0
+        steps = map(operator.sub, values[1:], values[:-1])
+        return math.fsum(filter((0.0).__lt__, steps)), times[-1] - times[0]
+
+    def rate_per_minute(self, field, seconds=None):
+        """How fast a counting field such as the trial number goes up, None until it covers some time"""
+        rise, span = self.increase(field, seconds)
+        if span <= 0:
+            return None
+        return rise / span * 60
+
+    def eta(self, current_field, total_field, seconds=None):
+        """Seconds until the current field reaches the total at the rate over a window, None if unknown"""
+        rate = self.rate_per_minute(current_field, seconds)
+        current, total = self.latest(current_field), self.latest(total_field)
+        if not rate or current is None or total is None or total <= 0:
+            return None
+        return max(0.0, total - current) / rate * 60
+
+    def block_durations(self, now):
+        """(block, seconds) of the latest blocks, the active one up to `now`"""
+        return [(block, (end if end is not None else now) - start) for block, start, end in self.blocks]
+
+    def downsample(self, field, points, seconds=None):
+        """At most `points` of a field's values in a window, evenly strided, for drawing"""
+        _, values = self.window(field, seconds)
+        if len(values) <= points:
+            return values
+        return values[::math.ceil(len(values) / points)]
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
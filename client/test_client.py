@@ -0,0 +1,96 @@
+"""Tests for the client's handling of live view frames and their acknowledgements"""
+import asyncio
+
+import protocol
+from client import HeadsupClient
+from models import Frame
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def receive(client, messages):
+    websocket = FakeWebSocket()
+
+    async def run():
+        for message in messages:
+            await client.handle_binary_message(websocket, message)
+
+    asyncio.run(run())
+    return websocket.sent
+
+
+def test_whole_frame_acknowledged_on_receipt():
+    client = HeadsupClient("127.0.0.1")
+    frames = client.frames()
+
+    sent = receive(client, [protocol.pack_frame(1, b'image')])
+
+    assert sent == [protocol.FRAME_ACK]
+    assert list(frames.items) == [Frame(1, b'image')]
+
+
+def test_chunked_frame_acknowledged_once_on_last_chunk():
+    client = HeadsupClient("127.0.0.1")
+    frames = client.frames()
+    data = b'image' * 100
+    chunks = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, data, chunk_size=128)
+
+    sent = receive(client, chunks[:-1])
+    assert sent == []
+
+    sent = receive(client, chunks[-1:])
+    assert sent == [protocol.FRAME_ACK]
+    assert list(frames.items) == [Frame(0, data)]
+
+
+def test_frames_acknowledged_when_chunks_arrive_out_of_order():
+    client = HeadsupClient("127.0.0.1")
+    frames = client.frames(maxsize=10)
+    first = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, b'a' * 300, chunk_size=128)
+    second = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 2, b'b' * 300, chunk_size=128)
+
+    sent = receive(client, [first[0], second[0], first[2], second[2], first[1], second[1]])
+
+    # One ack per frame, sent with each frame's last chunk
+    assert sent == [protocol.FRAME_ACK] * 2
+    assert list(frames.items) == [Frame(0, b'a' * 300), Frame(0, b'b' * 300)]
+
+
+def test_discarded_frame_still_acknowledged():
+    client = HeadsupClient("127.0.0.1", max_chunk_buffer=100)
+    frames = client.frames()
+    # Two chunks overflow the buffer and are evicted, so neither frame completes
+    first = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, b'a' * 240, chunk_size=80)
+    second = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 2, b'b' * 240, chunk_size=80)
+
+    sent = receive(client, first[:2] + second[:2] + first[2:])
+
+    assert sent == [protocol.FRAME_ACK]
+    assert not frames.items
+
+
+def test_unreadable_frame_chunk_acknowledged():
+    client = HeadsupClient("127.0.0.1")
+    logged = []
+    client.on_log = logged.append
+    bad_index = protocol.CHUNK_HEADER.pack(protocol.FRAME_CHUNK, 0, 1, 5, 5) + b'data'
+    truncated = bytes((protocol.FRAME_CHUNK, 0, 1))
+
+    sent = receive(client, [bad_index, truncated])
+
+    assert sent == [protocol.FRAME_ACK] * 2
+    assert len(logged) == 2
+    assert all(message.startswith("Error processing message") for message in logged)
+
+
+def test_unreadable_screenshot_chunk_not_acknowledged():
+    client = HeadsupClient("127.0.0.1", on_log=lambda message: None)
+    bad_index = protocol.CHUNK_HEADER.pack(protocol.SCREENSHOT_CHUNK, 0, 1, 2, 1) + b'data'
+
+    assert receive(client, [bad_index, b'\x02']) == []
@@ -0,0 +1,73 @@
+"""Tests for discovering Headsup servers, against minimal local servers"""
+import asyncio
+import socket
+import time
+
+import websockets
+
+import protocol
+from discovery import DiscoveryScanner, network_hosts
+
+
+def serve(answer=True, status=True):
+    """Run a scan against a server that optionally answers `active` and optionally broadcasts a status"""
+
+    async def handler(websocket):
+        async for message in websocket:
+            if message == "active" and answer:
+                await websocket.send(protocol.encode_reply(True))
+                if status:
+                    await websocket.send(protocol.encode_message("status", {"device_name": "Quest 3"}))
+
+    async def scan(scanner):
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            scanner.port = server.sockets[0].getsockname()[1]
+            started = time.perf_counter()
+            results = await scanner.scan("127.0.0.1/32")
+            return results, time.perf_counter() - started
+
+    return scan
+
+
+def test_server_found():
+    scanner = DiscoveryScanner(timeout=0.5, status_timeout=0.5)
+    results, _ = asyncio.run(serve()(scanner))
+
+    result, = results
+    assert result.host == "127.0.0.1"
+    assert result.device_name == "Quest 3"
+    assert result.latency < 0.5
+    assert result.adb is None
+
+
+def test_server_without_status_reported_after_timeout():
+    scanner = DiscoveryScanner(timeout=0.3, status_timeout=0.3)
+    results, elapsed = asyncio.run(serve(status=False)(scanner))
+
+    result, = results
+    assert result.device_name == "Unknown"
+    # Given up once the status wait ran out, not after a longer transport timeout
+    assert 0.3 <= elapsed < 1.5
+
+
+def test_server_that_never_answers_not_reported():
+    scanner = DiscoveryScanner(timeout=0.3, status_timeout=0.3)
+    results, elapsed = asyncio.run(serve(answer=False)(scanner))
+
+    assert results == []
+    assert elapsed < 1.5
+
+
+def test_closed_port_not_reported():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    scanner = DiscoveryScanner(port=port, timeout=0.3)
+
+    assert asyncio.run(scanner.scan("127.0.0.1/32")) == []
+    assert scanner.scanned == 1
+
+
+def test_network_hosts():
+    assert network_hosts("192.168.1.0/30") == ["192.168.1.1", "192.168.1.2"]
+    assert network_hosts("10.0.0.5/32") == ["10.0.0.5"]
@@ -0,0 +1,92 @@
+"""Tests for chunked frame and screenshot reassembly"""
+import pytest
+
+import protocol
+
+
+def test_pack_and_unpack_chunks():
+    data = bytes(range(256)) * 10
+    messages = protocol.pack_chunks(protocol.FRAME_CHUNK, 2, 7, data, chunk_size=1000)
+
+    assert len(messages) == 3
+    chunks = [protocol.unpack_chunk(message) for message in messages]
+    assert [chunk[:5] for chunk in chunks] == [(protocol.FRAME_CHUNK, 2, 7, index, 3) for index in range(3)]
+    assert b''.join(chunk[5] for chunk in chunks) == data
+
+
+def test_unpack_chunk_rejects_bad_headers():
+    with pytest.raises(ValueError):
+        protocol.unpack_chunk(b'\x02\x00')
+    with pytest.raises(ValueError):
+        protocol.unpack_chunk(protocol.CHUNK_HEADER.pack(protocol.FRAME_MESSAGE, 0, 0, 0, 1))
+    with pytest.raises(ValueError):
+        protocol.unpack_chunk(protocol.CHUNK_HEADER.pack(protocol.FRAME_CHUNK, 0, 0, 3, 3))
+
+
+def test_frame_reassembled_in_any_order():
+    data = b'frame' * 1000
+    messages = protocol.pack_chunks(protocol.FRAME_CHUNK, 1, 3, data, chunk_size=999)
+    assembler = protocol.ChunkAssembler()
+
+    results = [assembler.add(message) for message in reversed(messages)]
+
+    assert results[:-1] == [None] * (len(messages) - 1)
+    assert results[-1] == (1, data)
+    assert assembler.buffered == 0
+    assert not assembler.partial
+
+
+def test_single_chunk_frame():
+    assembler = protocol.ChunkAssembler()
+    message, = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, b'small')
+    assert assembler.add(message) == (0, b'small')
+
+
+def test_duplicate_chunk_ignored():
+    messages = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, b'x' * 30, chunk_size=10)
+    assembler = protocol.ChunkAssembler()
+
+    assert assembler.add(messages[0]) is None
+    assert assembler.add(messages[0]) is None
+    assert assembler.add(messages[1]) is None
+    assert assembler.add(messages[2]) == (0, b'x' * 30)
+
+
+def test_interleaved_transfers():
+    first = protocol.pack_chunks(protocol.FRAME_CHUNK, 0, 1, b'a' * 20, chunk_size=10)
+    second = protocol.pack_chunks(protocol.FRAME_CHUNK, 1, 1, b'b' * 20, chunk_size=10)
+    assembler = protocol.ChunkAssembler()
+
+    assert assembler.add(first[0]) is None
+    assert assembler.add(second[0]) is None
+    assert assembler.add(second[1]) == (1, b'b' * 20)
+    assert assembler.add(first[1]) == (0, b'a' * 20)
+
+
+def test_screenshot_captures_kept_for_reply():
+    assembler = protocol.ChunkAssembler()
+    for source, data in enumerate((b'left' * 50, b'right' * 50)):
+        for message in protocol.pack_chunks(protocol.SCREENSHOT_CHUNK, source, 9, data, chunk_size=64):
+            assert assembler.add(message) is None
+
+    assert assembler.screenshot({'transfer': 9, 'sources': 2}) == [b'left' * 50, b'right' * 50]
+    assert assembler.buffered == 0
+
+
+def test_screenshot_with_missing_capture():
+    assembler = protocol.ChunkAssembler()
+    message, = protocol.pack_chunks(protocol.SCREENSHOT_CHUNK, 0, 4, b'only')
+    assembler.add(message)
+
+    assert assembler.screenshot({'transfer': 4, 'sources': 2}) is None
+
+
+def test_incomplete_transfers_evicted_beyond_limit():
+    assembler = protocol.ChunkAssembler(max_bytes=100)
+    for transfer in range(5):
+        # Only the first of two chunks of each frame arrives
+        assembler.add(protocol.pack_chunks(protocol.FRAME_CHUNK, 0, transfer, b'z' * 120, chunk_size=60)[0])
+
+    assert assembler.buffered <= 100
+    assert assembler.discarded == 4
+    assert list(assembler.partial) == [(protocol.FRAME_CHUNK, 4, 0)]
@@ -0,0 +1,91 @@
+"""Tests for session recording, read back through the replay index"""
+import os
+
+import pytest
+
+from recorder import MAGIC, SessionRecorder, chunk_path, encode_records
+from replay import SessionIndex
+
+
+def test_round_trip(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), fsync='never')
+    recorder.start()
+    recorder.record('status', {'device_name': 'Quest', 'current_trial': 3})
+    recorder.record('log_batch', [{'message': 'hello', 'level': 'log'}])
+    recorder.record('frame', b'jpeg bytes', source=1)
+    recorder.record('screenshot', [b'left', b'right'])
+    recorder.record('unknown', 'not recorded')
+    recorder.stop()
+
+    index = SessionIndex(str(tmp_path))
+    try:
+        messages = [index.message(i) for i in range(len(index))]
+    finally:
+        index.close()
+
+    assert messages[0] == ('status', 0, {'device_name': 'Quest', 'current_trial': 3})
+    assert messages[1] == ('log_batch', 0, [{'message': 'hello', 'level': 'log'}])
+    assert [(kind, source, bytes(data)) for kind, source, data in messages[2:]] == [
+        ('frame', 1, b'jpeg bytes'), ('frame', 0, b'left'), ('frame', 1, b'right')]
+    assert recorder.dropped == 0
+
+
+def test_base64_screenshot_decoded():
+    record, = encode_records(1.0, 'screenshot', ['aGVsbG8='])
+    assert record.endswith(b'\x00hello')
+
+
+def test_recording_split_into_chunks(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), chunk_size=200, fsync='never')
+    recorder.start()
+    for trial in range(20):
+        recorder.record('status', {'current_trial': trial})
+    recorder.stop()
+
+    assert os.path.exists(chunk_path(str(tmp_path), 1))
+    index = SessionIndex(str(tmp_path))
+    try:
+        assert [index.message(i)[2]['current_trial'] for i in range(len(index))] == list(range(20))
+    finally:
+        index.close()
+
+
+def test_truncated_record_skipped(tmp_path):
+    records = encode_records(1.0, 'status', {'a': 1}) + encode_records(2.0, 'status', {'a': 2})
+    with open(chunk_path(str(tmp_path), 0), 'wb') as chunk_file:
+        chunk_file.write(MAGIC + b''.join(records)[:-3])
+
+    index = SessionIndex(str(tmp_path))
+    try:
+        assert len(index) == 1
+        assert index.message(0) == ('status', 0, {'a': 1})
+    finally:
+        index.close()
+
+
+class FullDisk:
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def close(self):
+        pass
+
+
+def test_write_error_reported(tmp_path):
+    errors = []
+    recorder = SessionRecorder(str(tmp_path), fsync='never', on_error=errors.append)
+    recorder.start()
+    recorder.chunk_file.close()
+    recorder.chunk_file = FullDisk()
+    recorder.record('status', {})
+    recorder.stop()
+
+    assert [error.errno for error in errors] == [28]
+    assert (recorder.recorded, recorder.dropped) == (0, 1)
+    recorder.record('status', {})
+    assert recorder.dropped == 2
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        SessionRecorder(str(tmp_path), fsync='sometimes')
@@ -0,0 +1,153 @@
+"""Tests for indexing and seeking recorded sessions"""
+import threading
+import time
+
+import pytest
+
+from models import Frame
+from recorder import MAGIC, chunk_path, encode_records
+from replay import ReplaySource, SessionIndex
+
+START = 1700000000.0
+
+
+def write_session(directory, records):
+    """Write (offset, kind, payload, source) records as one chunk file"""
+    with open(chunk_path(str(directory), 0), 'wb') as chunk_file:
+        chunk_file.write(MAGIC)
+        for offset, kind, payload, source in records:
+            chunk_file.write(b''.join(encode_records(START + offset, kind, payload, source)))
+
+
+def session_records(seconds=10, per_second=10):
+    """A status every second, and frames from two capture sources in between"""
+    records = []
+    for step in range(seconds * per_second):
+        offset = step / per_second
+        if step % per_second == 0:
+            records.append((offset, 'status', {'t': offset}, 0))
+        else:
+            records.append((offset, 'frame', str(offset).encode(), step % 2))
+    return records
+
+
+@pytest.fixture
+def index(tmp_path):
+    write_session(tmp_path, session_records())
+    index = SessionIndex(str(tmp_path))
+    yield index
+    index.close()
+
+
+def describe(kind, payload):
+    if kind == 'frame':
+        return kind, payload.source, float(payload.data)
+    return kind, payload['t']
+
+
+def test_index(index):
+    assert len(index) == 100
+    assert index.duration == pytest.approx(9.9)
+    assert index.message(0) == ('status', 0, {'t': 0.0})
+    kind, source, payload = index.message(3)
+    assert (kind, source, bytes(payload)) == ('frame', 1, b'0.3')
+
+
+def test_find(index):
+    assert index.find(0.0) == 0
+    assert index.find(2.5) == 25
+    assert index.find(2.55) == 26
+    assert index.find(100.0) == 100
+
+
+def test_latest_records(index):
+    assert index.last_status[25] == 20
+    assert index.last_images[0][25] == 24
+    assert index.last_images[1][25] == 25
+    # Source 1's first frame comes after the first record
+    assert index.last_images[1][0] == -1
+
+
+def test_no_records(tmp_path):
+    write_session(tmp_path, [])
+    with pytest.raises(ValueError):
+        SessionIndex(str(tmp_path))
+
+
+def test_seek_emits_latest_state(index):
+    emitted = []
+    source = ReplaySource(index, lambda kind, payload, key=None: emitted.append(describe(kind, payload)))
+    try:
+        source.seek(4.55)
+        assert source.current_time == 4.55
+        assert source.position == 46
+        # The latest status and latest frame of each source before the new position, in recorded order
+        assert emitted == [('status', 4.0), ('frame', 0, 4.4), ('frame', 1, 4.5)]
+
+        emitted.clear()
+        source.seek(0.0)
+        assert emitted == []
+    finally:
+        source.close()
+
+
+def test_seek_clamped_to_session(index):
+    source = ReplaySource(index, lambda *args: None)
+    try:
+        source.seek(-5.0)
+        assert source.current_time == 0.0
+        source.seek(60.0)
+        assert source.current_time == index.duration
+        assert source.position == len(index) - 1
+    finally:
+        source.close()
+
+
+def test_playback_emits_frames_by_source(index):
+    emitted = []
+    done = threading.Event()
+
+    def emit(kind, payload, key=None):
+        emitted.append((kind, payload, key))
+        if len(emitted) == 5:
+            done.set()
+
+    source = ReplaySource(index, emit)
+    try:
+        source.set_speed(100.0)
+        source.play()
+        assert done.wait(5.0)
+        source.pause()
+    finally:
+        source.close()
+
+    assert emitted[0] == ('status', {'t': 0.0}, None)
+    assert emitted[1] == ('frame', Frame(1, b'0.1'), 1)
+    assert emitted[2] == ('frame', Frame(0, b'0.2'), 0)
+
+
+def test_seek_during_playback_not_overtaken(index):
+    emitted = []
+    lock = threading.Lock()
+
+    def emit(kind, payload, key=None):
+        with lock:
+            emitted.append((threading.current_thread().name, describe(kind, payload)))
+
+    source = ReplaySource(index, emit)
+    try:
+        source.set_speed(10.0)
+        source.play()
+        time.sleep(0.1)
+        source.seek(7.05)
+        time.sleep(0.1)
+        source.pause()
+    finally:
+        source.close()
+
+    seeked = [i for i, (thread, _) in enumerate(emitted) if thread != "headsup-replay"]
+    assert [emitted[i][1] for i in seeked] == [('frame', 0, 6.8), ('frame', 1, 6.9), ('status', 7.0)]
+    first, last = seeked[0], seeked[-1]
+    # The seek's records are emitted together, and playback resumes from the new position after them
+    assert last - first == len(seeked) - 1
+    assert all(description[-1] >= 7.05 for _, description in emitted[last + 1:])
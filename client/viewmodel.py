@@ -0,0 +1,54 @@
+"""View model that batches widget updates and skips the ones that wouldn't change anything"""
+
+
+class ViewModel:
+    """
+    Holds the options the GUI wants its widgets to show. set() and set_item() only record the
+    wanted value, flush() then configures each widget once with the options that differ from what
+    it last applied. The GUI flushes once per tick, so any number of updates between ticks cost at
+    most one configure per widget, and a status broadcast that changed nothing costs none.
+
+    Every update to a widget option managed here has to go through the view model, a direct
+    configure would leave it comparing against a stale value.
+    """
+
+    def __init__(self):
+        # (widget, canvas item or None) -> {option: value}
+        self.applied = {}
+        self.pending = {}
+
+        # Counters, for profiling
+        self.configured = 0
+        self.skipped = 0
+
+    def set(self, widget, **options):
+        """Update a widget's options on the next flush, if they changed"""
+        self.pending.setdefault((widget, None), {}).update(options)
+
+    def set_item(self, canvas, item, **options):
+        """Update a canvas item's options on the next flush, if they changed"""
+        self.pending.setdefault((canvas, item), {}).update(options)
+
+    def flush(self):
+        """Configure every widget with the options that changed since the last flush, must run on the Tk thread"""
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, {}
+        configured = 0
+        for (widget, item), options in pending.items():
+            applied = self.applied.setdefault((widget, item), {})
+            changed = {option: value for option, value in options.items() if applied.get(option, _UNSET) != value}
+            if not changed:
+                self.skipped += 1
+                continue
+            if item is None:
+                widget.configure(**changed)
+            else:
+                widget.itemconfigure(item, **changed)
+            applied.update(changed)
+            configured += 1
+        self.configured += configured
+        return configured
+
+
+_UNSET = object()
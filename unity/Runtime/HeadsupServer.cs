@@ -4,7 +4,11 @@ Author: Henry Burgess <henry.burgess@wustl.edu>
 */
 using UnityEngine;
 using System;
+using System.Buffers.Binary;
+using System.Collections.Concurrent;
 using System.Collections.Generic;
+using System.Globalization;
+using System.Threading;
 using Newtonsoft.Json;
 using WebSocketSharp;
 using WebSocketSharp.Server;
@@ -16,93 +20,379 @@ namespace Headsup.Monitoring
         private readonly IHeadsupExperimentManager _experiment;
         private readonly IHeadsupPresentationManager _presentationManager;
         private readonly CaptureManager[] _captureSources;
+        private readonly LiveViewHub _liveView;
+        private readonly int _chunkSize;
 
-        public Handler(IHeadsupExperimentManager manager, IHeadsupPresentationManager presentationManager, CaptureManager[] sources)
+        // Live view subscription state, accessed from both the WebSocket and Unity main threads
+        private readonly object _liveViewLock = new();
+        private float _liveViewInterval;
+        private int _maxFramesInFlight;
+        private int _framesInFlight;
+
+        // Time at which the next live view frame is due, only used by the Unity main thread
+        public float NextFrameTime;
+
+        // Messages from SendMessage waiting to be sent, and 1 while a worker is sending them
+        private readonly ConcurrentQueue<string> _outbox = new();
+        private int _sending;
+
+        // Protocol versions: 1 nests each payload as a JSON string inside the envelope, 2 uses a flat envelope,
+        // 3 also accepts commands tagged with a request id and echoes the id in the reply, 4 receives log
+        // messages in batches with their level, time and stack trace, 5 receives screenshots and large live
+        // view frames as binary chunks
+        public const int LegacyProtocolVersion = 1;
+        public const int FlatProtocolVersion = 2;
+        public const int TaggedProtocolVersion = 3;
+        public const int BatchedLogsProtocolVersion = 4;
+        public const int ChunkedFramesProtocolVersion = 5;
+        public const int LatestProtocolVersion = 5;
+
+        // Negotiated by the client with the "protocol:N" command, legacy until then
+        private volatile int _protocolVersion = LegacyProtocolVersion;
+        public int ProtocolVersion => _protocolVersion;
+
+        public Handler(IHeadsupExperimentManager manager, IHeadsupPresentationManager presentationManager, CaptureManager[] sources, LiveViewHub liveView, int chunkSize, bool compression)
         {
             _experiment = manager;
             _presentationManager = presentationManager;
             _captureSources = sources;
+            _liveView = liveView;
+            _chunkSize = chunkSize;
+            // Decline permessage-deflate when compression is off, captures are already compressed images
+            IgnoreExtensions = !compression;
+        }
+
+        /// <summary>
+        /// Serialize a typed message for the given protocol version
+        /// </summary>
+        /// <param name="type">Message type, e.g. "status"</param>
+        /// <param name="data">Message payload</param>
+        /// <param name="version">Protocol version negotiated by the receiving client</param>
+        /// <param name="requestId">Request id of the command being answered, if it was tagged</param>
+        /// <returns>Serialized message</returns>
+        public static string Envelope(string type, object data, int version, long? requestId = null)
+        {
+            if (version >= FlatProtocolVersion)
+            {
+                var message = new Dictionary<string, object> { { "type", type }, { "data", data } };
+                if (requestId.HasValue && version >= TaggedProtocolVersion)
+                {
+                    message["id"] = requestId.Value;
+                }
+                return JsonConvert.SerializeObject(message);
+            }
+            return JsonConvert.SerializeObject(new Dictionary<string, string> { { "type", type }, { "data", JsonConvert.SerializeObject(data) } });
+        }
+
+        /// <summary>
+        /// Answer a command, echoing its request id if it was tagged, untagged replies are a bare JSON value
+        /// </summary>
+        /// <param name="requestId">Request id of the command, null if untagged</param>
+        /// <param name="data">Reply payload</param>
+        private void Reply(long? requestId, object data)
+        {
+            Send(requestId.HasValue ? Envelope("reply", data, _protocolVersion, requestId) : JsonConvert.SerializeObject(data));
+        }
+
+        /// <summary>
+        /// Split a command tagged as {"id": 1, "command": "start_task"} into its request id and command
+        /// </summary>
+        /// <param name="message">Received message, tagged or a bare command</param>
+        /// <param name="requestId">Request id, null if the command was untagged</param>
+        /// <returns>The command</returns>
+        private static string ParseCommand(string message, out long? requestId)
+        {
+            requestId = null;
+            if (!message.StartsWith("{"))
+            {
+                return message;
+            }
+            try
+            {
+                var request = JsonConvert.DeserializeObject<Dictionary<string, object>>(message);
+                if (request.TryGetValue("id", out object id) && id != null)
+                {
+                    requestId = Convert.ToInt64(id, CultureInfo.InvariantCulture);
+                }
+                return request.TryGetValue("command", out object command) ? command as string ?? "" : "";
+            }
+            catch (JsonException)
+            {
+                return message;
+            }
+        }
+
+        /// <summary>
+        /// Send an already serialized message to this client without blocking the caller. Messages are sent
+        /// in the order they were queued by one worker at a time, SendAsync doesn't keep messages in order.
+        /// </summary>
+        public void SendMessage(string message)
+        {
+            _outbox.Enqueue(message);
+            if (Interlocked.CompareExchange(ref _sending, 1, 0) == 0)
+            {
+                ThreadPool.QueueUserWorkItem(_ => DrainOutbox());
+            }
+        }
+
+        private void DrainOutbox()
+        {
+            while (true)
+            {
+                try
+                {
+                    while (_outbox.TryDequeue(out string message))
+                    {
+                        Send(message);
+                    }
+                }
+                catch (InvalidOperationException)
+                {
+                    // The client disconnected, the rest of its messages are discarded
+                    while (_outbox.TryDequeue(out _))
+                    {
+                    }
+                }
+                Volatile.Write(ref _sending, 0);
+
+                // Keep going if a message was queued after the last dequeue but before the flag was cleared
+                if (_outbox.IsEmpty || Interlocked.CompareExchange(ref _sending, 1, 0) != 0)
+                {
+                    return;
+                }
+            }
+        }
+
+        public float LiveViewInterval
+        {
+            get { lock (_liveViewLock) { return _liveViewInterval; } }
+        }
+
+        /// <summary>
+        /// Send a live view frame as a binary message, unless the client has not yet acknowledged
+        /// enough earlier frames. Slow clients skip frames rather than queueing them.
+        /// </summary>
+        /// <param name="packet">Binary frame packet</param>
+        /// <returns>True if the frame was sent</returns>
+        public bool TrySendFrame(byte[] packet)
+        {
+            if (!TakeFrameSlot())
+            {
+                return false;
+            }
+            SendAsync(packet, null);
+            return true;
+        }
+
+        /// <summary>
+        /// Send a live view frame split into chunks, counted as one frame in flight
+        /// </summary>
+        /// <param name="chunks">Chunk packets of one frame</param>
+        /// <returns>True if the frame was sent</returns>
+        public bool TrySendFrame(List<byte[]> chunks)
+        {
+            if (!TakeFrameSlot())
+            {
+                return false;
+            }
+            // Chunks are sent in order on a worker thread, SendAsync doesn't keep messages in order
+            ThreadPool.QueueUserWorkItem(_ =>
+            {
+                try
+                {
+                    foreach (var chunk in chunks)
+                    {
+                        Send(chunk);
+                    }
+                }
+                catch (InvalidOperationException)
+                {
+                    // The client disconnected part way through the frame
+                }
+            });
+            return true;
+        }
+
+        private bool TakeFrameSlot()
+        {
+            lock (_liveViewLock)
+            {
+                if (_framesInFlight >= _maxFramesInFlight)
+                {
+                    return false;
+                }
+                _framesInFlight++;
+                return true;
+            }
+        }
+
+        protected override void OnClose(CloseEventArgs e)
+        {
+            _liveView?.Unsubscribe(this);
+        }
+
+        /// <summary>
+        /// Parse a "live_view_start:fps:max_in_flight" command, both arguments are optional
+        /// </summary>
+        private void StartLiveView(string command)
+        {
+            string[] args = command.Split(':');
+            float fps = 10.0f;
+            int maxInFlight = 2;
+            if (args.Length > 1 && float.TryParse(args[1], NumberStyles.Float, CultureInfo.InvariantCulture, out float requestedFps))
+            {
+                fps = requestedFps;
+            }
+            if (args.Length > 2 && int.TryParse(args[2], out int requestedInFlight))
+            {
+                maxInFlight = requestedInFlight;
+            }
+
+            lock (_liveViewLock)
+            {
+                _liveViewInterval = 1.0f / Mathf.Clamp(fps, 0.1f, 60.0f);
+                _maxFramesInFlight = Mathf.Max(1, maxInFlight);
+                _framesInFlight = 0;
+            }
+            _liveView.Subscribe(this);
         }
 
         protected override void OnMessage(MessageEventArgs e)
         {
+            // Commands may be tagged with a request id, which is echoed in the reply
+            string command = ParseCommand(e.Data, out long? requestId);
+
             // Handle received messages and respond accordingly
-            if (e.Data == "active")
+            if (command.StartsWith("protocol:"))
+            {
+                // Negotiate the message envelope, answering with the version this server will use
+                if (int.TryParse(command.Substring("protocol:".Length), out int requested))
+                {
+                    _protocolVersion = Math.Max(LegacyProtocolVersion, Math.Min(requested, LatestProtocolVersion));
+                }
+                Send(JsonConvert.SerializeObject(new Dictionary<string, object> { { "type", "protocol" }, { "version", _protocolVersion } }));
+            }
+            else if (command == "active")
             {
                 // Return active status, "true" if responsive
-                Send(JsonConvert.SerializeObject(true));
+                Reply(requestId, true);
             }
-            else if (e.Data == "kill")
+            else if (command == "kill")
             {
                 // Force the experiment to end
                 if (_experiment != null)
                 {
                     _experiment.ForceEnd();
-                    Send(JsonConvert.SerializeObject("Done"));
+                    Reply(requestId, "Done");
                 }
                 else
                 {
                     Debug.LogWarning("Cannot execute 'kill' command: No IHeadsupExperimentManager available");
-                    Send(JsonConvert.SerializeObject("Error: Experiment manager not available"));
+                    Reply(requestId, "Error: Experiment manager not available");
                 }
             }
-            else if (e.Data == "disable_fixation")
+            else if (command == "disable_fixation")
             {
                 // Disable the fixation requirement
                 if (_presentationManager != null)
                 {
                     _presentationManager.SetRequireFixation(false);
-                    Send(JsonConvert.SerializeObject("Fixation Disabled"));
+                    Reply(requestId, "Fixation Disabled");
                 }
                 else
                 {
                     Debug.LogWarning("Cannot execute 'disable_fixation' command: No IHeadsupPresentationManager available");
-                    Send(JsonConvert.SerializeObject("Error: PresentationManager not available"));
+                    Reply(requestId, "Error: PresentationManager not available");
                 }
             }
-            else if (e.Data == "enable_fixation")
+            else if (command == "enable_fixation")
             {
                 // Enable the fixation requirement
                 if (_presentationManager != null)
                 {
                     _presentationManager.SetRequireFixation(true);
-                    Send(JsonConvert.SerializeObject("Fixation Enabled"));
+                    Reply(requestId, "Fixation Enabled");
                 }
                 else
                 {
                     Debug.LogWarning("Cannot execute 'enable_fixation' command: No IHeadsupPresentationManager available");
-                    Send(JsonConvert.SerializeObject("Error: PresentationManager not available"));
+                    Reply(requestId, "Error: PresentationManager not available");
                 }
             }
-            else if (e.Data == "start_task")
+            else if (command == "start_task")
             {
                 if (_experiment != null)
                 {
                     _experiment.StartTask();
-                    Send(JsonConvert.SerializeObject("Started Task"));
+                    Reply(requestId, "Started Task");
                 }
                 else
                 {
                     Debug.LogWarning("Cannot execute 'start_task' command: No IHeadsupExperimentManager available");
-                    Send(JsonConvert.SerializeObject("Error: Experiment manager not available"));
+                    Reply(requestId, "Error: Experiment manager not available");
                 }
             }
-            else if (e.Data == "start_calibration")
+            else if (command == "start_calibration")
             {
                 if (_experiment != null)
                 {
                     _experiment.StartCalibration();
-                    Send(JsonConvert.SerializeObject("Started Calibration"));
+                    Reply(requestId, "Started Calibration");
                 }
                 else
                 {
                     Debug.LogWarning("Cannot execute 'start_calibration' command: No IHeadsupExperimentManager available");
-                    Send(JsonConvert.SerializeObject("Error: Experiment manager not available"));
+                    Reply(requestId, "Error: Experiment manager not available");
+                }
+            }
+            else if (command.StartsWith("live_view_start"))
+            {
+                // Subscribe to a throttled stream of binary frames
+                if (_liveView != null && _captureSources != null && _captureSources.Length > 0)
+                {
+                    StartLiveView(command);
+                    Reply(requestId, "Live View Started");
+                }
+                else
+                {
+                    Debug.LogWarning("Cannot execute 'live_view_start' command: No capture sources available");
+                    Reply(requestId, "Error: Capture sources not available");
+                }
+            }
+            else if (command == "live_view_stop")
+            {
+                _liveView?.Unsubscribe(this);
+                Reply(requestId, "Live View Stopped");
+            }
+            else if (command == "frame_ack")
+            {
+                // Client has consumed a live view frame, release one slot
+                lock (_liveViewLock)
+                {
+                    _framesInFlight = Math.Max(0, _framesInFlight - 1);
                 }
             }
-            else if (e.Data == "screenshot")
+            else if (command == "screenshot")
             {
                 // Capture screenshot of current view
+                if (_protocolVersion >= ChunkedFramesProtocolVersion)
+                {
+                    // Send each capture as binary chunks, followed by a message naming the transfer
+                    uint transfer = LiveViewHub.NextTransferId();
+                    for (int i = 0; i < _captureSources.Length; i++)
+                    {
+                        _captureSources[i].CaptureScreenshot();
+                        byte[] capture = _captureSources[i].GetLastScreenshot();
+                        foreach (var chunk in LiveViewHub.PackChunks(LiveViewHub.ScreenshotChunk, i, transfer, capture, _chunkSize))
+                        {
+                            Send(chunk);
+                        }
+                    }
+                    var reply = new Dictionary<string, object> { { "transfer", transfer }, { "sources", _captureSources.Length } };
+                    Send(Envelope("screenshot", reply, _protocolVersion, requestId));
+                    return;
+                }
+
                 // Retrieve screenshots from each of the in-game displays
                 List<string> sourceCaptures = new();
                 foreach (var source in _captureSources)
@@ -114,15 +404,154 @@ namespace Headsup.Monitoring
                     sourceCaptures.Add(bufferContents);
                 }
 
-                Dictionary<string, string> toSend = new() { { "type", "screenshot" }, { "data", JsonConvert.SerializeObject(sourceCaptures) } };
-                Send(JsonConvert.SerializeObject(toSend));
+                Send(Envelope("screenshot", sourceCaptures, _protocolVersion, requestId));
             }
 
             else
             {
                 // Default error message
-                Debug.LogWarning("Invalid Command: " + e.Data);
-                Send(JsonConvert.SerializeObject("Invalid Command"));
+                Debug.LogWarning("Invalid Command: " + command);
+                Reply(requestId, "Invalid Command");
+            }
+        }
+    }
+
+    /// <summary>
+    /// Tracks live view subscribers and streams capture frames to them at their requested rate.
+    /// Frames are sent as binary messages: a kind byte, the capture source index, then the image bytes.
+    /// Clients at protocol version 5 get frames larger than the chunk size as chunks, each with a header of
+    /// kind byte, source index, transfer id (uint32), chunk index and chunk count (uint16, little endian).
+    /// </summary>
+    public class LiveViewHub
+    {
+        public const byte FrameMessage = 0x01;
+        public const byte FrameChunk = 0x02;
+        public const byte ScreenshotChunk = 0x03;
+        public const int ChunkHeaderSize = 10;
+
+        private static int _nextTransferId;
+
+        private readonly int _chunkSize;
+
+        public LiveViewHub(int chunkSize)
+        {
+            _chunkSize = chunkSize;
+        }
+
+        /// <summary>
+        /// Id for a new chunked transfer, unique per server
+        /// </summary>
+        public static uint NextTransferId() => unchecked((uint)Interlocked.Increment(ref _nextTransferId));
+
+        /// <summary>
+        /// Split image bytes into chunk packets of at most chunkSize payload bytes
+        /// </summary>
+        /// <param name="kind">FrameChunk or ScreenshotChunk</param>
+        /// <param name="source">Capture source index</param>
+        /// <param name="transfer">Transfer id shared by all chunks of the image</param>
+        /// <param name="data">Encoded image</param>
+        /// <param name="chunkSize">Payload bytes per chunk</param>
+        /// <returns>Chunk packets in order</returns>
+        public static List<byte[]> PackChunks(byte kind, int source, uint transfer, byte[] data, int chunkSize)
+        {
+            int count = Math.Max(1, (data.Length + chunkSize - 1) / chunkSize);
+            var chunks = new List<byte[]>(count);
+            for (int index = 0; index < count; index++)
+            {
+                int offset = index * chunkSize;
+                int length = Math.Min(chunkSize, data.Length - offset);
+                byte[] chunk = new byte[ChunkHeaderSize + length];
+                chunk[0] = kind;
+                chunk[1] = (byte)source;
+                BinaryPrimitives.WriteUInt32LittleEndian(new Span<byte>(chunk, 2, 4), transfer);
+                BinaryPrimitives.WriteUInt16LittleEndian(new Span<byte>(chunk, 6, 2), (ushort)index);
+                BinaryPrimitives.WriteUInt16LittleEndian(new Span<byte>(chunk, 8, 2), (ushort)count);
+                Buffer.BlockCopy(data, offset, chunk, ChunkHeaderSize, length);
+                chunks.Add(chunk);
+            }
+            return chunks;
+        }
+
+        private readonly List<Handler> _subscribers = new();
+        private readonly List<Handler> _due = new();
+
+        public void Subscribe(Handler handler)
+        {
+            lock (_subscribers)
+            {
+                if (!_subscribers.Contains(handler))
+                {
+                    _subscribers.Add(handler);
+                }
+            }
+        }
+
+        public void Unsubscribe(Handler handler)
+        {
+            lock (_subscribers)
+            {
+                _subscribers.Remove(handler);
+            }
+        }
+
+        /// <summary>
+        /// Send the latest capture from each source to every subscriber whose next frame is due.
+        /// Must be called from the Unity main thread.
+        /// </summary>
+        /// <param name="time">Current time in seconds</param>
+        /// <param name="sources">Capture sources to stream</param>
+        public void Update(float time, CaptureManager[] sources)
+        {
+            _due.Clear();
+            lock (_subscribers)
+            {
+                foreach (var subscriber in _subscribers)
+                {
+                    if (time >= subscriber.NextFrameTime)
+                    {
+                        _due.Add(subscriber);
+                    }
+                }
+            }
+            if (_due.Count == 0)
+            {
+                return;
+            }
+
+            for (int i = 0; i < sources.Length; i++)
+            {
+                // Send the most recent capture and request a fresh one for the next frame
+                byte[] screenshot = sources[i].GetLastScreenshot();
+                sources[i].CaptureScreenshot();
+                if (screenshot.Length == 0)
+                {
+                    continue;
+                }
+
+                // Packets are built once per frame, chunks only if a subscriber needs them
+                byte[] packet = null;
+                List<byte[]> chunks = null;
+                foreach (var subscriber in _due)
+                {
+                    if (subscriber.ProtocolVersion >= Handler.ChunkedFramesProtocolVersion && screenshot.Length > _chunkSize)
+                    {
+                        subscriber.TrySendFrame(chunks ??= PackChunks(FrameChunk, i, NextTransferId(), screenshot, _chunkSize));
+                        continue;
+                    }
+                    if (packet == null)
+                    {
+                        packet = new byte[screenshot.Length + 2];
+                        packet[0] = FrameMessage;
+                        packet[1] = (byte)i;
+                        Buffer.BlockCopy(screenshot, 0, packet, 2, screenshot.Length);
+                    }
+                    subscriber.TrySendFrame(packet);
+                }
+            }
+
+            foreach (var subscriber in _due)
+            {
+                subscriber.NextFrameTime = time + subscriber.LiveViewInterval;
             }
         }
     }
@@ -135,6 +564,26 @@ namespace Headsup.Monitoring
     /// </summary>
     public class HeadsupServer : MonoBehaviour
     {
+        /// <summary>
+        /// A Unity log message as sent in a "log_batch" message
+        /// </summary>
+        private class LogEntry
+        {
+            // Unity LogType in lower case: "log", "warning", "error", "assert" or "exception"
+            [JsonProperty("level")]
+            public string Level;
+
+            // Unix time in seconds
+            [JsonProperty("time")]
+            public double Time;
+
+            [JsonProperty("message")]
+            public string Message;
+
+            [JsonProperty("stack", NullValueHandling = NullValueHandling.Ignore)]
+            public string StackTrace;
+        }
+
         // Collection of CaptureManager instances to retrieve screenshots from
         [SerializeField]
         private CaptureManager[] _captureSources;
@@ -158,8 +607,21 @@ namespace Headsup.Monitoring
         // WebSocket server instance
         private WebSocketServer _server;
 
-        // Queue to manage log messages
-        private Queue<string> _logsPreflight;
+        // Live view subscribers
+        private LiveViewHub _liveView;
+
+        // Log messages waiting to be sent, drained every frame in batches of at most _maxLogBatch
+        private Queue<LogEntry> _logsPreflight;
+        [SerializeField]
+        private int _maxLogBatch = 500;
+
+        // Screenshots and large live view frames are sent in chunks of this many bytes to protocol version 5 clients
+        [SerializeField]
+        private int _chunkSize = 256 * 1024;
+
+        // Accept permessage-deflate from clients that offer it, worthwhile for status and log traffic
+        [SerializeField]
+        private bool _compression = true;
 
         private float _nextUpdateTime = 0.0f;
         [SerializeField]
@@ -234,10 +696,11 @@ namespace Headsup.Monitoring
                 Debug.LogWarning("HeadsupServer: No IHeadsupPresentationManager found in scene. Gaze control features will be disabled.");
             }
 
-            _logsPreflight = new Queue<string>();
+            _logsPreflight = new Queue<LogEntry>();
+            _liveView = new LiveViewHub(_chunkSize);
 
             _server = new WebSocketServer(port);
-            _server.AddWebSocketService<Handler>("/", () => new Handler(_experiment, _presentationManager, _captureSources));
+            _server.AddWebSocketService<Handler>("/", () => new Handler(_experiment, _presentationManager, _captureSources, _liveView, _chunkSize, _compression));
             _server.Start();
 
             Debug.Log($"HeadsupServer: Started WebSocket server on port {port}");
@@ -253,16 +716,78 @@ namespace Headsup.Monitoring
                 var status = _experiment != null ?
                     _experiment.GetExperimentStatus() :
                     new Dictionary<string, string>() { { "status", "no_experiment_manager" } };
-                Dictionary<string, string> toSend = new() { { "type", "status" }, { "data", JsonConvert.SerializeObject(status) } };
-                _server.WebSocketServices["/"].Sessions.Broadcast(JsonConvert.SerializeObject(toSend));
+                Broadcast("status", status);
                 _nextUpdateTime += _updateInterval;
             }
 
-            // Broadcast any log messages to the client interface
+            // Broadcast the log messages queued since the last frame to the client interface
             if (_logsPreflight.Count > 0)
             {
-                Dictionary<string, string> toSend = new() { { "type", "logs" }, { "data", JsonConvert.SerializeObject(_logsPreflight.Dequeue()) } };
-                _server.WebSocketServices["/"].Sessions.Broadcast(JsonConvert.SerializeObject(toSend));
+                var batch = new List<LogEntry>(Math.Min(_logsPreflight.Count, _maxLogBatch));
+                while (_logsPreflight.Count > 0 && batch.Count < _maxLogBatch)
+                {
+                    batch.Add(_logsPreflight.Dequeue());
+                }
+                BroadcastLogs(batch);
+            }
+
+            // Stream live view frames to any subscribed clients
+            if (_captureSources != null)
+            {
+                _liveView.Update(Time.time, _captureSources);
+            }
+        }
+
+        /// <summary>
+        /// Send a typed message to every connected client, serialized once per protocol version in use
+        /// </summary>
+        /// <param name="type">Message type, e.g. "status"</param>
+        /// <param name="data">Message payload</param>
+        private void Broadcast(string type, object data)
+        {
+            string legacy = null;
+            string latest = null;
+            foreach (var session in _server.WebSocketServices["/"].Sessions.Sessions)
+            {
+                if (session is Handler handler)
+                {
+                    string message = handler.ProtocolVersion >= Handler.FlatProtocolVersion
+                        ? latest ??= Handler.Envelope(type, data, Handler.FlatProtocolVersion)
+                        : legacy ??= Handler.Envelope(type, data, Handler.LegacyProtocolVersion);
+                    handler.SendMessage(message);
+                }
+            }
+        }
+
+        /// <summary>
+        /// Send a batch of log messages to every connected client. Clients that negotiated batched logs get
+        /// one message for the whole batch, older clients one "logs" message per entry.
+        /// </summary>
+        /// <param name="batch">Log messages in the order they were logged</param>
+        private void BroadcastLogs(List<LogEntry> batch)
+        {
+            string batched = null;
+            List<string> flat = null;
+            List<string> legacy = null;
+            foreach (var session in _server.WebSocketServices["/"].Sessions.Sessions)
+            {
+                if (session is not Handler handler)
+                {
+                    continue;
+                }
+                if (handler.ProtocolVersion >= Handler.BatchedLogsProtocolVersion)
+                {
+                    handler.SendMessage(batched ??= Handler.Envelope("log_batch", batch, Handler.BatchedLogsProtocolVersion));
+                    continue;
+                }
+
+                List<string> messages = handler.ProtocolVersion >= Handler.FlatProtocolVersion
+                    ? flat ??= batch.ConvertAll(entry => Handler.Envelope("logs", entry.Message, Handler.FlatProtocolVersion))
+                    : legacy ??= batch.ConvertAll(entry => Handler.Envelope("logs", entry.Message, Handler.LegacyProtocolVersion));
+                foreach (var message in messages)
+                {
+                    handler.SendMessage(message);
+                }
             }
         }
 
@@ -282,8 +807,18 @@ namespace Headsup.Monitoring
         /// Utility function to enqueue log messages for transmission to client interface
         /// </summary>
         /// <param name="condition">Details of log message</param>
-        /// <param name="stackTrace">Stacktrace leading to message</param>
+        /// <param name="stackTrace">Stacktrace leading to message, only kept for errors</param>
         /// <param name="type">Type of log message / level</param>
-        private void HandleLogMessage(string condition, string stackTrace, LogType type) => _logsPreflight.Enqueue(condition);
+        private void HandleLogMessage(string condition, string stackTrace, LogType type)
+        {
+            bool isError = type == LogType.Error || type == LogType.Exception || type == LogType.Assert;
+            _logsPreflight.Enqueue(new LogEntry
+            {
+                Level = type.ToString().ToLowerInvariant(),
+                Time = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0,
+                Message = condition,
+                StackTrace = isError && !string.IsNullOrEmpty(stackTrace) ? stackTrace : null,
+            });
+        }
     }
 }